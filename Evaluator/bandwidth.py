@@ -0,0 +1,165 @@
+# bandwidth.py
+import mmap
+import os
+import stat
+import time
+
+DEFAULT_MAX_SIZE = 4 * 1024 * 1024
+
+
+def request_sizes(max_size=DEFAULT_MAX_SIZE):
+    """1 B, 4 B, 16 B, ... (x4) up to max_size."""
+    sizes = []
+    n = 1
+    while n <= max_size:
+        sizes.append(n)
+        n *= 4
+    if sizes[-1] != max_size:
+        sizes.append(max_size)
+    return sizes
+
+
+def _positional(fd):
+    """Block devices and regular files take preadv/pwritev at offset 0; char devices stream."""
+    mode = os.fstat(fd).st_mode
+    return stat.S_ISBLK(mode) or stat.S_ISREG(mode)
+
+
+def _is_device(fd):
+    mode = os.fstat(fd).st_mode
+    return stat.S_ISCHR(mode) or stat.S_ISBLK(mode)
+
+
+def _sweep_direction(dev_node, direction, sizes, buf, budget):
+    """
+    Time back-to-back transfers of each size for `budget` seconds using
+    slices of one preallocated buffer (no per-op allocation). Short transfers
+    (driver accepted/returned fewer bytes than asked) are counted; MB/s is
+    computed from the bytes actually moved.
+    """
+    flags = (os.O_RDONLY if direction == "read" else os.O_WRONLY) | os.O_NONBLOCK
+    fd = os.open(dev_node, flags)
+    curve = []
+    try:
+        if direction == "write" and not _is_device(fd):
+            raise OSError(f"{dev_node} is not a device node; refusing to write to it")
+        positional = _positional(fd)
+        view = memoryview(buf)
+        for size in sizes:
+            chunk = [view[:size]]
+            ops = moved = short = errors = 0
+            clock = time.perf_counter
+            start = clock()
+            deadline = start + budget
+            while clock() < deadline:
+                try:
+                    if direction == "read":
+                        n = os.preadv(fd, chunk, 0) if positional else os.readv(fd, chunk)
+                    else:
+                        n = os.pwritev(fd, chunk, 0) if positional else os.writev(fd, chunk)
+                except (BlockingIOError, InterruptedError):
+                    n = 0
+                except OSError:
+                    errors += 1
+                    if errors >= 100:
+                        break
+                    continue
+                ops += 1
+                moved += n
+                if n < size:
+                    short += 1
+                    if n == 0 and direction == "read":
+                        # EOF on a streaming device: nothing more to read at this size
+                        break
+            elapsed = max(clock() - start, 1e-9)
+            curve.append({
+                "size": size,
+                "ops": ops,
+                "bytes": moved,
+                "mb_per_sec": round(moved / elapsed / 1e6, 3),
+                "short_ops": short,
+                "errors": errors,
+            })
+    finally:
+        os.close(fd)
+    return curve
+
+
+def _mmap_probe(dev_node, length, budget):
+    """
+    Write and read back a mapping of the device for `budget` seconds and
+    report MB/s. Reads land in one preallocated buffer through a memoryview
+    of the mapping, so the loop does not allocate a copy per pass.
+    """
+    fd = os.open(dev_node, os.O_RDWR)
+    try:
+        if not _is_device(fd):
+            os.close(fd)
+            return {"supported": False, "error": f"{dev_node} is not a device node"}
+        m = mmap.mmap(fd, length, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+    except (OSError, ValueError) as e:
+        os.close(fd)
+        return {"supported": False, "error": str(e)}
+    view = memoryview(m)
+    try:
+        src = bytes(length)
+        dst = bytearray(length)
+        moved = 0
+        start = time.perf_counter()
+        deadline = start + budget
+        while time.perf_counter() < deadline:
+            view[:length] = src
+            moved += length
+            dst[:] = view[:length]
+            moved += length
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        return {"supported": True, "length": length, "mb_per_sec": round(moved / elapsed / 1e6, 3)}
+    finally:
+        view.release()
+        m.close()
+        os.close(fd)
+
+
+def _summarize(curve):
+    """Peak bandwidth and the smallest size at which transfers start coming back short."""
+    if not curve:
+        return {}
+    peak = max(curve, key=lambda p: p["mb_per_sec"])
+    first_short = next((p["size"] for p in curve if p["ops"] and p["short_ops"] == p["ops"]), None)
+    return {"peak_mb_per_sec": peak["mb_per_sec"], "peak_size": peak["size"],
+            "short_from_size": first_short}
+
+
+def run_bandwidth_sweep(dev_node, max_size=DEFAULT_MAX_SIZE, budget=0.05, mmap_length=None, writable=True):
+    """
+    Read and write bandwidth curves for request sizes from 1 B to `max_size`
+    against `dev_node`, plus an mmap probe when `mmap_length` is given (i.e.
+    the driver's fops define .mmap). Every size reuses one preallocated
+    bytearray through a memoryview, and transfers go through os.readv/os.writev
+    (os.preadv/os.pwritev for block devices) so the harness itself does not
+    allocate per operation.
+    Writes (including the mmap probe) only go to character or block devices,
+    and only when `writable` - i.e. the node was verified as the module's own
+    (see module_session.DeviceWatcher); otherwise only reads are measured.
+    """
+    sizes = request_sizes(max_size)
+    buf = bytearray(max_size)
+    result = {"device": dev_node, "sizes": sizes, "budget_per_size_sec": budget}
+    for direction in ("write", "read"):
+        if direction == "write" and not writable:
+            result["write"] = []
+            result["write_error"] = "device node not verified as the module's; writes skipped"
+            continue
+        try:
+            curve = _sweep_direction(dev_node, direction, sizes, buf, budget)
+            result[direction] = curve
+            result[f"{direction}_summary"] = _summarize(curve)
+        except OSError as e:
+            result[direction] = []
+            result[f"{direction}_error"] = str(e)
+    if mmap_length and writable:
+        try:
+            result["mmap"] = _mmap_probe(dev_node, mmap_length, budget)
+        except OSError as e:
+            result["mmap"] = {"supported": False, "error": str(e)}
+    return result
@@ -0,0 +1,277 @@
+# batch.py
+import glob
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from compile_checker import run_compilation_batch, release_artifact
+from evaluator import evaluate
+from orchestrator import evaluate_concurrent
+from triage import evaluate_tiered
+from source_unit import SourceUnit
+from style_checker import run_checkpatch_many, checkpatch_available
+from checkpoint import ResultStream
+from fingerprint import corpus_report, print_report
+from profiling import profiled, merge_profiles, TimingSummary, print_timing_summary
+from logger import log_score
+from workspace import make_workspace, set_scratch_root
+
+_scratch_dir = None
+_cache = None
+_profile_dir = None
+_use_async = False
+_tiered = None  # threshold when running tiered (triage.evaluate_tiered), else None
+_task_ids = itertools.count()
+
+
+def _init_worker(scratch_root, cache, profile_dir=None, use_async=False, tiered=None):
+    """
+    Give each worker process its own scratch directory and make it the cwd,
+    default tempdir and build workspace root, so files from different workers
+    never collide and nothing is written next to the sources.
+    """
+    global _scratch_dir, _cache, _profile_dir, _use_async, _tiered
+    _cache = cache
+    _profile_dir = profile_dir
+    _use_async = use_async
+    _tiered = tiered
+    _scratch_dir = tempfile.mkdtemp(prefix=f"worker_{os.getpid()}_", dir=scratch_root)
+    tempfile.tempdir = _scratch_dir
+    os.environ["TMPDIR"] = _scratch_dir
+    set_scratch_root(_scratch_dir)
+    os.chdir(_scratch_dir)
+
+
+def _profile_path():
+    """Fresh pstats path for one task when --profile is on, else None."""
+    if not _profile_dir:
+        return None
+    return os.path.join(_profile_dir, f"{os.getpid()}_{next(_task_ids)}.prof")
+
+
+def _evaluate_one(file_path, compilation=None, profile=True):
+    try:
+        with profiled(_profile_path() if profile else None):
+            if _tiered is not None:
+                return file_path, evaluate_tiered(file_path, _cache, _tiered, compilation)
+            run = evaluate_concurrent if _use_async else evaluate
+            return file_path, run(file_path, _cache, compilation)
+    except Exception as e:
+        release_artifact(compilation)
+        return file_path, {"error": f"{type(e).__name__}: {e}"}
+
+
+def _uncached(stage, file_paths, extra=""):
+    if _cache is None:
+        return list(file_paths)
+    missing = []
+    for f in file_paths:
+        try:
+            if _cache.lookup(stage, SourceUnit.from_file(f), extra) is None:
+                missing.append(f)
+        except OSError:
+            missing.append(f)
+    return missing
+
+
+def _evaluate_chunk(file_paths, kbuild=True, checkpatch=True):
+    """
+    Compile the chunk's uncached drivers in one kbuild invocation and/or
+    style-check them in one checkpatch.pl process, then run the rest of the
+    pipeline per file on the prebuilt results.
+    """
+    with profiled(_profile_path()):
+        return _evaluate_chunk_inner(file_paths, kbuild, checkpatch)
+
+
+def _evaluate_chunk_inner(file_paths, kbuild, checkpatch):
+    builds = {}
+    if kbuild:
+        try:
+            builds = run_compilation_batch(_uncached("compilation", file_paths), keep_artifact=True)
+        except Exception:
+            builds = {}
+    if checkpatch:
+        run_checkpatch_many(_uncached("style", file_paths, str(checkpatch_available())))
+    return [_evaluate_one(f, builds.get(f), profile=False) for f in file_paths]
+
+
+def collect_drivers(directory):
+    """Return the sorted list of .c files in `directory` (same set as `make run`)."""
+    return sorted(os.path.abspath(p) for p in glob.glob(os.path.join(directory, "*.c")))
+
+
+def _tasks(files, stream, kbuild_batch, checkpatch_batch):
+    """(fn, args) per task over the files not already committed by a previous run."""
+    pending = (f for f in files if not stream.is_done(f))
+    chunk = max(kbuild_batch, checkpatch_batch)
+    if chunk > 1:
+        while True:
+            group = list(itertools.islice(pending, chunk))
+            if not group:
+                return
+            yield _evaluate_chunk, (group, kbuild_batch > 1, checkpatch_batch > 1)
+    for f in pending:
+        yield _evaluate_one, (f,)
+
+
+def run_batch(directory, jobs=None, output=None, cache=None, kbuild_batch=0, checkpatch_batch=0,
+              profile=None, use_async=False, resume=False, tiered=False, threshold=0.0,
+              dedup=False, dedup_threshold=0.8):
+    """
+    Evaluate every driver in `directory` over a pool of `jobs` worker processes.
+    Each result is streamed as one JSONL record (default
+    outputs/batch_results.jsonl) the moment its file finishes, and each file's
+    score is logged from the parent process. A checkpoint manifest next to the
+    output records committed files; with `resume` a previous interrupted run
+    is continued instead of starting over (see checkpoint.ResultStream).
+    At most 2 * jobs tasks are in flight and finished results are not kept,
+    so memory stays flat however many drivers the batch has. If a worker
+    process dies, the pool is recreated and the files that were in flight are
+    retried one at a time; one that kills its worker again is recorded as
+    failed.
+    `cache` is an optional StageCache shared (on disk) by all workers.
+    With kbuild_batch > 1 each task compiles that many drivers in a single
+    kbuild invocation (see compile_checker.run_compilation_batch); with
+    checkpatch_batch > 1 that many drivers share one checkpatch.pl process.
+    With `profile` set, every task runs under cProfile and the merged pstats
+    are written to that path. use_async runs each file through the asyncio
+    stage orchestrator (orchestrator.evaluate_concurrent); `tiered` runs it
+    through triage.evaluate_tiered with `threshold` instead.
+    With `dedup` the corpus is fingerprinted first (see fingerprint.py):
+    duplicate groups and near-duplicate clusters (similarity >=
+    dedup_threshold) are printed and added to the summary, and build and
+    runtime results are cached on normalized keys, so a layout-only copy of a
+    driver graded before under the same file name reuses them.
+    Returns the run summary that is also written to <output>_summary.json.
+    """
+    files = collect_drivers(directory)
+    if not files:
+        print(f"No .c files found in {directory}")
+        return {}
+
+    jobs = jobs or os.cpu_count() or 1
+    output = os.path.abspath(output or os.path.join("outputs", "batch_results.jsonl"))
+    header = {"directory": os.path.abspath(directory), "files": len(files)}
+    scratch_root = make_workspace("evaluator_batch_")
+    profile_dir = None
+    if profile:
+        profile_dir = os.path.join(scratch_root, "profiles")
+        os.makedirs(profile_dir)
+
+    timing = TimingSummary()
+    evaluated = 0
+    start = time.perf_counter()
+    stream = ResultStream(output, header, resume)
+    skipped = sum(1 for f in files if stream.is_done(f)) if stream.resumed else 0
+    if skipped:
+        print(f"Resuming: {skipped}/{len(files)} files already graded")
+
+    report = None
+    if dedup:
+        if cache is not None:
+            cache.normalize = True
+        report = corpus_report(files, dedup_threshold)
+        print_report(report)
+
+    def new_pool():
+        return ProcessPoolExecutor(
+            max_workers=jobs, initializer=_init_worker, initargs=(scratch_root, cache, profile_dir, use_async, threshold if tiered else None)
+        )
+
+    pool = new_pool()
+    try:
+        tasks = _tasks(files, stream, kbuild_batch, checkpatch_batch)
+        in_flight = {}  # future -> files it grades
+        retry = deque()  # files whose task died with a worker process
+        retried = set()
+        solo = None  # future of the file being retried on its own
+
+        def submit(fn, args, paths):
+            """Queue a task and return its future; None (its files left to retry) if the pool is broken."""
+            try:
+                fut = pool.submit(fn, *args)
+            except BrokenProcessPool:
+                retried.difference_update(paths)
+                retry.extendleft(reversed(paths))
+                return None
+            in_flight[fut] = paths
+            return fut
+
+        while True:
+            broken = False
+            if retry:
+                # Retried alone, so a file that kills its worker again is the culprit
+                if not in_flight:
+                    f = retry.popleft()
+                    retried.add(f)
+                    solo = submit(_evaluate_one, (f,), [f])
+                    broken = solo is None
+            elif solo not in in_flight:
+                for fn, args in itertools.islice(tasks, 2 * jobs - len(in_flight)):
+                    if not submit(fn, args, args[0] if isinstance(args[0], list) else [args[0]]):
+                        broken = True
+                        break
+            if not in_flight and not broken:
+                break
+            finished = set()
+            if in_flight:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            if broken or any(isinstance(fut.exception(), BrokenProcessPool) for fut in finished):
+                # A worker died (OOM kill, crashing compiler, ...): every task
+                # still in flight fails with it, so collect them all and carry
+                # on with a fresh pool
+                finished, _ = wait(in_flight)
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = new_pool()
+            for fut in finished:
+                paths = in_flight.pop(fut)
+                try:
+                    pairs = fut.result()
+                except BrokenProcessPool as e:
+                    retry.extend(f for f in paths if f not in retried)
+                    pairs = [(f, {"error": f"worker process died: {e}"}) for f in paths if f in retried]
+                for file_path, res in (pairs if isinstance(pairs, list) else [pairs]):
+                    evaluated += 1
+                    done = skipped + evaluated
+                    stream.write(file_path, res)
+                    if "error" in res:
+                        print(f"[{done}/{len(files)}] {file_path}: error ({res['error']})")
+                        continue
+                    timing.add(file_path, res.get("timings"))
+                    print(f"[{done}/{len(files)}] {file_path}: {res['overall_score']:.1f}/100")
+                    log_score(file_path, res, res["overall_score"], res["breakdown"])
+        pool.shutdown()
+        if profile_dir:
+            merge_profiles(glob.glob(os.path.join(profile_dir, "*.prof")), profile)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        stream.close()
+        shutil.rmtree(scratch_root, ignore_errors=True)
+        if cache is not None:
+            cache.evict()
+    elapsed = time.perf_counter() - start
+    timing_summary = timing.summary()
+
+    summary = dict(header, jobs=jobs, evaluated=evaluated, skipped=skipped,
+                   elapsed_sec=round(elapsed, 3), timing_summary=timing_summary, results=output)
+    if report is not None:
+        summary["duplicates"] = report["duplicates"]
+        summary["clusters"] = report["clusters"]
+    summary_path = os.path.splitext(output)[0] + "_summary.json"
+    with open(summary_path, "w") as f:
+        json.dump(summary, f, indent=4)
+
+    print_timing_summary(timing_summary)
+    print(f"\nEvaluated {evaluated} files with {jobs} workers in {elapsed:.1f}s "
+          f"({evaluated / elapsed:.1f} files/s)")
+    print(f"Batch results streamed to: {output}")
+    if profile:
+        print(f"Profile saved to: {profile}")
+    return summary
@@ -0,0 +1,437 @@
+# benchmark.py
+"""
+Synthetic driver corpus generator and grader throughput benchmark.
+
+Generates driver sources of configurable size and shape (char/platform/block/net
+variants that trip parser.analyze_code_structure's heuristics, thousands of
+functions, deep nesting, checkpatch-hostile formatting), runs the static stages
+and the gcc fallback compile over them, and writes files/sec and per-stage
+latency to a JSON file that can be compared across commits.
+
+Usage:
+    python3 Evaluator/benchmark.py --out outputs/bench.json
+    python3 Evaluator/benchmark.py --out new.json --compare outputs/bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from compile_checker import run_gcc_fallback
+from parser import analyze_code_structure
+from performance_checker import run_performance_check
+from security_checker import run_security_check
+from source_unit import SourceUnit
+from style_checker import run_style_check
+import style_checker
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# --- Corpus generation ---
+
+_HEADERS = [
+    "#include <linux/init.h>",
+    "#include <linux/module.h>",
+    "#include <linux/kernel.h>",
+    "#include <linux/slab.h>",
+    "#include <linux/mutex.h>",
+    "#include <linux/uaccess.h>",
+]
+
+_KIND_HEADERS = {
+    "char": ["#include <linux/fs.h>", "#include <linux/cdev.h>"],
+    "platform": ["#include <linux/platform_device.h>", "#include <linux/io.h>",
+                 "#include <linux/interrupt.h>", "#include <linux/of.h>"],
+    "block": ["#include <linux/blkdev.h>", "#include <linux/genhd.h>"],
+    "net": ["#include <linux/netdevice.h>", "#include <linux/etherdevice.h>"],
+}
+
+
+def _helper(rng, name, nesting, noisy):
+    """One helper function with `nesting` levels of nested control flow."""
+    ind = (lambda d: "    " * d) if noisy else (lambda d: "\t" * d)
+    lines = [f"static int {name}(int *buf, size_t len)", "{", f"{ind(1)}int ret = 0;"]
+    depth = 1
+    for level in range(nesting):
+        kw = rng.choice(["if (len > %d)" % level, "for (ret = 0; ret < %d; ret++)" % (level + 2),
+                         "while (len-- > %d)" % level])
+        lines.append(f"{ind(depth)}{kw} {{")
+        depth += 1
+        if noisy:
+            lines.append(f"{ind(depth)}buf[{level}] = buf[{level}] + {level};    // C99 comment with trailing space ")
+            lines.append(f"{ind(depth)}pr_info(\"{name}: a deliberately very long log line that goes well past eighty columns %d\\n\", {level});")
+        else:
+            lines.append(f"{ind(depth)}buf[{level}] += {level};")
+    for _ in range(nesting):
+        depth -= 1
+        lines.append(f"{ind(depth)}}}")
+    lines += [f"{ind(1)}return ret;", "}", ""]
+    return lines
+
+
+def _kind_body(kind, prefix):
+    """Driver-type specific glue matching the parser's detection heuristics."""
+    if kind == "char":
+        return [
+            f"static char {prefix}_buf[1024];",
+            f"static ssize_t {prefix}_read(struct file *f, char __user *u, size_t len, loff_t *off)",
+            "{",
+            f"\tif (copy_to_user(u, {prefix}_buf, len))",
+            "\t\treturn -EFAULT;",
+            "\treturn len;",
+            "}",
+            "",
+            f"static ssize_t {prefix}_write(struct file *f, const char __user *u, size_t len, loff_t *off)",
+            "{",
+            f"\tif (copy_from_user({prefix}_buf, u, len))",
+            "\t\treturn -EFAULT;",
+            "\treturn len;",
+            "}",
+            "",
+            f"static int {prefix}_open(struct inode *i, struct file *f)",
+            "{",
+            "\treturn 0;",
+            "}",
+            "",
+            f"static int {prefix}_release(struct inode *i, struct file *f)",
+            "{",
+            "\treturn 0;",
+            "}",
+            "",
+            f"static const struct file_operations {prefix}_fops = {{",
+            f"\t.owner = THIS_MODULE,",
+            f"\t.read = {prefix}_read,",
+            f"\t.write = {prefix}_write,",
+            f"\t.open = {prefix}_open,",
+            f"\t.release = {prefix}_release,",
+            "};",
+            "",
+            f"static int __init {prefix}_init(void)",
+            "{",
+            f"\treturn register_chrdev(0, \"{prefix}\", &{prefix}_fops);",
+            "}",
+            "",
+            f"static void __exit {prefix}_exit(void)",
+            "{",
+            f"\tunregister_chrdev(0, \"{prefix}\");",
+            "}",
+        ]
+    if kind == "platform":
+        return [
+            f"static void __iomem *{prefix}_base;",
+            f"static irqreturn_t {prefix}_irq(int irq, void *data)",
+            "{",
+            f"\twritel(0, {prefix}_base);",
+            "\treturn IRQ_HANDLED;",
+            "}",
+            "",
+            f"static int {prefix}_probe(struct platform_device *pdev)",
+            "{",
+            f"\t{prefix}_base = ioremap(0x1000, 0x100);",
+            f"\treturn request_irq(platform_get_irq(pdev, 0), {prefix}_irq, 0, \"{prefix}\", NULL);",
+            "}",
+            "",
+            f"static const struct of_device_id {prefix}_of_match[] = {{",
+            f"\t{{ .compatible = \"bench,{prefix}\" }},",
+            "\t{ }",
+            "};",
+            "",
+            f"static struct platform_driver {prefix}_driver = {{",
+            f"\t.probe = {prefix}_probe,",
+            f"\t.driver = {{ .name = \"{prefix}\", .of_match_table = {prefix}_of_match }},",
+            "};",
+            "",
+            f"static int __init {prefix}_init(void)",
+            "{",
+            f"\treturn platform_driver_register(&{prefix}_driver);",
+            "}",
+            "",
+            f"static void __exit {prefix}_exit(void)",
+            "{",
+            f"\tplatform_driver_unregister(&{prefix}_driver);",
+            "}",
+        ]
+    if kind == "block":
+        return [
+            f"static int {prefix}_major;",
+            f"static struct gendisk *{prefix}_disk;",
+            f"static struct request_queue *{prefix}_queue;",
+            "",
+            f"static void {prefix}_submit_bio(struct bio *bio)",
+            "{",
+            "\tbio_endio(bio);",
+            "}",
+            "",
+            f"static int __init {prefix}_init(void)",
+            "{",
+            f"\t{prefix}_major = register_blkdev(0, \"{prefix}\");",
+            f"\t{prefix}_queue = blk_alloc_queue(NUMA_NO_NODE);",
+            "\treturn 0;",
+            "}",
+            "",
+            f"static void __exit {prefix}_exit(void)",
+            "{",
+            f"\tunregister_blkdev({prefix}_major, \"{prefix}\");",
+            "}",
+        ]
+    return [
+        f"static struct net_device *{prefix}_dev;",
+        f"static netdev_tx_t {prefix}_xmit(struct sk_buff *skb, struct net_device *dev)",
+        "{",
+        "\tdev_kfree_skb(skb);",
+        "\treturn NETDEV_TX_OK;",
+        "}",
+        "",
+        f"static const struct net_device_ops {prefix}_ops = {{",
+        f"\t.ndo_start_xmit = {prefix}_xmit,",
+        "};",
+        "",
+        f"static int __init {prefix}_init(void)",
+        "{",
+        f"\t{prefix}_dev = alloc_netdev(0, \"{prefix}%d\", NET_NAME_UNKNOWN, ether_setup);",
+        f"\t{prefix}_dev->netdev_ops = &{prefix}_ops;",
+        f"\treturn register_netdev({prefix}_dev);",
+        "}",
+        "",
+        f"static void __exit {prefix}_exit(void)",
+        "{",
+        f"\tunregister_netdev({prefix}_dev);",
+        "}",
+    ]
+
+
+def generate_driver(kind="char", functions=20, nesting=2, noisy=False, seed=0):
+    """
+    Return the text of a synthetic driver of the given `kind`
+    (char/platform/block/net) with `functions` extra helper functions, each
+    nested `nesting` levels deep. `noisy` adds formatting that makes
+    checkpatch produce a large report (spaces for tabs, long lines, C99
+    comments, trailing whitespace).
+    """
+    rng = random.Random(seed)
+    prefix = f"bench_{kind}"
+    lines = _HEADERS + _KIND_HEADERS[kind] + [
+        "",
+        'MODULE_LICENSE("GPL");',
+        'MODULE_AUTHOR("benchmark");',
+        'MODULE_DESCRIPTION("synthetic benchmark driver");',
+        "",
+    ]
+    for i in range(functions):
+        lines.append(f"/* helper {i} */")
+        lines += _helper(rng, f"{prefix}_helper_{i}", nesting, noisy)
+    lines += _kind_body(kind, prefix)
+    lines += ["", f"module_init({prefix}_init);", f"module_exit({prefix}_exit);", ""]
+    return "\n".join(lines)
+
+
+# name -> generate_driver kwargs
+SCENARIOS = {
+    "char_small": {"kind": "char", "functions": 10, "nesting": 2},
+    "platform_medium": {"kind": "platform", "functions": 200, "nesting": 3},
+    "block_medium": {"kind": "block", "functions": 200, "nesting": 3},
+    "net_medium": {"kind": "net", "functions": 200, "nesting": 3},
+    "char_large": {"kind": "char", "functions": 2000, "nesting": 2},
+    "deep_nesting": {"kind": "platform", "functions": 50, "nesting": 40},
+    "noisy_style": {"kind": "net", "functions": 500, "nesting": 4, "noisy": True},
+}
+# Scenarios whose point is a huge checkpatch report: they run checkpatch.pl
+# (when present) even without --checkpatch
+CHECKPATCH_SCENARIOS = {"noisy_style"}
+
+
+def generate_corpus(directory, scenario, files, scale=1.0):
+    """Write `files` variants of `scenario` into `directory`; returns their paths."""
+    params = dict(SCENARIOS[scenario])
+    params["functions"] = max(1, int(params["functions"] * scale))
+    paths = []
+    for i in range(files):
+        path = os.path.join(directory, f"{scenario}_{i}.c")
+        with open(path, "w") as f:
+            f.write(generate_driver(seed=i, **params))
+        paths.append(path)
+    return paths
+
+
+# --- Measurement ---
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def _stats(values):
+    return {
+        "mean_ms": round(1000 * sum(values) / len(values), 3) if values else 0.0,
+        "p50_ms": round(1000 * _percentile(values, 50), 3),
+        "p95_ms": round(1000 * _percentile(values, 95), 3),
+        "max_ms": round(1000 * max(values), 3) if values else 0.0,
+    }
+
+
+def bench_files(paths, gcc=True):
+    """
+    Run the static stages (and optionally the gcc fallback compile) over
+    `paths`, timing each stage per file. Returns files/sec and per-stage
+    latency statistics.
+    """
+    stages = ["load", "structure", "style", "security", "performance"] + (["gcc_fallback"] if gcc else [])
+    samples = {s: [] for s in stages}
+    lines = 0
+    start = time.perf_counter()
+    for path in paths:
+        t = time.perf_counter()
+        src = SourceUnit.from_file(path)
+        samples["load"].append(time.perf_counter() - t)
+        lines += len(src.lines)
+
+        t = time.perf_counter()
+        structure = analyze_code_structure(src)
+        samples["structure"].append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        run_style_check(src)
+        samples["style"].append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        run_security_check(src)
+        samples["security"].append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        run_performance_check(src, structure)
+        samples["performance"].append(time.perf_counter() - t)
+
+        if gcc:
+            t = time.perf_counter()
+            run_gcc_fallback(path)
+            samples["gcc_fallback"].append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    return {
+        "files": len(paths),
+        "lines": lines,
+        "elapsed_sec": round(elapsed, 4),
+        "files_per_sec": round(len(paths) / elapsed, 3) if elapsed else 0.0,
+        "stages": {s: _stats(v) for s, v in samples.items()},
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+            capture_output=True, text=True, timeout=10,
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_benchmark(scenarios=None, files=5, scale=1.0, gcc=True, checkpatch=False):
+    scenarios = scenarios or list(SCENARIOS)
+    saved_checkpatch = style_checker.CHECKPATCH
+    no_checkpatch = os.path.join(tempfile.gettempdir(), "no-checkpatch.pl")
+    workdir = tempfile.mkdtemp(prefix="evaluator_bench_")
+    report = {
+        "meta": {
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "files_per_scenario": files,
+            "scale": scale,
+            "gcc": gcc,
+            "checkpatch": checkpatch and os.path.exists(saved_checkpatch),
+        },
+        "scenarios": {},
+    }
+    try:
+        for name in scenarios:
+            # Benchmark the heuristic style path unless checkpatch is asked for
+            use_checkpatch = checkpatch or name in CHECKPATCH_SCENARIOS
+            style_checker.CHECKPATCH = saved_checkpatch if use_checkpatch else no_checkpatch
+            paths = generate_corpus(workdir, name, files, scale)
+            bench_files(paths[:1], gcc=gcc)  # untimed warm-up (imports, regex compilation)
+            report["scenarios"][name] = bench_files(paths, gcc=gcc)
+            r = report["scenarios"][name]
+            r["checkpatch"] = use_checkpatch and os.path.exists(saved_checkpatch)
+            print(f"{name:<16} {r['files']} files, {r['lines'] // max(1, r['files'])} lines each: "
+                  f"{r['files_per_sec']:.2f} files/s")
+    finally:
+        style_checker.CHECKPATCH = saved_checkpatch
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def compare_reports(current, baseline, threshold=0.2):
+    """
+    Print per-scenario throughput and per-stage p50 changes against a baseline
+    report. Returns the list of regressions slower than `threshold` (fraction).
+    """
+    regressions = []
+    print(f"\n--- Compared with {baseline['meta'].get('commit')} ---")
+    for name, cur in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        if base.get("checkpatch", cur.get("checkpatch")) != cur.get("checkpatch"):
+            print(f"{name:<16} skipped: checkpatch use differs from the baseline")
+            continue
+        if base["files_per_sec"]:
+            ratio = cur["files_per_sec"] / base["files_per_sec"]
+            print(f"{name:<16} {base['files_per_sec']:.2f} -> {cur['files_per_sec']:.2f} files/s ({ratio:.2f}x)")
+            if ratio < 1 - threshold:
+                regressions.append(f"{name}: throughput {ratio:.2f}x")
+        for stage, st in cur["stages"].items():
+            b = base["stages"].get(stage)
+            if b and b["p50_ms"] > 0 and st["p50_ms"] / b["p50_ms"] > 1 + threshold:
+                regressions.append(f"{name}/{stage}: p50 {b['p50_ms']}ms -> {st['p50_ms']}ms")
+    for r in regressions:
+        print(f"  REGRESSION {r}")
+    return regressions
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Grader throughput benchmark on a synthetic driver corpus.")
+    ap.add_argument("--out", default=os.path.join("outputs", "bench.json"), help="JSON report path")
+    ap.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                    help="scenario to run (repeatable; default: all)")
+    ap.add_argument("--files", type=int, default=5, help="files generated per scenario")
+    ap.add_argument("--scale", type=float, default=1.0, help="multiply every scenario's function count")
+    ap.add_argument("--no-gcc", action="store_true", help="skip the gcc fallback compile stage")
+    ap.add_argument("--checkpatch", action="store_true", help="run checkpatch.pl in the style stage")
+    ap.add_argument("--compare", metavar="BASELINE", help="compare against a previous report")
+    ap.add_argument("--threshold", type=float, default=0.2, help="regression threshold (fraction)")
+    ap.add_argument("--emit", metavar="DIR", help="only write the synthetic corpus to DIR")
+    args = ap.parse_args()
+
+    if args.emit:
+        os.makedirs(args.emit, exist_ok=True)
+        for name in args.scenario or SCENARIOS:
+            generate_corpus(args.emit, name, args.files, args.scale)
+        print(f"Corpus written to: {args.emit}")
+        sys.exit(0)
+
+    # Read the baseline before anything is written: --out may be the same file
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    report = run_benchmark(args.scenario, args.files, args.scale, not args.no_gcc, args.checkpatch)
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"Benchmark report saved to: {args.out}")
+
+    if baseline is not None:
+        if compare_reports(report, baseline, args.threshold):
+            sys.exit(1)
@@ -0,0 +1,236 @@
+# cache.py
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+
+from fingerprint import token_digest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EVALUATOR_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.environ.get("EVALUATOR_CACHE_DIR", os.path.join(REPO_ROOT, ".eval_cache"))
+DEFAULT_MAX_MB = float(os.environ.get("EVALUATOR_CACHE_MAX_MB", "256"))
+
+# Bump to invalidate every entry when the cache format itself changes
+CACHE_FORMAT = 1
+
+# Files whose contents define each stage's behaviour (its "checker version").
+# Editing any of them automatically invalidates that stage's entries.
+STAGE_SOURCES = {
+    "compilation": ["compile_checker.py", "fingerprint.py"],
+    "syntax": ["compile_checker.py", "fingerprint.py"],
+    "structure": ["parser.py", "source_unit.py", "function_index.py"],
+    "style": ["style_checker.py", "checkpatch.pl", "source_unit.py", "function_index.py"],
+    "security": ["security_checker.py", "rule_engine.py", "source_unit.py",
+                 os.environ.get("EVALUATOR_SECURITY_RULES", "security_rules.json")],
+    "performance": ["performance_checker.py", "hot_paths.py", "parser.py", "source_unit.py",
+                    "function_index.py"],
+    "runtime": ["runtime_checker.py", "dynamic_tests.py", "compile_checker.py",
+                "kmsg.py", "loadgen.py", "bandwidth.py", "ftrace.py",
+                "memory_footprint.py", "module_session.py", "fingerprint.py"],
+}
+
+# Stages whose result depends on the host toolchain / running kernel
+TOOLCHAIN_STAGES = {"compilation", "syntax", "style", "runtime"}
+
+# Stages whose outcome depends only on the token stream, not on layout or
+# comments; with normalize=True they are keyed on fingerprint.token_digest
+NORMALIZED_STAGES = {"compilation", "syntax", "runtime"}
+
+# Stages whose result depends on the file name: the module is named after it
+# (obj-m, insmod/rmmod, kernel log) and the compiler output quotes it
+NAME_BOUND_STAGES = {"compilation", "syntax", "runtime"}
+
+# Result fields pointing at per-run temporary files; never written to the cache
+TRANSIENT_FIELDS = ("artifact",)
+
+_EVICT_EVERY = 32
+
+_versions = {}
+_env_fingerprint = None
+
+
+def _file_digest(name):
+    path = os.path.join(EVALUATOR_DIR, name)
+    h = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                h.update(chunk)
+    except OSError:
+        h.update(b"missing")
+    return h.hexdigest()
+
+
+def checker_version(stage):
+    """Hash of the source files implementing `stage`."""
+    if stage not in _versions:
+        h = hashlib.sha256(str(CACHE_FORMAT).encode())
+        for name in STAGE_SOURCES.get(stage, []):
+            h.update(name.encode())
+            h.update(_file_digest(name).encode())
+        _versions[stage] = h.hexdigest()
+    return _versions[stage]
+
+
+def _tool_version(cmd):
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+        out = (proc.stdout or proc.stderr or "").strip()
+        return out.splitlines()[0] if out else "none"
+    except Exception:
+        return "none"
+
+
+def environment_fingerprint():
+    """Kernel release plus gcc/make/perl versions, computed once per process."""
+    global _env_fingerprint
+    if _env_fingerprint is None:
+        parts = [
+            os.uname().release,
+            _tool_version(["gcc", "--version"]),
+            _tool_version(["make", "--version"]),
+            _tool_version(["perl", "-e", "print $^V"]),
+        ]
+        _env_fingerprint = "|".join(parts)
+    return _env_fingerprint
+
+
+class StageCache:
+    """
+    Content-addressed, size-bounded on-disk cache of per-stage results.
+
+    Entries are JSON files under `cache_dir`, keyed on the source hash, the
+    stage's checker version and (for toolchain-bound stages) the kernel release
+    and toolchain versions. Hits refresh the entry's mtime; when the store grows
+    past `max_mb` the least recently used entries are evicted.
+
+    mode:
+      "on"      - read and write (default)
+      "refresh" - ignore existing entries but store fresh results
+      "off"     - neither read nor write
+
+    With `normalize`, NORMALIZED_STAGES are keyed on the comment- and
+    whitespace-insensitive token digest, so a driver that differs from an
+    already graded one only in layout reuses its build and runtime results.
+    The static checkers measure layout and comments and keep exact keys.
+    NAME_BOUND_STAGES also key on the file's basename, and TRANSIENT_FIELDS
+    are dropped from every stored result.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_mb=DEFAULT_MAX_MB, mode="on", normalize=False):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.mode = mode
+        self.normalize = normalize
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+
+    def key(self, stage, source_digest, extra=""):
+        h = hashlib.sha256()
+        for part in (stage, source_digest, checker_version(stage), extra):
+            h.update(part.encode())
+            h.update(b"\0")
+        if stage in TOOLCHAIN_STAGES:
+            h.update(environment_fingerprint().encode())
+        return h.hexdigest()
+
+    def _digest(self, stage, source):
+        if self.normalize and stage in NORMALIZED_STAGES:
+            return "tokens:" + token_digest(source)
+        return source.digest
+
+    def _stage_key(self, stage, source, extra):
+        if stage in NAME_BOUND_STAGES:
+            extra = f"{extra}|{os.path.basename(source.path or '')}"
+        return self.key(stage, self._digest(stage, source), extra)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, key):
+        if self.mode != "on":
+            return None
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                value = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.mode == "off":
+            return
+        if isinstance(value, dict) and any(k in value for k in TRANSIENT_FIELDS):
+            value = {k: v for k, v in value.items() if k not in TRANSIENT_FIELDS}
+        path = self._path(key)
+        tmp = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(value, f)
+            os.replace(tmp, path)
+        except (OSError, TypeError, ValueError):
+            # An unserialisable result must not leave its half-written file behind
+            if tmp is not None:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+            return
+        self._puts += 1
+        if self._puts % _EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the store fits in max_bytes."""
+        entries = []
+        total = 0
+        try:
+            for sub in os.scandir(self.cache_dir):
+                if not sub.is_dir():
+                    continue
+                for e in os.scandir(sub.path):
+                    st = e.stat()
+                    entries.append((st.st_mtime, st.st_size, e.path))
+                    total += st.st_size
+        except OSError:
+            return
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def lookup(self, stage, source, extra=""):
+        """Cached result of `stage` for `source`, or None."""
+        return self.get(self._stage_key(stage, source, extra))
+
+    def store(self, stage, source, value, extra=""):
+        """Store an externally computed result of `stage` for `source`."""
+        if self.mode != "off":
+            self.put(self._stage_key(stage, source, extra), value)
+
+    def stage(self, stage, source, fn, *args, extra=""):
+        """Return the cached result of `stage` for `source`, or run fn(*args) and store it."""
+        if self.mode == "off":
+            return fn(*args)
+        key = self._stage_key(stage, source, extra)
+        value = self.get(key)
+        if value is None:
+            value = fn(*args)
+            self.put(key, value)
+        return value
@@ -0,0 +1,109 @@
+# checkpoint.py
+import json
+import os
+
+from source_unit import text_digest
+
+
+def file_digest(path):
+    """
+    sha256 of a file read the way SourceUnit.from_file reads it, so it equals
+    the result's source_hash (SourceUnit.digest); None if unreadable.
+    """
+    try:
+        with open(path, "r", errors="replace") as f:
+            return text_digest(f.read())
+    except OSError:
+        return None
+
+
+class ResultStream:
+    """
+    Streams batch results to a JSONL file, one {"file", "result"} record per
+    line, written and flushed as soon as each driver finishes.
+
+    Next to it, `<output>.manifest` is an append-only checkpoint log: a header
+    line describing the run, then one line per committed record with the
+    file, its source sha256, its status and the byte offset where its record
+    ends. A record counts as done only once its manifest line is written, so
+    on resume the results file is truncated back to the last committed offset
+    (dropping a half-written line) and every file whose sha256 still matches
+    an "ok" entry is skipped. Changed files and errored files are graded again.
+    """
+
+    def __init__(self, output, header, resume=False):
+        self.output = output
+        self.manifest = output + ".manifest"
+        self.header = header
+        self.done = {}  # file -> sha256 of completed, successful records
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+        end = self._load_manifest() if resume else None
+        if end is None:
+            self.done = {}
+            self._out = open(output, "wb")
+            self._man = open(self.manifest, "w")
+            self._man.write(json.dumps({"header": header}) + "\n")
+            self._man.flush()
+            self.resumed = False
+        else:
+            self._out = open(output, "r+b")
+            self._out.truncate(end)
+            self._out.seek(end)
+            self._man = open(self.manifest, "a")
+            self.resumed = True
+        self.end = self._out.tell()
+
+    def _load_manifest(self):
+        """Read a previous run's manifest; returns the committed end offset or None."""
+        if not (os.path.exists(self.manifest) and os.path.exists(self.output)):
+            return None
+        end = 0
+        with open(self.manifest) as f:
+            for n, line in enumerate(f):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # torn final line from an interrupted write
+                if n == 0:
+                    if entry.get("header", {}).get("directory") != self.header.get("directory"):
+                        return None
+                    continue
+                end = entry["end"]
+                if entry["status"] == "ok":
+                    self.done[entry["file"]] = entry["sha256"]
+                else:
+                    self.done.pop(entry["file"], None)
+        if os.path.getsize(self.output) < end:
+            return None
+        return end
+
+    def is_done(self, file_path):
+        """True if a previous run already committed an up-to-date result for this file."""
+        digest = self.done.get(file_path)
+        return digest is not None and digest == file_digest(file_path)
+
+    def write(self, file_path, result):
+        line = json.dumps({"file": file_path, "result": result}, default=str) + "\n"
+        self._out.write(line.encode())
+        self._out.flush()
+        self.end = self._out.tell()
+        status = "error" if "error" in result else "ok"
+        self._man.write(json.dumps({
+            "file": file_path,
+            "sha256": result.get("source_hash") or file_digest(file_path),
+            "status": status,
+            "end": self.end,
+        }) + "\n")
+        self._man.flush()
+
+    def close(self):
+        self._out.close()
+        self._man.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
@@ -1,8 +1,10 @@
+import asyncio
 import subprocess
 import re
 import os
 import shutil
-import tempfile
+
+from workspace import make_workspace, stage_source
 
 
 def _run_proc(cmd, cwd=None, timeout=120):
@@ -23,7 +25,92 @@ def _run_proc(cmd, cwd=None, timeout=120):
         return 1, f"Exception: {str(e)}"
 
 
-def run_compilation(file_path):
+def release_artifact(result):
+    """Remove the kbuild directory kept by run_compilation(keep_artifact=True)."""
+    artifact = result.pop("artifact", None) if result else None
+    if artifact and artifact.get("build_dir"):
+        shutil.rmtree(artifact["build_dir"], ignore_errors=True)
+
+
+def artifact_ready(result):
+    """True if `result` carries a built .ko that still exists on disk."""
+    ko_path = (result or {}).get("artifact", {}).get("ko_path")
+    return bool(ko_path) and os.path.exists(ko_path)
+
+
+def _drive(steps):
+    """Run a compile-step generator, executing each requested command synchronously."""
+    try:
+        request = next(steps)
+        while True:
+            request = steps.send(_run_proc(*request))
+    except StopIteration as stop:
+        return stop.value
+
+
+async def _run_proc_async(cmd, cwd=None, timeout=120):
+    """asyncio counterpart of _run_proc()."""
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, cwd=cwd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+    except Exception as e:
+        return 1, f"Exception: {str(e)}"
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return 1, f"TimeoutExpired: {cmd} timed out after {timeout} seconds"
+    out = stdout.decode(errors="replace") + stderr.decode(errors="replace")
+    return proc.returncode, out
+
+
+async def _drive_async(steps):
+    """Run a compile-step generator, awaiting each requested command."""
+    try:
+        request = next(steps)
+        while True:
+            request = steps.send(await _run_proc_async(*request))
+    except StopIteration as stop:
+        return stop.value
+
+
+def kbuild_available():
+    """True if the running kernel's build tree (headers + Makefiles) is installed."""
+    return os.path.exists(f"/lib/modules/{os.uname().release}/build")
+
+
+def run_compilation(file_path, keep_artifact=False):
+    """
+    Compile the driver with kbuild (falling back to gcc -fsyntax-only).
+
+    With keep_artifact=True a successful kbuild leaves its build directory in
+    place and records it under result["artifact"] = {ko_path, build_dir, build_log}
+    so the runtime stage can load the module without rebuilding it. The caller
+    must hand the result to release_artifact() when done.
+    """
+    return _drive(_compilation_steps(file_path, keep_artifact))
+
+
+async def run_compilation_async(file_path, keep_artifact=False):
+    """Same as run_compilation(), but the compiler processes run under asyncio."""
+    return await _drive_async(_compilation_steps(file_path, keep_artifact))
+
+
+def run_gcc_fallback(file_path, result=None):
+    """
+    gcc -fsyntax-only check used when kbuild is unavailable or lacks headers.
+    A run whose only errors are missing <linux/...> headers is a soft pass.
+    """
+    return _drive(_gcc_steps(file_path, result))
+
+
+# The compile logic is written once as generators: each `yield (cmd, cwd, timeout)`
+# asks the driver (_drive / _drive_async) to run a command and receives
+# (returncode, output) back.
+
+def _compilation_steps(file_path, keep_artifact):
     result = {
         "success": False,
         "method": None,
@@ -37,18 +124,17 @@ def run_compilation(file_path):
     # --- Try kbuild first ---
     if os.path.exists(kernel_build_dir):
         result["method"] = "kbuild"
-        tmpdir = tempfile.mkdtemp(prefix="evaluator_kbuild_")
+        tmpdir = make_workspace("evaluator_kbuild_")
         try:
             base = os.path.basename(file_path)
-            dest = os.path.join(tmpdir, base)
-            shutil.copy2(file_path, dest)
+            stage_source(file_path, tmpdir)
 
             mk = f"obj-m := {base.replace('.c', '')}.o\n"
             with open(os.path.join(tmpdir, "Makefile"), "w") as fh:
                 fh.write(mk)
 
             cmd = ["make", "-C", kernel_build_dir, f"M={tmpdir}", "modules", "-j"]
-            ret, out = _run_proc(cmd, timeout=240)
+            ret, out = yield (cmd, None, 240)
             result["output"] = out
             result["errors"] = len(re.findall(r"\berror:", out))
             result["warnings"] = len(re.findall(r"\bwarning:", out))
@@ -57,26 +143,47 @@ def run_compilation(file_path):
             ko_files = [f for f in os.listdir(tmpdir) if f.endswith(".ko")]
             if ko_files:
                 result["built_module"] = ko_files[0]
+                if keep_artifact and result["success"]:
+                    build_log = os.path.join(tmpdir, "build.log")
+                    with open(build_log, "w") as fh:
+                        fh.write(out)
+                    result["artifact"] = {
+                        "ko_path": os.path.join(tmpdir, ko_files[0]),
+                        "build_dir": tmpdir,
+                        "build_log": build_log,
+                    }
         except Exception as e:
             result["output"] = f"Kbuild exception: {e}"
             result["success"] = False
         finally:
-            shutil.rmtree(tmpdir, ignore_errors=True)
-
-        if result["success"]:
-            return result
+            if "artifact" not in result:
+                shutil.rmtree(tmpdir, ignore_errors=True)
 
-        if re.search(r"fatal error: .*: No such file or directory", result["output"]):
-            result["note"] = "Kbuild failed due to missing headers, retrying with GCC fallback."
-        else:
+        if not _needs_gcc_fallback(result):
             return result
 
     # --- GCC fallback ---
+    return (yield from _gcc_steps(file_path, result))
+
+
+def _needs_gcc_fallback(result):
+    """True (and noted on `result`) if a failed kbuild only lacked headers."""
+    if result["success"] or not re.search(r"fatal error: .*: No such file or directory", result["output"]):
+        return False
+    result["note"] = "Kbuild failed due to missing headers, retrying with GCC fallback."
+    return True
+
+
+def _gcc_steps(file_path, result=None):
+    if result is None:
+        result = {"success": False, "method": None, "output": "", "errors": 0, "warnings": 0}
     result["method"] = "gcc-fallback"
+    # Any output gcc writes goes to a private workspace, never the cwd
+    tmpdir = make_workspace("evaluator_gcc_")
     try:
-        temp_obj = "temp_evaluator.o"
+        temp_obj = os.path.join(tmpdir, "temp_evaluator.o")
         cmd = ["gcc", "-Wall", "-Wextra", "-c", "-fsyntax-only", file_path, "-o", temp_obj]
-        ret, out = _run_proc(cmd, timeout=60)
+        ret, out = yield (cmd, None, 60)
         result["output"] = out or ""
         result["errors"] = len(re.findall(r"\berror:", result["output"]))
         result["warnings"] = len(re.findall(r"\bwarning:", result["output"]))
@@ -97,10 +204,156 @@ def run_compilation(file_path):
         result["output"] = f"GCC compile exception: {e}"
         result["success"] = False
     finally:
-        try:
-            if os.path.exists("temp_evaluator.o"):
-                os.remove("temp_evaluator.o")
-        except Exception:
-            pass
+        shutil.rmtree(tmpdir, ignore_errors=True)
 
     return result
+
+
+# --- Multi-module kbuild batching ---
+
+_DIAG_RE = re.compile(r"^(?P<path>[^\s:]+\.[ch]):\d+(?::\d+)?: (?P<kind>fatal error|error|warning):")
+_CC_RE = re.compile(r"^\s*CC \[M\]\s+(?P<obj>\S+)\.o\s*$")
+_MODPOST_RE = re.compile(r"^(?:ERROR|WARNING): modpost: .*\[(?P<ko>[^\]]+)\.ko\]")
+_INCLUDED_RE = re.compile(r"^In file included from (?P<path>[^\s:]+\.c):")
+
+
+def _module_names(file_paths):
+    """Unique kbuild-safe module name per file (duplicates get a numeric suffix)."""
+    names = {}
+    used = set()
+    for fp in file_paths:
+        base = re.sub(r"[^A-Za-z0-9_]", "_", os.path.splitext(os.path.basename(fp))[0]) or "mod"
+        name, n = base, 2
+        while name in used:
+            name, n = f"{base}_{n}", n + 1
+        used.add(name)
+        names[fp] = name
+    return names
+
+
+def _split_kbuild_output(out, names):
+    """
+    Attribute lines of a combined kbuild log to modules. Diagnostics carrying a
+    staged source (or a module's .ko) go to that module; anything else (header
+    diagnostics, notes, context lines) goes to the module whose CC step
+    printed last. Paths are matched on their basename, since newer kbuild
+    prints them relative to the module or kernel directory rather than as
+    absolute paths under the staging directory.
+    """
+    by_module = {name: [] for name in names}
+    current = None
+    for line in out.splitlines():
+        m = _CC_RE.match(line)
+        if m and os.path.basename(m.group("obj")) in by_module:
+            current = os.path.basename(m.group("obj"))
+        m = _DIAG_RE.match(line) or _MODPOST_RE.match(line) or _INCLUDED_RE.match(line)
+        if m:
+            path = m.groupdict().get("path") or m.groupdict().get("ko")
+            stem = os.path.splitext(os.path.basename(path or ""))[0]
+            if stem in by_module and (m.re is _MODPOST_RE or path.endswith(".c")):
+                current = stem
+        if current in by_module:
+            by_module[current].append(line)
+    return by_module
+
+
+def run_compilation_batch(file_paths, keep_artifact=False, jobs=None):
+    """
+    Compile many drivers with a single external-module kbuild.
+
+    All sources are staged into one directory with `obj-m := a.o b.o ...`. A
+    first `make -k` pass builds every object and keeps going past broken ones;
+    the combined log is split back into per-file diagnostics. A second pass
+    restricted to the objects that compiled runs modpost and links the .ko
+    files, so one broken driver cannot sink the rest. Modules rejected by
+    modpost are dropped and the link pass retried.
+
+    Returns {file_path: result} with the same shape as run_compilation()
+    (method="kbuild-batch"). As there, a file whose build failed only on
+    missing headers is retried with the gcc fallback. Without kernel headers
+    each file goes through run_compilation() individually.
+    """
+    kernel_build_dir = f"/lib/modules/{os.uname().release}/build"
+    if not os.path.exists(kernel_build_dir):
+        return {fp: run_compilation(fp, keep_artifact) for fp in file_paths}
+
+    names = _module_names(file_paths)
+    tmpdir = make_workspace("evaluator_kbuild_batch_")
+    jobs = jobs or os.cpu_count() or 1
+    results = {}
+    try:
+        for fp, name in names.items():
+            stage_source(fp, tmpdir, f"{name}.c")
+
+        def make(mods, targets):
+            with open(os.path.join(tmpdir, "Makefile"), "w") as fh:
+                fh.write("obj-m := " + " ".join(f"{m}.o" for m in mods) + "\n")
+            cmd = ["make", "-C", kernel_build_dir, f"M={tmpdir}", f"-j{jobs}",
+                   "--output-sync=target"] + targets
+            return _run_proc(cmd, timeout=240 + 30 * len(mods))
+
+        # Pass 1: compile every object, keep going past failures
+        mods = list(names.values())
+        _, out = make(mods, ["-k"] + [f"{m}.o" for m in mods])
+        logs = _split_kbuild_output(out, mods)
+        compiled = [m for m in mods if os.path.exists(os.path.join(tmpdir, f"{m}.o"))]
+
+        # Pass 2: modpost + link for the objects that compiled
+        linked = list(compiled)
+        link_logs = {}
+        while linked:
+            ret, out = make(linked, ["modules"])
+            link_logs = _split_kbuild_output(out, linked)
+            if ret == 0:
+                break
+            rejected = {m for m, lines in link_logs.items()
+                        if any(l.startswith("ERROR: modpost") for l in lines)}
+            if not rejected:
+                linked = []
+                break
+            for m in rejected:
+                logs[m].extend(link_logs[m])
+            linked = [m for m in linked if m not in rejected]
+        for m, lines in link_logs.items():
+            if m in linked:
+                logs[m].extend(lines)
+
+        for fp, name in names.items():
+            output = "\n".join(logs.get(name, [])).replace(os.path.join(tmpdir, f"{name}.c"), fp)
+            ko = os.path.join(tmpdir, f"{name}.ko")
+            result = {
+                "success": name in linked and os.path.exists(ko),
+                "method": "kbuild-batch",
+                "output": output,
+                "errors": len(re.findall(r"\berror:", output)),
+                "warnings": len(re.findall(r"\bwarning:", output)),
+            }
+            if os.path.exists(ko):
+                result["built_module"] = f"{name}.ko"
+                if keep_artifact and result["success"]:
+                    build_dir = make_workspace("evaluator_kbuild_")
+                    shutil.copy2(ko, build_dir)
+                    build_log = os.path.join(build_dir, "build.log")
+                    with open(build_log, "w") as fh:
+                        fh.write(output)
+                    result["artifact"] = {
+                        "ko_path": os.path.join(build_dir, f"{name}.ko"),
+                        "build_dir": build_dir,
+                        "build_log": build_log,
+                    }
+            if _needs_gcc_fallback(result):
+                result = run_gcc_fallback(fp, result)
+            results[fp] = result
+    except Exception as e:
+        for fp in file_paths:
+            results.setdefault(fp, {
+                "success": False,
+                "method": "kbuild-batch",
+                "output": f"Kbuild batch exception: {e}",
+                "errors": 0,
+                "warnings": 0,
+            })
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    return results
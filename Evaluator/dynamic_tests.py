@@ -1,8 +1,14 @@
 import os
 import threading
-import subprocess
 import time
 
+from kmsg import KernelLogTap
+from bandwidth import run_bandwidth_sweep
+from loadgen import run_scaling_sweep
+
+# Reason given for write probes skipped against a guessed /dev node
+UNVERIFIED = "device node not verified"
+
 
 def _find_device_node(driver_name):
     """
@@ -30,16 +36,19 @@ def _find_device_node(driver_name):
     return None
 
 
-def _basic_io_test(dev_node):
+def _basic_io_test(dev_node, writable=True):
     notes = []
     success = True
-    try:
-        with open(dev_node, "w") as f:
-            f.write("hello\n")
-        notes.append("write ok")
-    except Exception as e:
-        notes.append(f"write failed: {e}")
-        success = False
+    if not writable:
+        notes.append(f"write skipped: {UNVERIFIED}")
+    else:
+        try:
+            with open(dev_node, "w") as f:
+                f.write("hello\n")
+            notes.append("write ok")
+        except Exception as e:
+            notes.append(f"write failed: {e}")
+            success = False
 
     try:
         with open(dev_node, "r") as f:
@@ -94,15 +103,36 @@ def _stress_test(dev_node, duration=1.0):
     return success, notes
 
 
-def _dmesg_diff(before, after):
+def run_dynamic_tests(driver_name, tap=None, load_procs=None, load_duration=0.5,
+                      bandwidth=True, mmap_length=None, dev_node=None, guess_node=True):
     """
-    Compare dmesg logs before and after runtime tests.
+    Probe the driver's device node with I/O, concurrency and stress tests,
+    then a multi-process load sweep (see loadgen.run_scaling_sweep) from 1 to
+    `load_procs` processes (default: CPU count; 0 disables it) and a
+    block-size bandwidth sweep (see bandwidth.run_bandwidth_sweep; mmap is
+    probed only when `mmap_length` is given).
+    `dev_node` is the node the module session saw appear after insmod. The
+    usual /dev names are guessed only when it is not given and `guess_node`
+    is true; a module session passes guess_node=False, so a module whose node
+    it could not find has its probes skipped instead of run against a guess.
+    Writes (basic I/O write, concurrency, stress, load sweep, bandwidth
+    writes and mmap) only go to a node the session tied to the module; a
+    guessed node gets read-only probes.
+    `tap` is the runtime stage's KernelLogTap; kernel messages are tagged with
+    the test phase that produced them. A private tap is opened if none is given.
     """
-    new_lines = [line for line in after if line not in before]
-    return new_lines if new_lines else ["no new dmesg output"]
+    own_tap = tap is None
+    if own_tap:
+        tap = KernelLogTap()
+    try:
+        return _run_probes(driver_name, tap, load_procs, load_duration, bandwidth, mmap_length,
+                           dev_node, guess_node)
+    finally:
+        if own_tap:
+            tap.close()
 
 
-def run_dynamic_tests(driver_name):
+def _run_probes(driver_name, tap, load_procs, load_duration, bandwidth, mmap_length, dev_node, guess_node):
     results = {
         "device_found": False,
         "io_success": False,
@@ -111,17 +141,14 @@ def run_dynamic_tests(driver_name):
         "notes": [],
     }
 
-    # Capture dmesg before tests
-    try:
-        before = subprocess.run(
-            ["dmesg", "--kernel", "--color=never"],
-            capture_output=True,
-            text=True,
-        ).stdout.splitlines()
-    except Exception:
-        before = []
-
-    dev_node = _find_device_node(driver_name)
+    tap.set_phase("probe")
+    # Only a node the module session tied to the module may be written blindly
+    verified = dev_node is not None
+    if not verified and not guess_node:
+        results["skipped"] = "module session found no device node for the module"
+        results["notes"].append(f"probes skipped: {results['skipped']}")
+        return results
+    dev_node = dev_node or _find_device_node(driver_name)
     if not dev_node:
         results["notes"].append("No device node found under /dev/ or /proc/devices")
         return results
@@ -130,31 +157,69 @@ def run_dynamic_tests(driver_name):
     results["notes"].append(f"device node detected: {dev_node}")
 
     # Basic I/O
-    io_ok, io_notes = _basic_io_test(dev_node)
+    tap.set_phase("io")
+    io_ok, io_notes = _basic_io_test(dev_node, writable=verified)
     results["io_success"] = io_ok
     results["notes"].extend(io_notes)
 
-    # Concurrency
-    conc_ok, conc_notes = _concurrency_test(dev_node)
-    results["concurrency_success"] = conc_ok
-    results["notes"].extend(conc_notes)
+    if not verified:
+        results["notes"].append(f"concurrency, stress and load probes skipped: {UNVERIFIED}")
+    else:
+        # Concurrency
+        tap.set_phase("concurrency")
+        conc_ok, conc_notes = _concurrency_test(dev_node)
+        results["concurrency_success"] = conc_ok
+        results["notes"].extend(conc_notes)
+
+        # Stress test
+        tap.set_phase("stress")
+        stress_ok, stress_notes = _stress_test(dev_node)
+        results["stress_success"] = stress_ok
+        results["notes"].extend(stress_notes)
+
+    # Load generation: separate processes, unbuffered I/O, latency percentiles
+    if load_procs != 0 and verified:
+        tap.set_phase("load")
+        try:
+            load = run_scaling_sweep(dev_node, max_procs=load_procs, duration=load_duration)
+            results["load"] = load
+            results["notes"].append(
+                f"load sweep: peak {load['peak_ops_per_sec']:.0f} ops/s, "
+                f"scaling efficiency {load['final_scaling_efficiency']:.2f} "
+                f"at {load['levels'][-1]['procs']} procs, error rate {load['error_rate']:.3f}"
+            )
+        except Exception as e:
+            results["notes"].append(f"load sweep failed: {e}")
 
-    # Stress test
-    stress_ok, stress_notes = _stress_test(dev_node)
-    results["stress_success"] = stress_ok
-    results["notes"].extend(stress_notes)
+    # Bandwidth vs. request size, 1 B .. 4 MB
+    if bandwidth:
+        tap.set_phase("bandwidth")
+        try:
+            bw = run_bandwidth_sweep(dev_node, mmap_length=mmap_length, writable=verified)
+            results["bandwidth"] = bw
+            for direction in ("write", "read"):
+                summary = bw.get(f"{direction}_summary")
+                if summary:
+                    results["notes"].append(
+                        f"{direction} bandwidth: peak {summary['peak_mb_per_sec']:.1f} MB/s "
+                        f"at {summary['peak_size']} B requests"
+                    )
+            if "mmap" in bw:
+                results["notes"].append(
+                    f"mmap: {bw['mmap']['mb_per_sec']:.1f} MB/s" if bw["mmap"].get("supported")
+                    else f"mmap failed: {bw['mmap'].get('error')}"
+                )
+        except Exception as e:
+            results["notes"].append(f"bandwidth sweep failed: {e}")
 
-    # Capture dmesg after tests
-    try:
-        after = subprocess.run(
-            ["dmesg", "--kernel", "--color=never"],
-            capture_output=True,
-            text=True,
-        ).stdout.splitlines()
-        diff = _dmesg_diff(before, after)
-        results["notes"].append("dmesg diff:")
-        results["notes"].extend(diff)
-    except Exception:
+    # Kernel messages logged during the probes
+    tap.set_phase(None)
+    if not tap.available:
         results["notes"].append("dmesg not accessible")
+    else:
+        lines = [f"[{r['phase']}] {r['message']}" for r in tap.records
+                 if r["phase"] in ("probe", "io", "concurrency", "stress", "load", "bandwidth")]
+        results["notes"].append("dmesg diff:")
+        results["notes"].extend(lines or ["no new dmesg output"])
 
     return results
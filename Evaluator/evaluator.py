@@ -1,63 +1,168 @@
 # evaluator.py
-from compile_checker import run_compilation
+from compile_checker import run_compilation, release_artifact
 from parser import analyze_code_structure
-from style_checker import run_style_check
+from style_checker import run_style_check, checkpatch_available
 from security_checker import run_security_check
 from performance_checker import run_performance_check
 from scoring import calculate_score
 from reporter import generate_report
 from logger import log_score
-from runtime_checker import run_runtime_checks
+from runtime_checker import run_runtime_stage
+from source_unit import SourceUnit
+from cache import StageCache, DEFAULT_CACHE_DIR
+from profiling import stage_timer, profiled
+from workspace import use_tmpfs
 
+import argparse
 import sys
 import os
 
-def main(file_path):
-    results = {}
-
-    # Ensure file exists
-    if not os.path.exists(file_path):
-        print(f"File not found: {file_path}")
-        return
 
-    # 1. Compile the driver
-    results["compilation"] = run_compilation(file_path)
+_NO_CACHE = StageCache(mode="off")
 
-    # 2. Parse code structure
-    results["structure"] = analyze_code_structure(file_path)
 
-    # 3. Style compliance
-    results["style"] = run_style_check(file_path)
+def evaluate(file_path, cache=None, compilation=None):
+    """
+    Run the full evaluation pipeline on one driver and return the results dict.
+    Does not print or log anything, so it can be used from batch workers.
+    `cache` is an optional StageCache; stages with unchanged inputs are served from it.
+    `compilation` is an optional precomputed compilation result (e.g. from
+    compile_checker.run_compilation_batch); it is stored in the cache as-is.
+    """
+    cache = cache or _NO_CACHE
+    results = {}
+    timings = {}
+
+    with stage_timer(timings, "total"):
+        # Load the source once; every static checker shares this view
+        with stage_timer(timings, "load"):
+            source = SourceUnit.from_file(file_path)
+
+        # 1. Compile the driver
+        with stage_timer(timings, "compilation"):
+            if compilation is None:
+                results["compilation"] = cache.stage(
+                    "compilation", source, run_compilation, file_path, True
+                )
+            else:
+                results["compilation"] = compilation
+                cache.store("compilation", source, compilation)
+
+        # 2. Parse code structure
+        with stage_timer(timings, "structure"):
+            results["structure"] = cache.stage("structure", source, analyze_code_structure, source)
+
+        # 3. Style compliance
+        with stage_timer(timings, "style"):
+            results["style"] = cache.stage(
+                "style", source, run_style_check, source, extra=str(checkpatch_available())
+            )
+
+        # 4. Security checks
+        with stage_timer(timings, "security"):
+            results["security"] = cache.stage("security", source, run_security_check, source)
+
+        # Attach meta file path for advanced heuristics
+        results["meta_file"] = file_path
+        results["source_hash"] = source.digest
+
+        # 5. Performance checks
+        with stage_timer(timings, "performance"):
+            results["performance"] = cache.stage(
+                "performance", source, run_performance_check, source, results["structure"]
+            )
+
+        # Runtime checks reuse the compiled .ko; skipped if compilation failed
+        with stage_timer(timings, "runtime"):
+            try:
+                results["runtime"] = cache.stage(
+                    "runtime", source, run_runtime_stage, file_path, results["compilation"]
+                )
+            finally:
+                release_artifact(results["compilation"])
+
+        # 6. Scoring
+        with stage_timer(timings, "scoring"):
+            final_score, breakdown = calculate_score(results, source)
 
-    # 4. Security checks
-    results["security"] = run_security_check(file_path)
+    results["overall_score"] = final_score
+    results["breakdown"] = breakdown
+    results["timings"] = timings
 
-    # Attach meta file path for advanced heuristics
-    results["meta_file"] = file_path
+    return results
 
-    # 5. Performance checks
-    results["performance"] = run_performance_check(file_path, results["structure"])
 
-    # Runtime checks
-    runtime_results = run_runtime_checks(file_path)
-    results["runtime"] = runtime_results
-    
-    # 6. Scoring
-    final_score, breakdown = calculate_score(results)
+def main(file_path, cache=None, use_async=False, tiered=False, threshold=0.0):
+    # Ensure file exists
+    if not os.path.exists(file_path):
+        print(f"File not found: {file_path}")
+        return
 
-    results["overall_score"] = final_score
-    results["breakdown"] = breakdown
+    if tiered:
+        from triage import evaluate_tiered
+        results = evaluate_tiered(file_path, cache, threshold)
+    elif use_async:
+        from orchestrator import evaluate_concurrent
+        results = evaluate_concurrent(file_path, cache)
+    else:
+        results = evaluate(file_path, cache)
 
     # Reporting
     # generate_report(results, file_path)
 
     # Logging
-    log_score(file_path, results, final_score,breakdown)
+    log_score(file_path, results, results["overall_score"], results["breakdown"])
 
+    return results
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
+    ap = argparse.ArgumentParser(description="Evaluate Linux kernel driver sources.")
+    ap.add_argument("file", nargs="?", help="driver source file to evaluate")
+    ap.add_argument("--batch", metavar="DIR", help="evaluate every .c file under DIR")
+    ap.add_argument("--jobs", type=int, default=None, help="worker processes for --batch (default: CPU count)")
+    ap.add_argument("--output", default=None, help="JSONL results stream for --batch")
+    ap.add_argument("--resume", action="store_true",
+                    help="with --batch, continue an interrupted run from its checkpoint manifest")
+    ap.add_argument("--kbuild-batch", type=int, default=0, metavar="N",
+                    help="with --batch, compile N drivers per kbuild invocation")
+    ap.add_argument("--checkpatch-batch", type=int, default=0, metavar="N",
+                    help="with --batch, style-check N drivers per checkpatch.pl process")
+    ap.add_argument("--async", dest="use_async", action="store_true",
+                    help="overlap independent stages with the asyncio orchestrator")
+    ap.add_argument("--profile", metavar="FILE", default=None,
+                    help="run under cProfile and write pstats to FILE")
+    ap.add_argument("--no-cache", action="store_true", help="do not read or write the stage result cache")
+    ap.add_argument("--refresh", action="store_true", help="ignore cached results but store fresh ones")
+    ap.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="stage result cache directory")
+    ap.add_argument("--tmpfs", action="store_true", help="build in workspaces on /dev/shm")
+    ap.add_argument("--tiered", action="store_true",
+                    help="run build/runtime tiers only when they can still change the outcome")
+    ap.add_argument("--threshold", type=float, default=0.0,
+                    help="with --tiered, skip expensive tiers once the best possible score is below this")
+    ap.add_argument("--dedup", action="store_true",
+                    help="report duplicate/near-duplicate drivers; reuse build/runtime results for "
+                         "same-named copies that differ only in layout/comments")
+    ap.add_argument("--dedup-threshold", type=float, default=0.8,
+                    help="with --batch --dedup, similarity for reporting near-duplicate clusters")
+    args = ap.parse_args()
+
+    if args.tmpfs and not use_tmpfs():
+        print("/dev/shm is not writable; using the default temp directory")
+
+    cache_mode = "off" if args.no_cache else ("refresh" if args.refresh else "on")
+    cache = StageCache(cache_dir=args.cache_dir, mode=cache_mode, normalize=args.dedup)
+
+    if args.batch:
+        from batch import run_batch
+        run_batch(args.batch, jobs=args.jobs, output=args.output, cache=cache,
+                  kbuild_batch=args.kbuild_batch, checkpatch_batch=args.checkpatch_batch,
+                  profile=args.profile, use_async=args.use_async, resume=args.resume,
+                  tiered=args.tiered, threshold=args.threshold,
+                  dedup=args.dedup, dedup_threshold=args.dedup_threshold)
+    elif args.file:
+        with profiled(args.profile):
+            main(args.file, cache, args.use_async, args.tiered, args.threshold)
+    else:
         print("Usage: python evaluator.py <driver.c>")
         sys.exit(1)
-    main(sys.argv[1])
@@ -0,0 +1,239 @@
+# fingerprint.py
+import argparse
+import hashlib
+import json
+import os
+import struct
+from collections import defaultdict
+
+from source_unit import load_source
+
+# Directive lines end at a newline, so keep that boundary in the token stream
+_EOL = "\n"
+# Emitted between a #define'd name and a "(" written right after it: that
+# makes a function-like macro, "#define FOO (x)" an object-like one
+_FN_MACRO = "#fn"
+_DECLARATOR_NEXT = {"=", ";", "[", ",", ")"}
+_MERSENNE = (1 << 61) - 1
+
+
+def _code_tokens(src):
+    """
+    (kind, text) for every token of `src`, comments and whitespace dropped.
+    String/char literals keep their contents (the stripped view blanks them),
+    an end-of-line marker closes each preprocessor line and a function-like
+    macro's name is followed by _FN_MACRO.
+    """
+    out = []
+    directive_line = None
+    for tok in src.tokens:
+        line = src.line_of(tok.start)
+        if directive_line is not None and line != directive_line:
+            out.append(("eol", _EOL))
+            directive_line = None
+        if tok.text == "#" and src.lines[line - 1].lstrip().startswith("#"):
+            directive_line = line
+        if tok.kind == "string":
+            out.append(("string", src.text[tok.start:tok.start + len(tok.text)]))
+        else:
+            out.append((tok.kind, tok.text))
+        if directive_line is not None and tok.kind == "ident" and len(out) >= 3 and \
+                out[-2][1] == "define" and out[-3][1] == "#" and \
+                src.stripped.startswith("(", tok.start + len(tok.text)):
+            out.append(("macro", _FN_MACRO))
+        if directive_line is not None and src.lines[line - 1].rstrip().endswith("\\"):
+            directive_line = line + 1
+    return out
+
+
+def token_digest(source):
+    """
+    sha256 of the driver's token stream: equal for files that differ only in
+    whitespace, indentation and comments, which compile and load identically
+    (the one significant space, after a #define'd name, is kept as _FN_MACRO).
+    """
+    src = load_source(source)
+    digest = getattr(src, "_token_digest", None)
+    if digest is None:
+        h = hashlib.sha256()
+        for _, text in _code_tokens(src):
+            h.update(text.encode("utf-8", "replace"))
+            h.update(b"\0")
+        digest = src._token_digest = h.hexdigest()
+    return digest
+
+
+def _declared_names(src, tokens):
+    """Identifiers the driver itself defines: its functions and declared variables/fields."""
+    names = {fn.name for fn in src.functions}
+    for i in range(1, len(tokens) - 1):
+        kind, text = tokens[i]
+        if kind == "ident" and tokens[i + 1][1] in _DECLARATOR_NEXT and \
+                (tokens[i - 1][0] == "ident" or tokens[i - 1][1] == "*"):
+            names.add(text)
+    return names
+
+
+def shape_tokens(source):
+    """
+    Token stream with the driver's own identifiers replaced by "$", so
+    renaming a function or variable does not change it. Kernel API names,
+    keywords, literals and operators are kept.
+    """
+    src = load_source(source)
+    tokens = _code_tokens(src)
+    own = _declared_names(src, tokens)
+    return ["$" if kind == "ident" and text in own else text for kind, text in tokens]
+
+
+def _hash64(data):
+    return struct.unpack("<Q", hashlib.blake2b(data, digest_size=8).digest())[0]
+
+
+# Fixed (a, b) pairs for the universal hashes (a*x + b) mod p, derived from
+# their index so signatures are comparable across runs and machines
+_PERMUTATIONS = [
+    (_hash64(b"a%d" % i) % (_MERSENNE - 1) + 1, _hash64(b"b%d" % i) % _MERSENNE)
+    for i in range(128)
+]
+
+
+def minhash(source, shingle=5, num_perm=64):
+    """MinHash signature (num_perm ints) of the set of `shingle`-token windows of shape_tokens()."""
+    toks = shape_tokens(source)
+    grams = {
+        _hash64("\0".join(toks[i:i + shingle]).encode("utf-8", "replace"))
+        for i in range(max(1, len(toks) - shingle + 1))
+    }
+    return [
+        min((a * g + b) % _MERSENNE for g in grams)
+        for a, b in _PERMUTATIONS[:num_perm]
+    ]
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+class LSHIndex:
+    """
+    Locality-sensitive hashing over MinHash signatures: each signature is
+    cut into `bands` bands of `rows` values and filed under each band, so
+    only drivers sharing at least one band are ever compared. With the
+    defaults (16 x 4) pairs above ~0.6 similarity are almost always found.
+    """
+
+    def __init__(self, bands=16, rows=4):
+        self.bands = bands
+        self.rows = rows
+        self.buckets = defaultdict(list)
+        self.signatures = {}
+
+    def add(self, key, sig):
+        self.signatures[key] = sig
+        for b in range(self.bands):
+            band = tuple(sig[b * self.rows:(b + 1) * self.rows])
+            self.buckets[(b, band)].append(key)
+
+    def pairs(self, threshold):
+        """(key_a, key_b, similarity) for every candidate pair at or above `threshold`."""
+        seen = set()
+        for keys in self.buckets.values():
+            for i, a in enumerate(keys):
+                for b in keys[i + 1:]:
+                    pair = (a, b) if a < b else (b, a)
+                    if pair in seen:
+                        continue
+                    seen.add(pair)
+                    sim = similarity(self.signatures[a], self.signatures[b])
+                    if sim >= threshold:
+                        yield pair[0], pair[1], sim
+
+
+def _union_find_groups(keys, pairs):
+    parent = {k: k for k in keys}
+
+    def find(k):
+        while parent[k] != k:
+            parent[k] = parent[parent[k]]
+            k = parent[k]
+        return k
+
+    for a, b in pairs:
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    groups = defaultdict(list)
+    for k in keys:
+        groups[find(k)].append(k)
+    return [sorted(g) for g in groups.values() if len(g) > 1]
+
+
+def duplicate_groups(files):
+    """Groups (2+ files) whose token streams are identical; first file = representative."""
+    by_digest = defaultdict(list)
+    for f in files:
+        by_digest[token_digest(f)].append(f)
+    return [sorted(g) for g in by_digest.values() if len(g) > 1]
+
+
+def near_duplicate_clusters(files, threshold=0.8, shingle=5, bands=16, rows=4):
+    """
+    Clusters of drivers whose estimated similarity (MinHash over
+    shape_tokens() shingles, candidates from LSH) is at least `threshold`,
+    linked transitively. Each cluster is {"files", "pairs"} with the
+    similarity of every linked pair; the first file is the representative.
+    """
+    index = LSHIndex(bands, rows)
+    for f in files:
+        index.add(f, minhash(f, shingle, bands * rows))
+    pairs = list(index.pairs(threshold))
+    clusters = []
+    for group in _union_find_groups(files, [(a, b) for a, b, _ in pairs]):
+        members = set(group)
+        clusters.append({
+            "files": group,
+            "pairs": [{"a": a, "b": b, "similarity": round(s, 3)}
+                      for a, b, s in pairs if a in members],
+        })
+    return clusters
+
+
+def corpus_report(files, threshold=0.8):
+    """Exact (token-identical) groups and near-duplicate clusters for a list of drivers."""
+    return {
+        "files": len(files),
+        "threshold": threshold,
+        "duplicates": duplicate_groups(files),
+        "clusters": near_duplicate_clusters(files, threshold),
+    }
+
+
+def print_report(report):
+    print(f"\n=== Duplicates ({report['files']} files) ===")
+    for group in report["duplicates"]:
+        print(f"identical tokens: {', '.join(os.path.basename(f) for f in group)}")
+    if not report["duplicates"]:
+        print("no token-identical files")
+    for cluster in report["clusters"]:
+        names = ", ".join(os.path.basename(f) for f in cluster["files"])
+        best = max(p["similarity"] for p in cluster["pairs"])
+        print(f"near-duplicates (>= {report['threshold']:.2f}, max {best:.2f}): {names}")
+    if not report["clusters"]:
+        print(f"no near-duplicate clusters at {report['threshold']:.2f}")
+
+
+if __name__ == "__main__":
+    from batch import collect_drivers
+
+    ap = argparse.ArgumentParser(description="Find duplicate and near-duplicate drivers in a corpus.")
+    ap.add_argument("directory", help="directory of .c drivers")
+    ap.add_argument("--threshold", type=float, default=0.8, help="near-duplicate similarity (0..1)")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = ap.parse_args()
+    rep = corpus_report(collect_drivers(args.directory), args.threshold)
+    if args.json:
+        print(json.dumps(rep, indent=4))
+    else:
+        print_report(rep)
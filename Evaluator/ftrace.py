@@ -0,0 +1,244 @@
+# ftrace.py
+import fcntl
+import glob
+import os
+import re
+import tempfile
+
+TRACEFS_CANDIDATES = ["/sys/kernel/tracing", "/sys/kernel/debug/tracing"]
+# Serializes profilers that have to change the global tracefs state
+LOCK_FILE = os.path.join(tempfile.gettempdir(), "evaluator-ftrace.lock")
+
+# trace_stat/functionN rows: "  name   hits   1234.567 us   12.345 us   ..."
+_PROFILE_ROW_RE = re.compile(r"^\s*(\S+)\s+(\d+)\s+([\d.]+) us\s+([\d.]+) us")
+# function_graph rows carrying a duration: leaf "func();" or, with
+# funcgraph-tail, the closing "} /* func */" of a nested call
+_GRAPH_ROW_RE = re.compile(r"([\d.]+) us\s+\|\s+(?:(\w+)\(\);|\} /\* (\w+) \*/)")
+
+
+def find_tracefs():
+    """Mounted tracefs directory, or None."""
+    for path in TRACEFS_CANDIDATES:
+        if os.path.exists(os.path.join(path, "set_ftrace_filter")):
+            return path
+    return None
+
+
+def _write(path, value):
+    with open(path, "w") as f:
+        f.write(value)
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+class FunctionProfiler:
+    """
+    Per-function kernel time for one module while a block of code runs.
+
+    Filters ftrace to the module's symbols (":mod:<name>") and uses the
+    function profiler (trace_stat/function*, hit counts and total time per
+    function) when the kernel has CONFIG_FUNCTION_PROFILER, else the
+    function_graph tracer, summing durations from the trace buffer.
+    function_graph runs in a private tracefs instance (instances/<name>)
+    where the kernel supports it, so nothing global is touched. Otherwise
+    the global tracefs files are used under an exclusive lock on LOCK_FILE
+    (another profiler holding it means this one is skipped), and their
+    previous state is restored afterwards. Without tracefs, or when the
+    module has no traceable symbols, `available` is False and report() just
+    carries the reason.
+    """
+
+    def __init__(self, module, tracefs=None):
+        self.module = module
+        self.tracefs = tracefs or find_tracefs()
+        self.root = self.tracefs
+        self.mode = None
+        self.error = None if self.tracefs else "tracefs not mounted"
+        self.instance = None
+        self._lock = None
+        self._saved = None
+        self._stats = None
+
+    @property
+    def available(self):
+        return self.mode is not None
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        if not self.tracefs or self._start_instance() or not self._acquire():
+            return
+        try:
+            self._save()
+            _write(self._path("set_ftrace_filter"), f":mod:{self.module}\n")
+            if not _read(self._path("set_ftrace_filter")).strip():
+                self.error = f"no traceable symbols for module {self.module}"
+                self._reset()
+                return
+            if os.path.exists(self._path("function_profile_enabled")):
+                # Toggling the profiler off and on resets its counters
+                _write(self._path("function_profile_enabled"), "0")
+                _write(self._path("function_profile_enabled"), "1")
+                self.mode = "function_profile"
+            else:
+                _write(self._path("trace"), "")
+                # funcgraph-* options only exist while function_graph is the tracer
+                _write(self._path("current_tracer"), "function_graph")
+                _write(self._path("trace_options"), "funcgraph-tail")
+                # The host may have tracing off; _reset() restores its setting
+                _write(self._path("tracing_on"), "1")
+                self.mode = "function_graph"
+        except OSError as e:
+            self.error = f"ftrace setup failed: {e}"
+            self._reset()
+
+    def _start_instance(self):
+        """
+        function_graph in a private tracefs instance; False (nothing left
+        behind) where instances or function_graph in them are unsupported.
+        """
+        path = os.path.join(self.tracefs, "instances", f"evaluator-{os.getpid()}")
+        try:
+            os.mkdir(path)
+        except OSError:
+            return False
+        self.instance = self.root = path
+        try:
+            _write(self._path("set_ftrace_filter"), f":mod:{self.module}\n")
+            if not _read(self._path("set_ftrace_filter")).strip():
+                self.error = f"no traceable symbols for module {self.module}"
+                self._reset()
+                return True
+            _write(self._path("current_tracer"), "function_graph")
+            _write(self._path("trace_options"), "funcgraph-tail")
+        except OSError:
+            self._reset()
+            return False
+        self.mode = "function_graph"
+        return True
+
+    def _acquire(self):
+        try:
+            fd = os.open(LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o600)
+        except OSError as e:
+            self.error = f"ftrace lock failed: {e}"
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            self.error = f"tracefs busy: another profiler holds {LOCK_FILE}"
+            return False
+        self._lock = fd
+        return True
+
+    def _save(self):
+        """Global tracefs settings this profiler may change."""
+        filters = _read(self._path("set_ftrace_filter")).splitlines()
+        self._saved = {
+            "set_ftrace_filter": [f for f in filters if f.strip() and not f.startswith("#")],
+            "current_tracer": _read(self._path("current_tracer")).strip(),
+            "tracing_on": _read(self._path("tracing_on")).strip(),
+        }
+        if os.path.exists(self._path("function_profile_enabled")):
+            self._saved["function_profile_enabled"] = _read(self._path("function_profile_enabled")).strip()
+
+    def stop(self):
+        if not self.available:
+            return
+        try:
+            if self.mode == "function_profile":
+                _write(self._path("function_profile_enabled"), "0")
+                self._stats = self._read_profile()
+            else:
+                _write(self._path("tracing_on"), "0")
+                self._stats = self._read_graph()
+        except OSError as e:
+            self.error = f"ftrace read failed: {e}"
+        finally:
+            self._reset()
+
+    def _reset(self):
+        """Leave tracefs as we found it: remove our instance, or restore the saved global state."""
+        try:
+            if self.instance:
+                try:
+                    _write(self._path("current_tracer"), "nop")
+                except OSError:
+                    pass
+                os.rmdir(self.instance)
+            elif self._saved:
+                saved = self._saved
+                _write(self._path("set_ftrace_filter"), "")
+                if saved["set_ftrace_filter"]:
+                    _write(self._path("set_ftrace_filter"), "\n".join(saved["set_ftrace_filter"]) + "\n")
+                if "function_profile_enabled" in saved:
+                    _write(self._path("function_profile_enabled"), saved["function_profile_enabled"])
+                if self.mode == "function_graph":
+                    _write(self._path("trace_options"), "nofuncgraph-tail")
+                _write(self._path("current_tracer"), saved["current_tracer"])
+                _write(self._path("tracing_on"), saved["tracing_on"])
+        except OSError:
+            pass
+        finally:
+            self.instance = self._saved = None
+            self.root = self.tracefs
+            if self._lock is not None:
+                os.close(self._lock)
+                self._lock = None
+
+    def _read_profile(self):
+        # Stats survive disabling the profiler; one file per CPU
+        stats = {}
+        for path in glob.glob(self._path("trace_stat/function*")):
+            for line in _read(path).splitlines():
+                m = _PROFILE_ROW_RE.match(line)
+                if not m:
+                    continue
+                hits, total = stats.get(m.group(1), (0, 0.0))
+                stats[m.group(1)] = (hits + int(m.group(2)), total + float(m.group(3)))
+        return stats
+
+    def _read_graph(self):
+        stats = {}
+        with open(self._path("trace")) as f:
+            for line in f:
+                m = _GRAPH_ROW_RE.search(line)
+                if not m:
+                    continue
+                name = m.group(2) or m.group(3)
+                hits, total = stats.get(name, (0, 0.0))
+                stats[name] = (hits + 1, total + float(m.group(1)))
+        return stats
+
+    def report(self, top=15):
+        """Ranked hot-function table (by cumulative time) plus how it was collected."""
+        report = {"available": self.available, "mode": self.mode, "hot_functions": []}
+        if self.error:
+            report["error"] = self.error
+        if not self._stats:
+            return report
+        grand = sum(total for _, total in self._stats.values()) or 1.0
+        ranked = sorted(self._stats.items(), key=lambda kv: kv[1][1], reverse=True)
+        report["hot_functions"] = [
+            {
+                "function": name,
+                "hits": hits,
+                "total_us": round(total, 3),
+                "avg_us": round(total / hits, 3) if hits else 0.0,
+                "share": round(total / grand, 4),
+            }
+            for name, (hits, total) in ranked[:top]
+        ]
+        return report
@@ -0,0 +1,112 @@
+# function_index.py
+import re
+from collections import namedtuple
+
+Function = namedtuple(
+    "Function",
+    ["name", "start", "end", "start_line", "end_line", "length", "depth", "body"],
+)
+Function.__doc__ = """
+One function definition found in a driver source.
+  start/end            - character offsets of the header start and closing brace
+  start_line/end_line  - 1-based line span
+  length               - number of lines spanned (end_line - start_line + 1)
+  depth                - deepest brace nesting inside the body (body itself = 1)
+  body                 - raw text from the opening to the closing brace
+"""
+
+# Preprocessor directives, including backslash-continued lines
+_DIRECTIVE_RE = re.compile(r"^[ \t]*#(?:[^\n]*\\\n)*[^\n]*", re.MULTILINE)
+
+_NOT_FUNCTIONS = {"if", "for", "while", "switch", "return", "sizeof", "do", "else"}
+
+
+def _code_tokens(src):
+    """Tokens of the stripped source, excluding preprocessor directives."""
+    ranges = [(m.start(), m.end()) for m in _DIRECTIVE_RE.finditer(src.stripped)]
+    out = []
+    r = 0
+    for tok in src.tokens:
+        while r < len(ranges) and ranges[r][1] <= tok.start:
+            r += 1
+        if r < len(ranges) and ranges[r][0] <= tok.start:
+            continue
+        out.append(tok)
+    return out
+
+
+def build_function_index(src):
+    """
+    Single pass over the token stream of a SourceUnit, returning a list of
+    Function records in source order. Braces inside comments and string/char
+    literals are ignored because the token stream is built from the stripped view.
+    """
+    tokens = _code_tokens(src)
+    functions = []
+    paren_stack = []
+    paren_match = {}
+    depth = 0
+    current = None  # (name, start, body_start, max_depth) of the open function
+
+    for i, tok in enumerate(tokens):
+        t = tok.text
+        if t == "(":
+            paren_stack.append(i)
+        elif t == ")":
+            if paren_stack:
+                paren_match[i] = paren_stack.pop()
+        elif t == "{":
+            if depth == 0:
+                current = _function_header(tokens, i, paren_match)
+            depth += 1
+            if current is not None and depth > current[3]:
+                current = current[:3] + (depth,)
+        elif t == "}":
+            if depth == 0:
+                continue
+            depth -= 1
+            if depth == 0 and current is not None:
+                name, start, body_start, max_depth = current
+                functions.append(_make_function(src, name, start, body_start, tok.start, max_depth))
+                current = None
+
+    # Unterminated function at EOF: close it at the end of the file
+    if current is not None:
+        name, start, body_start, max_depth = current
+        functions.append(_make_function(src, name, start, body_start, max(0, len(src.text) - 1), max_depth))
+
+    return functions
+
+
+def _function_header(tokens, brace_idx, paren_match):
+    """
+    If the top-level `{` at brace_idx opens a function body, return
+    (name, header_start, body_start, 0); otherwise None.
+    """
+    close = brace_idx - 1
+    if close < 0 or tokens[close].text != ")" or close not in paren_match:
+        return None
+    name_idx = paren_match[close] - 1
+    if name_idx < 0 or tokens[name_idx].kind != "ident" or tokens[name_idx].text in _NOT_FUNCTIONS:
+        return None
+
+    # Walk back over the return type and qualifiers (identifiers and '*')
+    first = name_idx
+    while first > 0 and (tokens[first - 1].kind == "ident" or tokens[first - 1].text == "*"):
+        first -= 1
+    return (tokens[name_idx].text, tokens[first].start, tokens[brace_idx].start, 0)
+
+
+def _make_function(src, name, start, body_start, end, max_depth):
+    start_line = src.line_of(start)
+    end_line = src.line_of(end)
+    return Function(
+        name=name,
+        start=start,
+        end=end,
+        start_line=start_line,
+        end_line=end_line,
+        length=end_line - start_line + 1,
+        depth=max_depth,
+        body=src.text[body_start:end + 1],
+    )
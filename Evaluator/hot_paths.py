@@ -0,0 +1,247 @@
+# hot_paths.py
+import bisect
+from collections import deque
+
+from source_unit import load_source
+
+# How often a path runs, as a weight for the cost of what it does
+HOT = 1.0    # per I/O request, packet or interrupt
+WARM = 0.5   # per open/close, per ioctl-style control call, periodic timers
+COLD = 0.2   # setup and teardown callbacks (ndo_open, probe, ...)
+RARE = 0.1  # module init/exit and code not reached from any known entry point
+
+# Operation tables: struct type -> {field: hotness}; fields not listed are COLD
+OPS_TABLES = {
+    "file_operations": {
+        "read": HOT, "write": HOT, "read_iter": HOT, "write_iter": HOT,
+        "unlocked_ioctl": HOT, "compat_ioctl": HOT, "poll": HOT,
+        "splice_read": HOT, "splice_write": HOT,
+        "open": WARM, "release": WARM, "llseek": WARM, "mmap": WARM,
+        "fsync": WARM, "flush": WARM, "fasync": WARM,
+    },
+    "proc_ops": {
+        "proc_read": HOT, "proc_write": HOT, "proc_ioctl": HOT, "proc_poll": HOT,
+        "proc_open": WARM, "proc_release": WARM, "proc_lseek": WARM,
+    },
+    "net_device_ops": {
+        "ndo_start_xmit": HOT, "ndo_select_queue": HOT,
+        "ndo_get_stats": WARM, "ndo_get_stats64": WARM, "ndo_set_rx_mode": WARM,
+        "ndo_tx_timeout": WARM, "ndo_do_ioctl": WARM, "ndo_eth_ioctl": WARM,
+    },
+    "block_device_operations": {
+        "submit_bio": HOT, "rw_page": HOT,
+        "open": WARM, "release": WARM, "ioctl": WARM, "compat_ioctl": WARM,
+    },
+    "blk_mq_ops": {"queue_rq": HOT, "complete": HOT, "poll": HOT, "commit_rqs": HOT},
+    "platform_driver": {},
+    "pci_driver": {},
+}
+
+# Registration calls: name -> [(argument index of the callback, hotness, atomic context)]
+REGISTRARS = {
+    "request_irq": [(1, HOT, True)],
+    "request_any_context_irq": [(1, HOT, True)],
+    "devm_request_irq": [(2, HOT, True)],
+    "request_threaded_irq": [(1, HOT, True), (2, HOT, False)],
+    "devm_request_threaded_irq": [(2, HOT, True), (3, HOT, False)],
+    "netif_napi_add": [(2, HOT, True)],
+    "netif_napi_add_weight": [(2, HOT, True)],
+    "netif_napi_add_tx": [(2, HOT, True)],
+    "tasklet_init": [(1, HOT, True)],
+    "tasklet_setup": [(1, HOT, True)],
+    "timer_setup": [(1, WARM, True)],
+    "setup_timer": [(1, WARM, True)],
+    "blk_queue_make_request": [(1, HOT, False)],
+    "blk_alloc_queue": [(0, HOT, False)],
+    "blk_init_queue": [(0, HOT, True)],  # request_fn runs with the queue lock held
+    "INIT_WORK": [(1, WARM, False)],
+    "INIT_DELAYED_WORK": [(1, WARM, False)],
+    "module_init": [(0, RARE, False)],
+    "module_exit": [(0, RARE, False)],
+}
+
+# Calls after which the CPU may not sleep until the matching release
+ATOMIC_ACQUIRE = {
+    "spin_lock", "spin_lock_irq", "spin_lock_irqsave", "spin_lock_bh",
+    "raw_spin_lock", "raw_spin_lock_irq", "raw_spin_lock_irqsave", "raw_spin_lock_bh",
+    "read_lock", "read_lock_irqsave", "read_lock_bh", "write_lock", "write_lock_irqsave", "write_lock_bh",
+    "local_irq_disable", "local_irq_save", "local_bh_disable", "preempt_disable", "rcu_read_lock",
+}
+ATOMIC_RELEASE = {
+    "spin_unlock", "spin_unlock_irq", "spin_unlock_irqrestore", "spin_unlock_bh",
+    "raw_spin_unlock", "raw_spin_unlock_irq", "raw_spin_unlock_irqrestore", "raw_spin_unlock_bh",
+    "read_unlock", "read_unlock_irqrestore", "read_unlock_bh",
+    "write_unlock", "write_unlock_irqrestore", "write_unlock_bh",
+    "local_irq_enable", "local_irq_restore", "local_bh_enable", "preempt_enable", "rcu_read_unlock",
+}
+
+
+class FunctionView:
+    """
+    One function of the driver as seen by the hot-path analysis.
+      fn       - the function_index.Function record
+      tokens   - tokens of its body (from the stripped view)
+      body_at  - offset of the opening brace in the source
+      hotness  - weight of the hottest path reaching it (HOT .. RARE)
+      entry    - how it is reached ("file_operations.read", "irq handler",
+                 "called from dev_read", ...), or None
+      atomic   - why it runs where sleeping is forbidden, or None
+      locked   - indices into `tokens` at which an atomic section is open
+    """
+
+    def __init__(self, fn, tokens, body_at):
+        self.fn = fn
+        self.name = fn.name
+        self.tokens = tokens
+        self.body_at = body_at
+        self.hotness = RARE
+        self.entry = None
+        self.atomic = None
+        self.locked = _atomic_sections(tokens)
+
+    def raise_to(self, hotness, entry, atomic=None):
+        """Record a (hotter or atomic) path into this function; True if anything changed."""
+        changed = False
+        if self.entry is None or hotness > self.hotness:
+            self.hotness = max(hotness, self.hotness)
+            self.entry = entry
+            changed = True
+        if atomic and not self.atomic:
+            self.atomic = atomic
+            changed = True
+        return changed
+
+
+def _atomic_sections(tokens):
+    """Set of token indices at which a spinlock / irq-off / rcu section is held."""
+    held = set()
+    depth = 0
+    for i, tok in enumerate(tokens):
+        if tok.kind != "ident" or i + 1 >= len(tokens) or tokens[i + 1].text != "(":
+            if depth:
+                held.add(i)
+            continue
+        if tok.text in ATOMIC_ACQUIRE:
+            depth += 1
+        elif tok.text in ATOMIC_RELEASE:
+            depth = max(0, depth - 1)
+        elif depth:
+            held.add(i)
+    return held
+
+
+def _call_args(tokens, open_idx):
+    """Top-level argument token lists of the call whose "(" is at open_idx."""
+    args, cur, depth = [], [], 0
+    for tok in tokens[open_idx + 1:]:
+        if tok.text in "([{":
+            depth += 1
+        elif tok.text in ")]}":
+            if depth == 0:
+                args.append(cur)
+                return args
+            depth -= 1
+        elif tok.text == "," and depth == 0:
+            args.append(cur)
+            cur = []
+            continue
+        cur.append(tok)
+    return args
+
+
+def _callback_name(arg):
+    """The function named by an argument such as `handler`, `&handler` or `(irq_handler_t)handler`."""
+    idents = [t for t in arg if t.kind == "ident"]
+    if idents and all(t.kind == "ident" or t.text in "&()*" for t in arg):
+        return idents[-1].text
+    return None
+
+
+def _table_entries(tokens):
+    """(struct type, field, handler) for every designated initializer in an ops table."""
+    out = []
+    for i, tok in enumerate(tokens):
+        if tok.text != "struct" or i + 1 >= len(tokens) or tokens[i + 1].text not in OPS_TABLES:
+            continue
+        # struct <type> <name> [= {] ... ; skip declarations that are not definitions
+        j = i + 2
+        while j < len(tokens) and tokens[j].text not in ("=", ";", "{", "(", ")"):
+            j += 1
+        if j + 1 >= len(tokens) or tokens[j].text != "=" or tokens[j + 1].text != "{":
+            continue
+        depth = 0
+        for k in range(j + 1, len(tokens)):
+            t = tokens[k].text
+            if t == "{":
+                depth += 1
+            elif t == "}":
+                depth -= 1
+                if depth == 0:
+                    break
+            elif t == "." and depth == 1 and k + 3 < len(tokens) and tokens[k + 2].text == "=":
+                value = [tokens[k + 3]] if tokens[k + 3].text != "&" else [tokens[k + 4]]
+                if value[0].kind == "ident":
+                    out.append((tokens[i + 1].text, tokens[k + 1].text, value[0].text))
+    return out
+
+
+def analyze_hot_paths(source):
+    """
+    Map every function of the driver to how hot its path is.
+
+    Entry points come from operation tables (file_operations, net_device_ops,
+    block_device_operations, proc_ops, blk_mq_ops), from registration calls
+    (request_irq and friends, NAPI, tasklets, timers, work items) and from
+    functions returning irqreturn_t, unless a registrar already placed them
+    in process context (the thread_fn of request_threaded_irq). Hotness and atomic context then flow
+    along the driver's own call graph: a helper called from read() is as hot
+    as read(), and a helper called from an irq handler or with a spinlock
+    held runs in atomic context. Returns {name: FunctionView} in source order.
+    """
+    src = load_source(source)
+    tokens = src.tokens
+    starts = [t.start for t in tokens]
+    views = {}
+    for fn in src.functions:
+        body_at = fn.end + 1 - len(fn.body)
+        lo = bisect.bisect_left(starts, body_at)
+        hi = bisect.bisect_right(starts, fn.end)
+        views.setdefault(fn.name, FunctionView(fn, tokens[lo:hi], body_at))
+
+    queue = deque()
+
+    def seed(name, hotness, entry, atomic=None):
+        view = views.get(name)
+        if view is not None and view.raise_to(hotness, entry, atomic):
+            queue.append(view)
+
+    for struct, field, handler in _table_entries(tokens):
+        seed(handler, OPS_TABLES[struct].get(field, COLD), f"{struct}.{field}")
+    # Callbacks a registrar says run in process context (threaded irq handlers)
+    sleepable = set()
+    for i, tok in enumerate(tokens):
+        if tok.kind == "ident" and tok.text in REGISTRARS and i + 1 < len(tokens) and tokens[i + 1].text == "(":
+            args = _call_args(tokens, i + 1)
+            for index, hotness, atomic in REGISTRARS[tok.text]:
+                name = _callback_name(args[index]) if index < len(args) else None
+                if name:
+                    seed(name, hotness, f"{tok.text} callback", f"{tok.text} callback" if atomic else None)
+                    if not atomic:
+                        sleepable.add(name)
+    for name, view in views.items():
+        header = src.stripped[view.fn.start:view.body_at]
+        if name not in sleepable and "irqreturn_t" in header.split("(")[0].split():
+            seed(name, HOT, "irq handler", "irq handler")
+
+    # Propagate along calls; a call made inside an atomic section makes the callee atomic
+    while queue:
+        caller = queue.popleft()
+        for i, tok in enumerate(caller.tokens):
+            if tok.kind != "ident" or tok.text not in views or tok.text == caller.name:
+                continue
+            if i + 1 < len(caller.tokens) and caller.tokens[i + 1].text == "(":
+                atomic = caller.atomic or (f"called under a lock in {caller.name}" if i in caller.locked else None)
+                callee = views[tok.text]
+                if callee.raise_to(caller.hotness, f"called from {caller.name}", atomic):
+                    queue.append(callee)
+    return views
@@ -0,0 +1,167 @@
+# kmsg.py
+import errno
+import os
+import subprocess
+
+KMSG = "/dev/kmsg"
+LOG_KERN = 0  # syslog facility of printk() messages
+
+
+def _parse_record(raw):
+    """
+    Parse one /dev/kmsg record: "prio,seq,ts_usec,flags[,...];message\\n"
+    followed by optional " KEY=value" dictionary lines.
+    """
+    header, _, rest = raw.partition(";")
+    fields = header.split(",")
+    try:
+        prio, seq, ts_usec = int(fields[0]), int(fields[1]), int(fields[2])
+    except (IndexError, ValueError):
+        return None
+    message = rest.split("\n", 1)[0]
+    return {
+        "seq": seq,
+        "level": prio & 7,
+        "facility": prio >> 3,
+        "ts_usec": ts_usec,
+        "message": message,
+    }
+
+
+class KernelLogTap:
+    """
+    Incremental kernel log reader shared by the runtime stage and dynamic tests.
+
+    On open the /dev/kmsg cursor is moved to the end of the ring buffer, so only
+    records logged afterwards are ever read. Each record is tagged with the
+    phase that was active when it was collected (load, io, concurrency,
+    stress, unload, ...). Records are drained incrementally with non-blocking
+    reads; nothing is re-read or diffed.
+
+    If /dev/kmsg cannot be opened, falls back to `dmesg --kernel` and takes the
+    lines appended since the previous snapshot.
+    """
+
+    def __init__(self, facilities=(LOG_KERN,)):
+        self.facilities = set(facilities) if facilities is not None else None
+        self.records = []
+        self.lost = 0  # records overwritten before they were read (gaps in seq)
+        self.phase = None
+        self.source = None
+        self.cursor = None  # sequence number of the last record seen
+        self._fd = None
+        self._dmesg_lines = None
+        try:
+            self._fd = os.open(KMSG, os.O_RDONLY | os.O_NONBLOCK)
+            os.lseek(self._fd, 0, os.SEEK_END)
+            self.source = "kmsg"
+        except OSError:
+            self._fd = None
+            self._dmesg_lines = self._dmesg()
+            if self._dmesg_lines is not None:
+                self.source = "dmesg"
+
+    @property
+    def available(self):
+        return self.source is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._fd is not None:
+            self.poll()
+            os.close(self._fd)
+            self._fd = None
+
+    def set_phase(self, phase):
+        """Collect everything logged so far under the current phase, then switch."""
+        self.poll()
+        self.phase = phase
+
+    def poll(self):
+        """Read all records logged since the last poll; returns the new ones."""
+        if self._fd is not None:
+            return self._poll_kmsg()
+        if self._dmesg_lines is not None:
+            return self._poll_dmesg()
+        return []
+
+    def _keep(self, rec):
+        return self.facilities is None or rec["facility"] in self.facilities
+
+    def _poll_kmsg(self):
+        new = []
+        while True:
+            try:
+                raw = os.read(self._fd, 8192)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                if e.errno == errno.EPIPE:
+                    # Ring buffer overwrote records we had not read yet; the
+                    # next read returns the oldest one left, and the gap in
+                    # seq numbers says how many were lost
+                    continue
+                break
+            if not raw:
+                break
+            rec = _parse_record(raw.decode(errors="replace"))
+            if rec is None:
+                continue
+            if self.cursor is not None and rec["seq"] > self.cursor + 1:
+                self.lost += rec["seq"] - self.cursor - 1
+            self.cursor = rec["seq"]
+            if self._keep(rec):
+                rec["phase"] = self.phase
+                new.append(rec)
+        self.records.extend(new)
+        return new
+
+    @staticmethod
+    def _dmesg():
+        try:
+            proc = subprocess.run(
+                ["dmesg", "--kernel", "--color=never"], capture_output=True, text=True
+            )
+        except Exception:
+            return None
+        if proc.returncode != 0:
+            return None
+        return proc.stdout.splitlines()
+
+    def _poll_dmesg(self):
+        lines = self._dmesg()
+        if lines is None:
+            return []
+        before = self._dmesg_lines
+        # New lines are those after the previous snapshot's last line; if the
+        # ring buffer wrapped past it, find where the old tail reappears.
+        start = len(before)
+        if before and (len(lines) < len(before) or lines[len(before) - 1] != before[-1]):
+            start = 0
+            for i in range(len(lines) - 1, -1, -1):
+                if lines[i] == before[-1]:
+                    start = i + 1
+                    break
+        self._dmesg_lines = lines
+        new = [
+            {"seq": None, "level": None, "facility": LOG_KERN, "ts_usec": None,
+             "message": line, "phase": self.phase}
+            for line in lines[start:]
+        ]
+        self.records.extend(new)
+        return new
+
+    def messages(self, phase=None):
+        """Messages collected so far, optionally only those of one phase."""
+        self.poll()
+        return [r["message"] for r in self.records if phase is None or r["phase"] == phase]
+
+    def tagged_lines(self):
+        """Every collected message prefixed with its phase, for reports."""
+        self.poll()
+        return [f"[{r['phase']}] {r['message']}" for r in self.records]
@@ -0,0 +1,179 @@
+# loadgen.py
+import multiprocessing
+import os
+import random
+import time
+
+# Per-process cap on stored latency samples (reservoir sampling beyond this)
+MAX_SAMPLES = 100000
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def _latency_stats(samples_ns):
+    s = sorted(samples_ns)
+    return {
+        "p50_us": round(_percentile(s, 50) / 1000.0, 3),
+        "p99_us": round(_percentile(s, 99) / 1000.0, 3),
+        "p999_us": round(_percentile(s, 99.9) / 1000.0, 3),
+        "max_us": round(s[-1] / 1000.0, 3) if s else 0.0,
+    }
+
+
+def _worker(dev_node, read_fraction, size, duration, start_evt, out_q):
+    """
+    One load process: open the device and issue unbuffered os.read/os.write
+    calls of `size` bytes back to back for `duration` seconds, timing each.
+    Reads and writes are interleaved so that `read_fraction` of the
+    operations are reads. Only completed transfers count as operations:
+    EAGAIN/EINTR and reads that return no data (EOF) are retried uncounted.
+    """
+    ops = {"read": 0, "write": 0}
+    errors = {"read": 0, "write": 0}
+    samples = {"read": [], "write": []}
+    rng = random.Random(os.getpid())
+    payload = b"x" * size
+    fds = {}
+    try:
+        for op, mode, share in (("read", os.O_RDONLY, read_fraction), ("write", os.O_WRONLY, 1.0 - read_fraction)):
+            if share > 0:
+                fds[op] = os.open(dev_node, mode | os.O_NONBLOCK)
+    except OSError as e:
+        for fd in fds.values():
+            os.close(fd)
+        errors[op] = 1
+        out_q.put({"ops": ops, "errors": errors, "samples": samples, "error": str(e)})
+        return
+    start_evt.wait()
+    deadline = time.perf_counter() + duration
+    clock = time.perf_counter_ns
+    credit = 0.0
+    try:
+        while time.perf_counter() < deadline:
+            credit += read_fraction
+            if credit >= 1.0:
+                credit -= 1.0
+                op = "read"
+            else:
+                op = "write"
+            t0 = clock()
+            try:
+                if op == "read":
+                    n = len(os.read(fds[op], size))
+                else:
+                    n = os.write(fds[op], payload)
+            except (BlockingIOError, InterruptedError):
+                continue
+            except OSError:
+                errors[op] += 1
+                if errors[op] > 1000 and ops[op] == 0:
+                    break
+                continue
+            dt = clock() - t0
+            if n == 0:
+                continue
+            ops[op] += 1
+            if len(samples[op]) < MAX_SAMPLES:
+                samples[op].append(dt)
+            else:
+                j = rng.randrange(ops[op])
+                if j < MAX_SAMPLES:
+                    samples[op][j] = dt
+    finally:
+        for fd in fds.values():
+            os.close(fd)
+    out_q.put({"ops": ops, "errors": errors, "samples": samples})
+
+
+def run_load(dev_node, procs=2, duration=1.0, size=64, read_fraction=0.5):
+    """
+    Run `procs` separate processes against `dev_node` for `duration`
+    seconds, each interleaving reads and writes in `read_fraction`
+    proportion. Returns ops/sec and latency percentiles per operation.
+    """
+    ctx = multiprocessing.get_context("fork")
+    start_evt = ctx.Event()
+    out_q = ctx.Queue()
+    workers = [
+        ctx.Process(target=_worker, args=(dev_node, read_fraction, size, duration, start_evt, out_q))
+        for _ in range(procs)
+    ]
+    try:
+        for p in workers:
+            p.start()
+        t0 = time.perf_counter()
+        start_evt.set()
+        # queue.Empty here (a worker died before reporting) propagates, but
+        # only after every worker has been reaped
+        reports = [out_q.get(timeout=duration + 30) for _ in workers]
+        elapsed = max(time.perf_counter() - t0, duration)
+    finally:
+        for p in workers:
+            if p.is_alive():
+                p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+                p.join()
+
+    result = {"procs": procs, "read_fraction": read_fraction, "ops_per_sec": 0.0, "errors": 0, "ops": {}}
+    for op, share in (("read", read_fraction), ("write", 1.0 - read_fraction)):
+        if share <= 0:
+            continue
+        ops = sum(r["ops"][op] for r in reports)
+        errors = sum(r["errors"][op] for r in reports)
+        samples = [x for r in reports for x in r["samples"][op]]
+        result["ops"][op] = dict(
+            {"count": ops, "ops_per_sec": round(ops / elapsed, 1), "errors": errors},
+            **_latency_stats(samples),
+        )
+        result["ops_per_sec"] += ops / elapsed
+        result["errors"] += errors
+    result["ops_per_sec"] = round(result["ops_per_sec"], 1)
+    return result
+
+
+def concurrency_levels(max_procs):
+    """1, 2, 4, ... up to max_procs (always including max_procs)."""
+    levels = []
+    n = 1
+    while n < max_procs:
+        levels.append(n)
+        n *= 2
+    levels.append(max_procs)
+    return levels
+
+
+def run_scaling_sweep(dev_node, max_procs=None, duration=0.5, size=64, read_fraction=0.5):
+    """
+    Sweep total load processes from 1 to `max_procs` (default: CPU count).
+    Every process interleaves reads and writes in `read_fraction`
+    proportion, so each level - including the single-process baseline -
+    runs the same operation mix. Reports each level's throughput, latency
+    percentiles and scaling efficiency = ops/sec(n) / (n * ops/sec(1)).
+    """
+    max_procs = max_procs or os.cpu_count() or 1
+    levels = []
+    base = None
+    for n in concurrency_levels(max_procs):
+        level = run_load(dev_node, n, duration, size, read_fraction)
+        if base is None:
+            base = level["ops_per_sec"]
+        level["scaling_efficiency"] = round(level["ops_per_sec"] / (n * base), 3) if base else 0.0
+        levels.append(level)
+
+    total_ops = sum(sum(o["count"] for o in lv["ops"].values()) for lv in levels)
+    total_errors = sum(lv["errors"] for lv in levels)
+    return {
+        "device": dev_node,
+        "duration_per_level_sec": duration,
+        "request_size": size,
+        "levels": levels,
+        "peak_ops_per_sec": max((lv["ops_per_sec"] for lv in levels), default=0.0),
+        "final_scaling_efficiency": levels[-1]["scaling_efficiency"] if levels else 0.0,
+        "error_rate": round(total_errors / float(total_ops + total_errors), 4) if (total_ops + total_errors) else 1.0,
+    }
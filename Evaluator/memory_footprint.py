@@ -0,0 +1,216 @@
+# memory_footprint.py
+import os
+
+SLABINFO = "/proc/slabinfo"
+VMALLOCINFO = "/proc/vmallocinfo"
+PROC_MODULES = "/proc/modules"
+SYS_MODULE = "/sys/module"
+KMEMLEAK = "/sys/kernel/debug/kmemleak"
+
+
+def _read_int(path):
+    try:
+        with open(path) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def module_info(name):
+    """
+    Size of a loaded module: /proc/modules size plus core/init sizes and
+    section addresses from /sys/module/<name>. None if the module is not loaded.
+    """
+    info = None
+    try:
+        with open(PROC_MODULES) as f:
+            for line in f:
+                fields = line.split()
+                if fields and fields[0] == name:
+                    info = {"size": int(fields[1]), "refcount": int(fields[2])}
+                    break
+    except (OSError, ValueError, IndexError):
+        pass
+
+    base = os.path.join(SYS_MODULE, name)
+    if not os.path.isdir(base):
+        return info
+    info = info or {}
+    for key in ("coresize", "initsize"):
+        value = _read_int(os.path.join(base, key))
+        if value is not None:
+            info[key] = value
+    sections = {}
+    sec_dir = os.path.join(base, "sections")
+    try:
+        for sec in sorted(os.listdir(sec_dir)):
+            try:
+                with open(os.path.join(sec_dir, sec)) as f:
+                    sections[sec] = f.read().strip()
+            except OSError:
+                continue
+    except OSError:
+        pass
+    info["sections"] = sections
+    return info
+
+
+def slab_snapshot():
+    """{cache: bytes in active objects} from /proc/slabinfo (needs root), or None."""
+    try:
+        with open(SLABINFO) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    caches = {}
+    for line in lines[2:]:
+        fields = line.split()
+        try:
+            caches[fields[0]] = int(fields[1]) * int(fields[3])
+        except (IndexError, ValueError):
+            continue
+    return caches
+
+
+def vmalloc_snapshot(module=None):
+    """Total vmalloc'd bytes and the bytes whose caller lies in `module`, or None."""
+    try:
+        with open(VMALLOCINFO) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    total = owned = 0
+    tag = f"[{module}]" if module else None
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 2 or not fields[1].isdigit():
+            continue
+        size = int(fields[1])
+        total += size
+        if tag and tag in line:
+            owned += size
+    return {"total": total, "module": owned}
+
+
+def _text_range(info):
+    """(start, end) of the module's core text from its /sys/module sections and coresize, or None."""
+    try:
+        start = int(info["sections"][".text"], 16)
+        size = info.get("coresize") or info["size"]
+    except (KeyError, TypeError, ValueError):
+        return None
+    return (start, start + size) if start else None
+
+
+def kmemleak_leaks(module, text_range=None):
+    """
+    Objects kmemleak reports as unreferenced whose allocation backtrace runs
+    through `module`: a frame tagged [module] or, once the module is gone and
+    its symbols no longer resolve, a raw address inside its former
+    `text_range`. Triggers a scan; needs debugfs and CONFIG_DEBUG_KMEMLEAK.
+    Returns {"objects", "bytes"} or None where kmemleak is unavailable.
+    """
+    try:
+        with open(KMEMLEAK, "w") as f:
+            f.write("scan")
+        with open(KMEMLEAK) as f:
+            text = f.read()
+    except OSError:
+        return None
+    tag = f"[{module}]"
+    objects = size = 0
+    for block in text.split("unreferenced object ")[1:]:
+        owned = tag in block
+        if not owned and text_range:
+            for line in block.splitlines():
+                line = line.strip()
+                if line.startswith("[<") and ">]" in line:
+                    try:
+                        addr = int(line[2:line.index(">]")], 16)
+                    except ValueError:
+                        continue
+                    if text_range[0] <= addr < text_range[1]:
+                        owned = True
+                        break
+        if owned:
+            objects += 1
+            try:
+                size += int(block.split("(size ", 1)[1].split(")", 1)[0])
+            except (IndexError, ValueError):
+                pass
+    return {"objects": objects, "bytes": size}
+
+
+def _slab_delta(before, after, top=5):
+    """Total change in slab bytes and the caches that moved the most."""
+    if before is None or after is None:
+        return None, []
+    changes = {
+        name: after.get(name, 0) - before.get(name, 0)
+        for name in set(before) | set(after)
+    }
+    changes = {k: v for k, v in changes.items() if v}
+    ranked = sorted(changes.items(), key=lambda kv: abs(kv[1]), reverse=True)[:top]
+    return sum(changes.values()), [{"cache": k, "delta_bytes": v} for k, v in ranked]
+
+
+class MemoryTracker:
+    """
+    Kernel memory snapshots around the runtime phases of one module.
+
+    mark(phase) records slab and vmalloc usage (and, while the module is
+    loaded, its size); report() turns consecutive marks into per-phase deltas
+    and estimates what was not returned after rmmod by comparing the
+    `retained_after` mark (default "unload") against the first. Slab and
+    vmalloc counters are system-wide, so those deltas include the rest of the
+    machine; only kmemleak objects traced back to the module
+    (retained["module_bytes"]) are attributed to it.
+    """
+
+    def __init__(self, module):
+        self.module = module
+        self.marks = []
+        self.module_size = None
+
+    def mark(self, phase):
+        self.marks.append({
+            "phase": phase,
+            "slab": slab_snapshot(),
+            "vmalloc": vmalloc_snapshot(self.module),
+        })
+        info = module_info(self.module)
+        if info and self.module_size is None:
+            self.module_size = info
+
+    @property
+    def available(self):
+        return any(m["slab"] is not None or m["vmalloc"] is not None for m in self.marks)
+
+    def report(self, retained_after="unload"):
+        report = {"available": self.available, "module": self.module_size, "phases": []}
+        for prev, cur in zip(self.marks, self.marks[1:]):
+            slab, caches = _slab_delta(prev["slab"], cur["slab"])
+            vm_prev, vm_cur = prev["vmalloc"], cur["vmalloc"]
+            report["phases"].append({
+                "phase": f"{prev['phase']}->{cur['phase']}",
+                "slab_delta_bytes": slab,
+                "top_caches": caches,
+                "vmalloc_delta_bytes": (vm_cur["total"] - vm_prev["total"]) if vm_prev and vm_cur else None,
+                "vmalloc_module_bytes": vm_cur["module"] if vm_cur else None,
+            })
+        after = [m for m in self.marks[1:] if m["phase"] == retained_after] or self.marks[-1:]
+        if len(self.marks) >= 2:
+            first, last = self.marks[0], after[-1]
+            slab, caches = _slab_delta(first["slab"], last["slab"])
+            vmalloc = (last["vmalloc"]["total"] - first["vmalloc"]["total"]
+                       if first["vmalloc"] and last["vmalloc"] else None)
+            leaks = kmemleak_leaks(self.module, _text_range(self.module_size or {}))
+            report["retained"] = {
+                "after": last["phase"],
+                "slab_bytes": max(0, slab) if slab is not None else None,
+                "vmalloc_bytes": max(0, vmalloc) if vmalloc is not None else None,
+                "top_caches": [c for c in caches if c["delta_bytes"] > 0],
+                "module_bytes": leaks["bytes"] if leaks else None,
+                "module_objects": leaks["objects"] if leaks else None,
+            }
+        return report
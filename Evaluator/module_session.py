@@ -0,0 +1,277 @@
+# module_session.py
+import ctypes
+import os
+import select
+import shutil
+import stat
+import subprocess
+import time
+
+DEV_DIR = "/dev"
+# /dev subtrees that belong to the system (POSIX shm, pseudo-terminals), never to a module
+IGNORED_SUBTREES = ("shm", "pts")
+
+# <sys/inotify.h>
+IN_CREATE = 0x00000100
+IN_MOVED_TO = 0x00000080
+
+
+def _run(cmd, timeout=60):
+    return subprocess.run(cmd, check=True, capture_output=True, text=True, timeout=timeout)
+
+
+def _list_dev(root=DEV_DIR):
+    """Device nodes directly under /dev and one directory level below."""
+    nodes = set()
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return nodes
+    for entry in entries:
+        if entry.name in IGNORED_SUBTREES:
+            continue
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                nodes.update(os.path.join(entry.path, sub) for sub in os.listdir(entry.path))
+            else:
+                nodes.add(entry.path)
+        except OSError:
+            continue
+    return nodes
+
+
+def _device_numbers():
+    """
+    (majors, devnums, names) the kernel currently knows about: {("c"|"b", major)}
+    from /proc/devices, {(major, minor)} from /sys/class/*/*/dev, and the
+    registered name of each of them.
+    """
+    majors, devnums, names = set(), set(), {}
+    try:
+        with open("/proc/devices") as f:
+            kind = None
+            for line in f:
+                if line.startswith("Character"):
+                    kind = "c"
+                elif line.startswith("Block"):
+                    kind = "b"
+                else:
+                    parts = line.split()
+                    if kind and len(parts) == 2 and parts[0].isdigit():
+                        key = (kind, int(parts[0]))
+                        majors.add(key)
+                        names[key] = parts[1]
+    except OSError:
+        pass
+    try:
+        classes = os.listdir("/sys/class")
+    except OSError:
+        classes = []
+    for cls in classes:
+        base = os.path.join("/sys/class", cls)
+        try:
+            devices = os.listdir(base)
+        except OSError:
+            continue
+        for dev in devices:
+            try:
+                with open(os.path.join(base, dev, "dev")) as f:
+                    major, minor = f.read().strip().split(":")
+                key = (int(major), int(minor))
+            except (OSError, ValueError):
+                continue
+            devnums.add(key)
+            names[key] = dev
+    return majors, devnums, names
+
+
+class _Inotify:
+    """Minimal inotify watch on one directory via libc; `ok` is False where unsupported."""
+
+    def __init__(self, path, mask=IN_CREATE | IN_MOVED_TO):
+        self.fd = -1
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                return
+            if libc.inotify_add_watch(fd, os.fsencode(path), mask) < 0:
+                os.close(fd)
+                return
+            self.fd = fd
+        except (OSError, AttributeError):
+            self.fd = -1
+
+    @property
+    def ok(self):
+        return self.fd >= 0
+
+    def wait(self, timeout):
+        """Block until an event arrives or `timeout` passes; drains pending events."""
+        if not self.ok:
+            time.sleep(min(timeout, 0.05))
+            return
+        ready, _, _ = select.select([self.fd], [], [], max(0.0, timeout))
+        if ready:
+            try:
+                while os.read(self.fd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        if self.ok:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class DeviceWatcher:
+    """
+    Finds the device node a module creates. Started before insmod: snapshots
+    /dev and watches it with inotify, so nodes created while the module loads
+    are never missed. wait() runs `udevadm settle` when available, then waits
+    for a new node tied to this module: one whose name contains the module
+    name, or whose device number was registered by the module (a /proc/devices
+    major or /sys/class/*/*/dev entry that appeared after the snapshot, or
+    that carries the module name). Any other new node - another driver's,
+    udev's - is ignored, so None means the module created no node.
+    """
+
+    def __init__(self, module, root=DEV_DIR):
+        self.module = module
+        self.root = root
+        self.before = _list_dev(root)
+        self.majors_before, self.devnums_before, _ = _device_numbers()
+        self.inotify = _Inotify(root)
+        self.method = "inotify" if self.inotify.ok else "poll"
+
+    def _owned_numbers(self):
+        majors, devnums, names = _device_numbers()
+        majors = {k for k in majors if k not in self.majors_before or self.module in names[k]}
+        devnums = {k for k in devnums if k not in self.devnums_before or self.module in names[k]}
+        return majors, devnums
+
+    def _pick(self, new):
+        named = sorted(n for n in new if self.module in os.path.basename(n))
+        if named:
+            return named[0]
+        if not new:
+            return None
+        majors, devnums = self._owned_numbers()
+        for node in sorted(new):
+            try:
+                st = os.stat(node)
+            except OSError:
+                continue
+            kind = "c" if stat.S_ISCHR(st.st_mode) else "b" if stat.S_ISBLK(st.st_mode) else None
+            if kind is None:
+                continue
+            major, minor = os.major(st.st_rdev), os.minor(st.st_rdev)
+            if (kind, major) in majors or (major, minor) in devnums:
+                return node
+        return None
+
+    def wait(self, timeout=5.0):
+        deadline = time.perf_counter() + timeout
+        udevadm = shutil.which("udevadm")
+        if udevadm:
+            try:
+                subprocess.run([udevadm, "settle", f"--timeout={int(max(1, timeout))}"],
+                               capture_output=True, timeout=timeout + 5)
+                self.method = "udev settle"
+            except (OSError, subprocess.SubprocessError):
+                pass
+        while True:
+            node = self._pick(_list_dev(self.root) - self.before)
+            remaining = deadline - time.perf_counter()
+            if node or remaining <= 0:
+                return node
+            self.inotify.wait(remaining)
+
+    def close(self):
+        self.inotify.close()
+
+
+class ModuleSession:
+    """
+    One load/probe/unload lifecycle of a built .ko.
+
+    load() inserts the module once (unloading a stale copy first, if
+    /sys/module says one is present) and waits for its device node;
+    unload() removes it once. Wall time of each phase is recorded in
+    `timings` and failures are collected in `notes`.
+    """
+
+    def __init__(self, ko_path, name):
+        self.ko_path = ko_path
+        self.name = name
+        self.loaded = False
+        self.unloaded = False
+        self.device_node = None
+        self.device_wait = None
+        self.timings = {}
+        self.notes = []
+
+    def _timed(self, phase, start):
+        self.timings[phase] = round(time.perf_counter() - start, 6)
+
+    def load(self, device_timeout=2.0):
+        start = time.perf_counter()
+        if os.path.isdir(f"/sys/module/{self.name}"):
+            try:
+                _run(["sudo", "rmmod", self.name])
+                self.notes.append("Module was already loaded; unloaded stale copy first.")
+            except subprocess.CalledProcessError as e:
+                self.notes.append(f"stale rmmod failed: {e.stderr.strip()}")
+            except (OSError, subprocess.TimeoutExpired) as e:
+                self.notes.append(f"stale rmmod failed: {e}")
+
+        watcher = DeviceWatcher(self.name)
+        try:
+            try:
+                _run(["sudo", "insmod", self.ko_path])
+                self.loaded = True
+            except subprocess.CalledProcessError as e:
+                self.notes.append(f"insmod failed: {e.stderr.strip()}")
+            except subprocess.TimeoutExpired:
+                self.notes.append("insmod timed out.")
+            except PermissionError:
+                self.notes.append("No permission for insmod.")
+            except OSError as e:
+                self.notes.append(f"insmod failed: {e}")
+            self._timed("load", start)
+            if not self.loaded:
+                return False
+
+            start = time.perf_counter()
+            self.device_node = watcher.wait(device_timeout)
+            self.device_wait = watcher.method
+            self._timed("device_wait", start)
+        finally:
+            watcher.close()
+        return True
+
+    def unload(self):
+        if not self.loaded:
+            return False
+        start = time.perf_counter()
+        try:
+            _run(["sudo", "rmmod", self.name])
+            self.unloaded = True
+        except subprocess.CalledProcessError as e:
+            self.notes.append(f"rmmod failed: {e.stderr.strip()}")
+        except subprocess.TimeoutExpired:
+            self.notes.append("rmmod timed out.")
+        except PermissionError:
+            self.notes.append("no permission for rmmod.")
+        except OSError as e:
+            self.notes.append(f"rmmod failed: {e}")
+        self._timed("unload", start)
+        return self.unloaded
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self.loaded and "unload" not in self.timings:
+            self.unload()
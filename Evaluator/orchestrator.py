@@ -0,0 +1,158 @@
+# orchestrator.py
+import asyncio
+import time
+
+from cache import StageCache
+from compile_checker import run_compilation_async, release_artifact
+from parser import analyze_code_structure
+from performance_checker import run_performance_check
+from profiling import stage_timer
+from runtime_checker import run_runtime_stage
+from scoring import calculate_score
+from security_checker import run_security_check
+from source_unit import SourceUnit
+from style_checker import (
+    run_style_check, checkpatch_available, checkpatch_command, prefetch_checkpatch,
+)
+
+_NO_CACHE = StageCache(mode="off")
+
+
+async def _checkpatch_async(path, timeout=60):
+    """checkpatch.pl under asyncio; returns stdout (or stderr) like a single-file run."""
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *checkpatch_command(path),
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return f"checkpatch exception: timed out after {timeout} seconds"
+    except Exception as e:
+        return f"checkpatch exception: {e}"
+    return stdout.decode(errors="replace") or stderr.decode(errors="replace")
+
+
+async def _cached(cache, stage, source, compute, extra=""):
+    """Serve `stage` from the cache or await compute() and store the result."""
+    if cache.mode == "on":
+        hit = cache.lookup(stage, source, extra)
+        if hit is not None:
+            return hit
+    value = await compute()
+    cache.store(stage, source, value, extra)
+    return value
+
+
+def build_stage_graph(file_path, source, cache, compilation=None):
+    """
+    The evaluation pipeline as {stage: (dependencies, async fn(results))}.
+    compilation and style are subprocess-bound and run under asyncio; the
+    other static stages are pure Python and run inline on the event loop while
+    those processes work; runtime (sudo insmod/rmmod) runs in a thread.
+    """
+    style_tag = str(checkpatch_available())
+
+    async def compile_stage(results):
+        if compilation is not None:
+            cache.store("compilation", source, compilation)
+            return compilation
+        return await _cached(cache, "compilation", source,
+                             lambda: run_compilation_async(file_path, True))
+
+    async def style_stage(results):
+        async def compute():
+            if checkpatch_available():
+                prefetch_checkpatch(source.path, await _checkpatch_async(source.path))
+            return run_style_check(source)
+        return await _cached(cache, "style", source, compute, style_tag)
+
+    async def structure_stage(results):
+        return cache.stage("structure", source, analyze_code_structure, source)
+
+    async def security_stage(results):
+        return cache.stage("security", source, run_security_check, source)
+
+    async def performance_stage(results):
+        return cache.stage("performance", source, run_performance_check, source, results["structure"])
+
+    async def runtime_stage(results):
+        try:
+            return await asyncio.to_thread(
+                cache.stage, "runtime", source, run_runtime_stage, file_path, results["compilation"]
+            )
+        finally:
+            release_artifact(results["compilation"])
+
+    async def scoring_stage(results):
+        return calculate_score(results, source)
+
+    # Subprocess-bound stages first so their processes start before the
+    # inline Python stages occupy the loop.
+    return {
+        "compilation": ((), compile_stage),
+        "style": ((), style_stage),
+        "structure": ((), structure_stage),
+        "security": ((), security_stage),
+        "performance": (("structure",), performance_stage),
+        "runtime": (("compilation",), runtime_stage),
+        "scoring": (("compilation", "structure", "style", "security", "performance", "runtime"),
+                    scoring_stage),
+    }
+
+
+async def run_graph(stages, results, timings):
+    """
+    Run every stage as soon as its dependencies finish. Each stage's result is
+    stored in results[stage]; timings[stage] gets its wall time and start
+    offset (CPU/RSS are process-wide and not attributable to overlapping stages).
+    """
+    tasks = {}
+    origin = time.perf_counter()
+
+    async def run(name):
+        deps, fn = stages[name]
+        if deps:
+            await asyncio.gather(*(tasks[d] for d in deps))
+        start = time.perf_counter()
+        results[name] = await fn(results)
+        timings[name] = {
+            "start_sec": round(start - origin, 6),
+            "wall_sec": round(time.perf_counter() - start, 6),
+        }
+
+    for name in stages:
+        tasks[name] = asyncio.create_task(run(name))
+    try:
+        await asyncio.gather(*tasks.values())
+    finally:
+        for t in tasks.values():
+            t.cancel()
+
+
+async def evaluate_async(file_path, cache=None, compilation=None):
+    """
+    Concurrent version of evaluator.evaluate(): same results dict, but
+    independent stages overlap so per-file latency approaches the longest
+    stage instead of the sum.
+    """
+    cache = cache or _NO_CACHE
+    results = {"meta_file": file_path}
+    timings = {}
+    with stage_timer(timings, "total"):
+        with stage_timer(timings, "load"):
+            source = SourceUnit.from_file(file_path)
+        results["source_hash"] = source.digest
+        await run_graph(build_stage_graph(file_path, source, cache, compilation), results, timings)
+    final_score, breakdown = results.pop("scoring")
+    results["overall_score"] = final_score
+    results["breakdown"] = breakdown
+    results["timings"] = timings
+    return results
+
+
+def evaluate_concurrent(file_path, cache=None, compilation=None):
+    """Synchronous entry point for evaluate_async()."""
+    return asyncio.run(evaluate_async(file_path, cache, compilation))
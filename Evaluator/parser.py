@@ -1,35 +1,16 @@
 # parser.py
 import re
 
-def _count_functions_and_lengths(code):
-    """
-    Naive function parser: locate occurrences of function headers and measure
-    approximate lengths. Returns list of function lengths (in lines).
-    """
-    # This is deliberately simple and regex-based.
-    func_header_re = re.compile(r"^\s*([a-zA-Z_][\w\s\*]+)\s+([a-zA-Z_]\w*)\s*\(([^)]*)\)\s*\{", re.MULTILINE)
-    funcs = []
-    for m in func_header_re.finditer(code):
-        start = m.start()
-        # Find matching closing brace naively by counting braces from start
-        brace_count = 0
-        lines = code[start:].splitlines()
-        line_count = 0
-        for line in lines:
-            line_count += 1
-            brace_count += line.count("{")
-            brace_count -= line.count("}")
-            if brace_count <= 0:
-                break
-        funcs.append(max(1, line_count))
-    return funcs
+from source_unit import load_source
 
-def analyze_code_structure(file_path):
+def analyze_code_structure(source):
     """
+    `source` is a SourceUnit (or a file path, which is loaded on the fly).
+
     Extracts metadata:
       - module_init/module_exit presence
       - function_count
-      - average function length
+      - average / max function length, max brace nesting depth
       - driver_type (char/platform/block/net/unknown)
       - functionality_score [0..1] based on presence of expected symbols for driver type
     """
@@ -38,13 +19,15 @@ def analyze_code_structure(file_path):
         "module_exit": False,
         "function_count": 0,
         "avg_func_len": 0.0,
+        "max_func_len": 0,
+        "max_nesting_depth": 0,
         "driver_type": "unknown",
         "functionality_score": 0.0,
         "fops_present": [],
     }
 
-    with open(file_path, "r") as f:
-        code = f.read()
+    src = load_source(source)
+    code = src.text
 
     # module init/exit
     if re.search(r"\bmodule_init\s*\(", code):
@@ -52,11 +35,13 @@ def analyze_code_structure(file_path):
     if re.search(r"\bmodule_exit\s*\(", code):
         metrics["module_exit"] = True
 
-    # function lengths and count
-    func_lengths = _count_functions_and_lengths(code)
+    # function lengths and count (from the shared single-pass function index)
+    func_lengths = [fn.length for fn in src.functions]
     metrics["function_count"] = len(func_lengths)
     if func_lengths:
         metrics["avg_func_len"] = sum(func_lengths) / len(func_lengths)
+        metrics["max_func_len"] = max(func_lengths)
+        metrics["max_nesting_depth"] = max(fn.depth for fn in src.functions)
 
     # Detect driver type heuristically and compute functionality_score
     functionality_hits = 0
@@ -68,7 +53,7 @@ def analyze_code_structure(file_path):
         # desired fields
         needed = {"read", "write", "open", "release"}
         found = set(re.findall(r"\.([a-z_]+)\s*=", code))
-        present = list(needed & found)
+        present = sorted(needed & found)
         metrics["fops_present"] = present
         functionality_needed = len(needed)
         functionality_hits = len(present)
@@ -1,17 +1,175 @@
 # performance_checker.py
 import re
 
-def run_performance_check(file_path, structure):
+from hot_paths import analyze_hot_paths, HOT
+from source_unit import load_source
+
+ALLOCATORS = {
+    "kmalloc", "kzalloc", "kcalloc", "kmalloc_array", "krealloc", "kmemdup",
+    "vmalloc", "vzalloc", "kvmalloc", "kvzalloc", "__get_free_pages", "alloc_pages",
+}
+USER_COPIES = {
+    "copy_to_user", "copy_from_user", "__copy_to_user", "__copy_from_user",
+    "get_user", "put_user", "clear_user", "strncpy_from_user",
+}
+SLEEPS = {
+    "msleep", "msleep_interruptible", "ssleep", "usleep_range", "schedule_timeout",
+    "schedule_timeout_interruptible", "schedule_timeout_uninterruptible",
+}
+BUSY_DELAYS = {"mdelay"}
+PIO_BYTE = r"(?:ioread8|iowrite8|readb|writeb|inb|outb|get_user|put_user)"
+POLL_READS = r"(?:ioread\d+|read[bwlq]|in[bwl]|test_bit|atomic_read|READ_ONCE)"
+
+# Penalty in points (of 10) for each pattern, before weighting by hotness
+PENALTIES = {
+    "alloc_in_hot_path": 1.5,
+    "gfp_kernel_in_atomic": 3.0,
+    "copy_user_in_atomic": 3.0,
+    "sleep_in_atomic": 3.0,
+    "sleep_in_io_path": 1.5,
+    "byte_at_a_time_loop": 1.0,
+    "busy_wait": 1.5,
+}
+
+_LOOP_RE = re.compile(r"\b(for|while)\s*\(")
+_BYTE_COPY_RE = re.compile(
+    r"\b\w+\s*\[\s*(\w+)(?:\s*\+\+)?\s*\]\s*=\s*[^;=]*?\b\w+\s*\[\s*\1\s*\]"  # dst[i] = src[i]
+    r"|\*\s*\w+\s*\+\+\s*=\s*\*\s*\w+\s*\+\+"                                  # *d++ = *s++
+    r"|\b" + PIO_BYTE + r"\s*\("
+)
+_POLL_COND_RE = re.compile(r"\b" + POLL_READS + r"\s*\(|\bjiffies\b|!\s*\w+(?:->\w+)*\s*$")
+_SPIN_BODY_RE = re.compile(r"^\s*(?:(?:cpu_relax|barrier|udelay|ndelay)\s*\([^;]*\)\s*)?;?\s*$")
+
+
+def _matching(text, i, open_ch, close_ch):
+    """Index just past the bracket that closes the one at text[i]."""
+    depth = 0
+    for j in range(i, len(text)):
+        if text[j] == open_ch:
+            depth += 1
+        elif text[j] == close_ch:
+            depth -= 1
+            if depth == 0:
+                return j + 1
+    return len(text)
+
+
+def _do_body(text, while_at):
+    """Body of the do { ... } block ending right before the `while` at while_at, or None."""
+    end = len(text[:while_at].rstrip())
+    if not end or text[end - 1] != "}":
+        return None
+    depth = 0
+    for j in range(end - 1, -1, -1):
+        if text[j] == "}":
+            depth += 1
+        elif text[j] == "{":
+            depth -= 1
+            if depth == 0:
+                return text[j + 1:end - 1] if text[:j].rstrip().endswith("do") else None
+    return None
+
+
+def _loops(text):
+    """(offset, keyword, condition, body) for each for/while/do-while loop in `text` (a stripped function)."""
+    for m in _LOOP_RE.finditer(text):
+        paren = m.end() - 1
+        close = _matching(text, paren, "(", ")")
+        cond = text[paren + 1:close - 1]
+        if m.group(1) == "while":
+            body = _do_body(text, m.start())
+            if body is not None:
+                yield m.start(), "do-while", cond, body
+                continue
+        rest = close
+        while rest < len(text) and text[rest].isspace():
+            rest += 1
+        if rest < len(text) and text[rest] == "{":
+            body = text[rest + 1:_matching(text, rest, "{", "}") - 1]
+        else:
+            end = text.find(";", rest)
+            body = text[rest:end + 1 if end >= 0 else len(text)]
+        yield m.start(), m.group(1), cond, body
+
+
+def _finding(src, view, pattern, offset, what):
+    return {
+        "function": view.name,
+        "line": src.line_of(offset),
+        "pattern": pattern,
+        "what": what,
+        "entry": view.entry,
+        "hotness": view.hotness,
+        "penalty": round(PENALTIES[pattern] * view.hotness, 2),
+    }
+
+
+def analyze_function(src, view):
+    """Costly patterns in one function, weighted by how hot its path is (see hot_paths.py)."""
+    findings = []
+    # Per-request paths only: an allocation or sleep in open/release/mmap is
+    # paid once per open, not per transfer. Atomic-context checks apply anywhere.
+    io_path = view.hotness >= HOT
+    seen = set()
+
+    def add(pattern, offset, what):
+        # Each pattern counts once per function; every place is still reported
+        f = _finding(src, view, pattern, offset, what)
+        if pattern in seen:
+            f["penalty"] = 0.0
+        seen.add(pattern)
+        findings.append(f)
+
+    toks = view.tokens
+    for i, tok in enumerate(toks):
+        if tok.kind != "ident":
+            continue
+        call = i + 1 < len(toks) and toks[i + 1].text == "("
+        atomic = view.atomic or ("spinlock held" if i in view.locked else None)
+        if call and tok.text in ALLOCATORS and io_path:
+            add("alloc_in_hot_path", tok.start, f"{tok.text} on every call ({view.entry})")
+        elif tok.text == "GFP_KERNEL" and atomic:
+            add("gfp_kernel_in_atomic", tok.start, f"GFP_KERNEL may sleep ({atomic})")
+        elif call and tok.text in USER_COPIES and atomic:
+            add("copy_user_in_atomic", tok.start, f"{tok.text} may fault and sleep ({atomic})")
+        elif call and tok.text in SLEEPS:
+            if atomic:
+                add("sleep_in_atomic", tok.start, f"{tok.text} ({atomic})")
+            elif io_path:
+                add("sleep_in_io_path", tok.start, f"{tok.text} on the I/O path ({view.entry})")
+        elif call and tok.text in BUSY_DELAYS:
+            add("busy_wait", tok.start, f"{tok.text} spins the CPU")
+
+    text = src.stripped[view.body_at:view.fn.end + 1]
+    for offset, keyword, cond, body in _loops(text):
+        at = view.body_at + offset
+        if io_path and _BYTE_COPY_RE.search(body):
+            add("byte_at_a_time_loop", at, f"element-by-element {keyword} loop ({view.entry})")
+        elif keyword != "for" and _SPIN_BODY_RE.match(body) and _POLL_COND_RE.search(cond.strip()):
+            add("busy_wait", at, "polling loop without sleeping")
+    return findings
+
+
+def run_performance_check(source, structure):
     """
-    Lightweight static performance heuristics.
+    Static performance analysis over a SourceUnit (or file path).
+
+    The driver's entry points (fops/net_device_ops/block ops tables, irq,
+    NAPI, tasklet and timer registrations) and the helpers they call are
+    weighted by how hot the path is (hot_paths.py); costly patterns inside
+    them - allocation on every read/write, GFP_KERNEL or copy_*_user or
+    sleeping in atomic context, byte-at-a-time copy loops, busy-wait polling,
+    msleep on the I/O path - are deducted at their penalty times that weight.
     Returns dict:
       {
         "score": float (0..1),
-        "details": [ ... ]
+        "details": [ ... ],
+        "findings": [{function, line, pattern, what, entry, hotness, penalty}, ...],
+        "entry_points": {function: entry}
       }
     """
 
-    metrics = {"score": 1.0, "details": []}
+    metrics = {"score": 1.0, "details": [], "findings": [], "entry_points": {}}
     perf = 10.0
     details = []
 
@@ -21,25 +179,27 @@ def run_performance_check(file_path, structure):
         perf -= penalty
         details.append(f"avg_func_len {avg_len:.1f} -> -{penalty:.1f}")
 
-    complexity_hits = 0
+    findings = []
     try:
-        code_text = open(file_path, "r").read()
-        complexity_hits = len(re.findall(r"\b(if|for|while|switch|goto)\b", code_text))
-        if complexity_hits > 20:
-            penalty = min(3.0, (complexity_hits - 20) / 20.0)
-            perf -= penalty
-            details.append(f"complexity_hits {complexity_hits} -> -{penalty:.1f}")
-    except Exception:
-        pass
+        src = load_source(source)
+        views = analyze_hot_paths(src)
+        for view in views.values():
+            findings.extend(analyze_function(src, view))
+        metrics["entry_points"] = {
+            name: view.entry for name, view in views.items()
+            if view.entry and not view.entry.startswith("called from")
+        }
+    except Exception as e:
+        details.append(f"hot-path analysis failed: {type(e).__name__}: {e}")
 
-    try:
-        if "kmalloc" in code_text and ("1024" in code_text or "4096" in code_text):
-            perf -= 2.0
-            details.append("large kmalloc detected -> -2.0")
-    except Exception:
-        pass
+    findings.sort(key=lambda f: f["line"])
+    for f in findings:
+        if f["penalty"]:
+            perf -= f["penalty"]
+            details.append(f"{f['pattern']} in {f['function']} (line {f['line']}): {f['what']} -> -{f['penalty']:.1f}")
 
     perf = max(0.0, min(10.0, perf))
     metrics["score"] = perf / 10.0  # normalize 0..1
     metrics["details"] = details
+    metrics["findings"] = findings
     return metrics
@@ -0,0 +1,119 @@
+# profiling.py
+import cProfile
+import heapq
+import os
+import pstats
+import resource
+import time
+from contextlib import contextmanager
+
+
+@contextmanager
+def stage_timer(timings, stage):
+    """
+    Record resource usage of the wrapped block into timings[stage]:
+      wall_sec        - elapsed wall-clock time
+      cpu_sec         - CPU time of this process (user + sys)
+      child_cpu_sec   - CPU time of child processes reaped during the block
+                        (kbuild, gcc, checkpatch, insmod, ...)
+      peak_rss_kb     - peak RSS of this process so far
+      child_peak_rss_kb - peak RSS of the largest child reaped so far
+    """
+    t0 = os.times()
+    wall0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        t1 = os.times()
+        timings[stage] = {
+            "wall_sec": round(time.perf_counter() - wall0, 6),
+            "cpu_sec": round((t1.user - t0.user) + (t1.system - t0.system), 6),
+            "child_cpu_sec": round(
+                (t1.children_user - t0.children_user) + (t1.children_system - t0.children_system), 6
+            ),
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "child_peak_rss_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        }
+
+
+@contextmanager
+def profiled(path):
+    """Run the wrapped block under cProfile and dump pstats to `path` (no-op if None)."""
+    if not path:
+        yield
+        return
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        prof.dump_stats(path)
+
+
+def merge_profiles(paths, output):
+    """Merge several pstats dumps into one file; returns the merged Stats or None."""
+    paths = [p for p in paths if os.path.exists(p)]
+    if not paths:
+        return None
+    stats = pstats.Stats(*paths)
+    stats.dump_stats(output)
+    return stats
+
+
+class TimingSummary:
+    """
+    Incremental batch-level view of per-file timings: total/mean/max wall time
+    per stage and the `top` slowest files. Memory does not grow with the
+    number of files added.
+    """
+
+    def __init__(self, top=5):
+        self.top = top
+        self.per_stage = {}
+        self.slowest = []  # min-heap of (total wall, file)
+
+    def add(self, file_path, timings):
+        timings = timings or {}
+        total = 0.0
+        for stage, t in timings.items():
+            if stage == "total":
+                continue
+            s = self.per_stage.setdefault(stage, {"total_wall_sec": 0.0, "max_wall_sec": 0.0, "count": 0})
+            s["total_wall_sec"] += t["wall_sec"]
+            s["max_wall_sec"] = max(s["max_wall_sec"], t["wall_sec"])
+            s["count"] += 1
+            total += t["wall_sec"]
+        if timings:
+            if len(self.slowest) < self.top:
+                heapq.heappush(self.slowest, (total, file_path))
+            elif self.top:
+                heapq.heappushpop(self.slowest, (total, file_path))
+
+    def summary(self):
+        stages = []
+        for stage, s in self.per_stage.items():
+            stages.append({
+                "stage": stage,
+                "total_wall_sec": round(s["total_wall_sec"], 6),
+                "mean_wall_sec": round(s["total_wall_sec"] / s["count"], 6),
+                "max_wall_sec": round(s["max_wall_sec"], 6),
+            })
+        stages.sort(key=lambda s: s["total_wall_sec"], reverse=True)
+        return {
+            "stages": stages,
+            "slowest_files": [{"file": f, "wall_sec": round(w, 6)}
+                              for w, f in sorted(self.slowest, reverse=True)],
+        }
+
+
+def print_timing_summary(summary):
+    print("\n--- Stage Timings ---")
+    for s in summary["stages"]:
+        print(f"{s['stage']:<12} total {s['total_wall_sec']:8.3f}s  "
+              f"mean {s['mean_wall_sec']:7.3f}s  max {s['max_wall_sec']:7.3f}s")
+    if summary["slowest_files"]:
+        print("Slowest files:")
+        for f in summary["slowest_files"]:
+            print(f"  {f['wall_sec']:7.3f}s  {f['file']}")
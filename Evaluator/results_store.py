@@ -0,0 +1,168 @@
+# results_store.py
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DB = os.environ.get("EVALUATOR_RESULTS_DB", os.path.join(REPO_ROOT, "results.db"))
+
+# Generated drivers are named <prompt>_<model>.c (e.g. Tests/3_gemini.c)
+_PROMPT_MODEL_RE = re.compile(r"^(?P<prompt>\d+)_(?P<model>[A-Za-z0-9.-]+)\.c$")
+
+# Breakdown category -> column
+CATEGORY_COLUMNS = {
+    "Correctness": "correctness",
+    "Security": "security",
+    "Code Quality": "code_quality",
+    "Performance": "performance",
+    "Advanced": "advanced",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id            INTEGER PRIMARY KEY,
+    timestamp     TEXT NOT NULL,
+    file          TEXT NOT NULL,
+    path          TEXT,
+    prompt        TEXT,
+    model         TEXT,
+    source_hash   TEXT,
+    overall_score REAL,
+    correctness   REAL,
+    security      REAL,
+    code_quality  REAL,
+    performance   REAL,
+    advanced      REAL,
+    breakdown     TEXT,
+    metrics       TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_file ON runs (file, timestamp);
+CREATE INDEX IF NOT EXISTS runs_model ON runs (model, overall_score);
+CREATE INDEX IF NOT EXISTS runs_prompt ON runs (prompt, overall_score);
+CREATE INDEX IF NOT EXISTS runs_source_hash ON runs (source_hash);
+"""
+
+
+def parse_prompt_model(file_path):
+    """(prompt, model) from a <prompt>_<model>.c file name, else (None, None)."""
+    m = _PROMPT_MODEL_RE.match(os.path.basename(file_path))
+    return (m.group("prompt"), m.group("model").lower()) if m else (None, None)
+
+
+def connect(db_path=None):
+    """
+    Open (creating if needed) the results database in WAL mode. WAL lets
+    readers run alongside a writer, and the busy timeout makes concurrent
+    writers from different processes wait for each other instead of failing.
+    """
+    conn = sqlite3.connect(db_path or DEFAULT_DB, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _source_hash(file_path):
+    try:
+        with open(file_path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def record_result(file_path, results, overall_score, breakdown, db_path=None):
+    """Insert one evaluation (scores, full per-stage metrics, source hash); returns its id."""
+    prompt, model = parse_prompt_model(file_path)
+    row = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "file": os.path.basename(file_path),
+        "path": os.path.abspath(file_path),
+        "prompt": prompt,
+        "model": model,
+        "source_hash": results.get("source_hash") or _source_hash(file_path),
+        "overall_score": overall_score,
+        "breakdown": json.dumps(breakdown, default=str),
+        "metrics": json.dumps(results, default=str),
+    }
+    for category, column in CATEGORY_COLUMNS.items():
+        row[column] = breakdown.get(category, {}).get("awarded")
+
+    columns = ", ".join(row)
+    placeholders = ", ".join(f":{k}" for k in row)
+    conn = connect(db_path)
+    try:
+        with conn:
+            cur = conn.execute(f"INSERT INTO runs ({columns}) VALUES ({placeholders})", row)
+        return cur.lastrowid
+    finally:
+        conn.close()
+
+
+def latest_runs(conn, limit=5):
+    return conn.execute(
+        "SELECT timestamp, file, overall_score FROM runs ORDER BY id DESC LIMIT ?", (limit,)
+    ).fetchall()
+
+
+def best_per_prompt(conn):
+    """Highest-scoring model for each prompt (latest run of each file only)."""
+    return conn.execute("""
+        WITH latest AS (
+            SELECT prompt, model, overall_score,
+                   ROW_NUMBER() OVER (PARTITION BY file ORDER BY id DESC) AS rn
+            FROM runs WHERE prompt IS NOT NULL
+        ), ranked AS (
+            SELECT prompt, model, overall_score,
+                   ROW_NUMBER() OVER (PARTITION BY prompt ORDER BY overall_score DESC) AS pos
+            FROM latest WHERE rn = 1
+        )
+        SELECT prompt, model, overall_score FROM ranked WHERE pos = 1
+        ORDER BY CAST(prompt AS INTEGER)
+    """).fetchall()
+
+
+def model_averages(conn):
+    """Mean score and per-category means per model over all recorded runs."""
+    return conn.execute("""
+        SELECT model, COUNT(*), AVG(overall_score), AVG(correctness), AVG(security),
+               AVG(code_quality), AVG(performance), AVG(advanced)
+        FROM runs WHERE model IS NOT NULL
+        GROUP BY model ORDER BY AVG(overall_score) DESC
+    """).fetchall()
+
+
+def print_summary(db_path=None):
+    db_path = db_path or DEFAULT_DB
+    if not os.path.exists(db_path):
+        print("No results yet.")
+        return
+    conn = connect(db_path)
+    try:
+        print("=== Latest evaluations ===")
+        for ts, file, score in latest_runs(conn):
+            print(f"{ts}  {file:<32} {score:6.1f}/100")
+        best = best_per_prompt(conn)
+        if best:
+            print("\n=== Best model per prompt ===")
+            for prompt, model, score in best:
+                print(f"prompt {prompt:<4} {model:<12} {score:6.1f}/100")
+        averages = model_averages(conn)
+        if averages:
+            print("\n=== Model averages ===")
+            print(f"{'model':<12} {'runs':>5} {'overall':>8} {'corr':>6} {'sec':>6} {'qual':>6} {'perf':>6} {'adv':>6}")
+            for model, n, *means in averages:
+                print(f"{model:<12} {n:>5} " + " ".join(f"{(m or 0.0):>{w}.1f}" for m, w in zip(means, (8, 6, 6, 6, 6, 6))))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Query the evaluation results store.")
+    ap.add_argument("command", choices=["summary"], help="what to show")
+    ap.add_argument("--db", default=DEFAULT_DB, help="results database path")
+    args = ap.parse_args()
+    print_summary(args.db)
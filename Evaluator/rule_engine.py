@@ -0,0 +1,188 @@
+# rule_engine.py
+import json
+import os
+import re
+from collections import namedtuple
+
+Hit = namedtuple("Hit", ["rule", "line", "category", "penalty", "text"])
+
+
+class RuleSet:
+    """
+    A declarative rule table compiled for one token pass over a SourceUnit,
+    plus one regex pass for the patterns that cannot be anchored to a token.
+
+    Rule kinds (see security_rules.json):
+      ident    - fires on identifier tokens in the list. All ident rules share
+                 one dict lookup per token, so their cost does not grow with
+                 the number of rules. An optional `unless` regex is tried
+                 against the rest of the line after the token; if it matches,
+                 the hit is dropped (e.g. copy_to_user called with a length).
+                 With "scope": "file" the rule only fires when no occurrence
+                 in the file passes its `unless` check.
+      pattern  - regex over the comment/string-stripped text. A pattern that
+                 starts with a literal identifier ("char\\s+...") is only
+                 tried at tokens with that text, from the same token pass.
+                 The others are merged into one alternation with a named group
+                 per rule and run with a single finditer over the stripped text
+                 after the token pass; at any position the first of those rules
+                 in file order that matches wins.
+      balance  - counts of `acquire` vs `release` identifiers, gathered in
+                 the same token pass; fires once when acquires outnumber
+                 releases ("excess") or when there are acquires but no
+                 release at all ("unreleased").
+
+    Identifiers and pattern matches on preprocessor lines are ignored. Each rule's penalty is
+    deducted once from its category however many times it hits; every hit is
+    still reported with its line.
+    """
+
+    def __init__(self, table):
+        self.categories = list(table.get("categories", []))
+        self.rules = {}
+        self.by_ident = {}
+        self.unless = {}
+        patterns = []
+        for rule in table.get("rules", []):
+            self.rules[rule["id"]] = rule
+            for name in rule.get("ident", []):
+                self.by_ident.setdefault(name, []).append(rule["id"])
+            if "unless" in rule:
+                self.unless[rule["id"]] = re.compile(rule["unless"])
+            if "pattern" in rule:
+                patterns.append(rule)
+        # Patterns that begin with a literal identifier are tried only where
+        # that identifier occurs (dispatched from the token pass); the rest are
+        # merged into one regex.
+        self.by_anchor = {}
+        floating = []
+        for rule in patterns:
+            anchor = _anchor(rule)
+            if anchor:
+                self.by_anchor.setdefault(anchor, []).append((rule["id"], re.compile(rule["pattern"])))
+            else:
+                floating.append(rule)
+        self.group_rule = {f"r{i}": rule["id"] for i, rule in enumerate(floating)}
+        self.combined = re.compile(
+            "|".join(f"(?P<r{i}>{rule['pattern']})" for i, rule in enumerate(floating))
+        ) if floating else None
+
+        self.balances = list(table.get("balances", []))
+        self.counted = {}
+        for bal in self.balances:
+            self.rules[bal["id"]] = bal
+            for side in ("acquire", "release"):
+                for name in bal[side]:
+                    self.counted.setdefault(name, []).append((bal["id"], side))
+        self.order = {rule_id: i for i, rule_id in enumerate(self.rules)}
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def _hit(self, src, rule_id, offset, text):
+        rule = self.rules[rule_id]
+        return Hit(rule_id, src.line_of(offset), rule["category"], rule["penalty"], text)
+
+    def scan(self, src):
+        """Every rule hit in `src` (a SourceUnit), in source order."""
+        hits = []
+        counts = {bal["id"]: {"acquire": 0, "release": 0, "first": None} for bal in self.balances}
+        stripped = src.stripped
+
+        satisfied = set()  # file-scope rules with at least one clean occurrence
+
+        for tok in src.tokens:
+            if tok.kind != "ident" or (tok.text not in self.by_ident and tok.text not in self.counted
+                                       and tok.text not in self.by_anchor):
+                continue
+            if self._in_directive(src, tok.start):
+                continue
+            for rule_id in self.by_ident.get(tok.text, ()):
+                check = self.unless.get(rule_id)
+                if check is not None:
+                    end = stripped.find("\n", tok.start)
+                    rest = stripped[tok.start + len(tok.text):end if end >= 0 else None]
+                    if check.search(rest):
+                        satisfied.add(rule_id)
+                        continue
+                hits.append(self._hit(src, rule_id, tok.start, tok.text))
+            for rule_id, pattern in self.by_anchor.get(tok.text, ()):
+                m = pattern.match(stripped, tok.start)
+                if m:
+                    hits.append(self._hit(src, rule_id, tok.start, m.group(0)))
+            for bal_id, side in self.counted.get(tok.text, ()):
+                c = counts[bal_id]
+                c[side] += 1
+                if side == "acquire" and c["first"] is None:
+                    c["first"] = tok
+
+        if self.combined is not None:
+            for m in self.combined.finditer(stripped):
+                if self._in_directive(src, m.start()):
+                    continue
+                hits.append(self._hit(src, self.group_rule[m.lastgroup], m.start(), m.group(0)))
+
+        for bal in self.balances:
+            c = counts[bal["id"]]
+            if not c["acquire"]:
+                continue
+            if (bal["when"] == "excess" and c["acquire"] > c["release"]) or \
+                    (bal["when"] == "unreleased" and not c["release"]):
+                hits.append(self._hit(src, bal["id"], c["first"].start,
+                                      f"{c['acquire']} acquire / {c['release']} release"))
+
+        hits = [h for h in hits
+                if not (h.rule in satisfied and self.rules[h.rule].get("scope") == "file")]
+        hits.sort(key=lambda h: h.line)
+        return hits
+
+    @staticmethod
+    def _in_directive(src, offset):
+        """True if `offset` is on a preprocessor line (#include <linux/vmalloc.h>, ...)."""
+        line = src.lines[src.line_of(offset) - 1]
+        return line.lstrip().startswith("#")
+
+    def score(self, hits):
+        """
+        Per-category sub-scores (1.0 minus each fired rule's penalty, floored
+        at 0) and the fired rule ids, ordered by category then table order.
+        """
+        sub_scores = {cat: 1.0 for cat in self.categories}
+        fired = {hit.rule for hit in hits}
+        fired = sorted(fired, key=lambda r: (self._category_index(self.rules[r]["category"]),
+                                             self.order[r]))
+        for rule_id in fired:
+            rule = self.rules[rule_id]
+            sub_scores[rule["category"]] = sub_scores.get(rule["category"], 1.0) - rule["penalty"]
+        return {k: max(0.0, v) for k, v in sub_scores.items()}, fired
+
+    def _category_index(self, category):
+        return self.categories.index(category) if category in self.categories else len(self.categories)
+
+
+# A leading identifier, and what may follow it without extending the token
+_ANCHOR_RE = re.compile(r"([A-Za-z_]\w*)(?:$|\\[sS(\[*.\-]|[ ;,])")
+
+
+def _anchor(rule):
+    """Identifier a pattern must start with, or None if it can start elsewhere."""
+    pattern = rule["pattern"]
+    if "|" in pattern:
+        return None
+    m = _ANCHOR_RE.match(pattern)
+    return m.group(1) if m else None
+
+
+_loaded = {}
+
+
+def load_rules(path):
+    """RuleSet for `path`, compiled once per process."""
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    cached = _loaded.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = _loaded[path] = (mtime, RuleSet.from_file(path))
+    return cached[1]
@@ -1,10 +1,42 @@
-import subprocess
+import re
 import os
-import platform
+import time
+from compile_checker import run_compilation, release_artifact, artifact_ready
 from dynamic_tests import run_dynamic_tests
+from ftrace import FunctionProfiler
+from kmsg import KernelLogTap
+from memory_footprint import MemoryTracker
+from module_session import ModuleSession
+from source_unit import load_source
 
+# Designated initializer of a file_operations .mmap hook
+MMAP_FOP_RE = re.compile(r"\.mmap\s*=")
+MMAP_PROBE_LENGTH = 4096
 
-def run_runtime_checks(driver_path):
+
+def run_runtime_stage(driver_path, compilation):
+    """
+    Runtime checks against the .ko kept by the compilation stage. If that result
+    came from the cache its build directory is gone, so rebuild once here.
+    """
+    build = compilation
+    if compilation.get("success") and compilation.get("built_module") and not artifact_ready(compilation):
+        build = run_compilation(driver_path, keep_artifact=True)
+    try:
+        return run_runtime_checks(driver_path, build)
+    finally:
+        if build is not compilation:
+            release_artifact(build)
+
+
+def run_runtime_checks(driver_path, build=None):
+    """
+    Load/unload the module built by the compilation stage and run dynamic tests.
+
+    `build` is the result of compile_checker.run_compilation(keep_artifact=True);
+    its artifact .ko is loaded directly, so nothing is rebuilt here. If
+    compilation failed or produced no .ko the stage is skipped immediately.
+    """
     metrics = {
         "compiled": False,
         "loaded": False,
@@ -14,99 +46,78 @@ def run_runtime_checks(driver_path):
         "dynamic": {},
     }
 
-    driver_dir = os.path.dirname(os.path.abspath(driver_path))
-    driver_file = os.path.basename(driver_path)
-    driver_base, _ = os.path.splitext(driver_file)
-    ko_file = os.path.join(driver_dir, f"{driver_base}.ko")
-    makefile_path = os.path.join(driver_dir, "Makefile")
+    if not build or not build.get("success"):
+        metrics["runtime_notes"] = "Skipped: compilation failed."
+        return metrics
 
-    kernel_release = platform.uname().release
-    auto_makefile = False
+    ko_file = (build.get("artifact") or {}).get("ko_path")
+    if not ko_file or not os.path.exists(ko_file):
+        metrics["runtime_notes"] = (
+            f"Skipped: no .ko produced by compilation (method={build.get('method')})."
+        )
+        return metrics
 
+    driver_base, _ = os.path.splitext(os.path.basename(ko_file))
+    metrics["compiled"] = True
+
+    # One incremental kernel-log tap for the whole stage, shared with dynamic tests
+    tap = KernelLogTap()
+    memory = MemoryTracker(driver_base)
     try:
-        if not os.path.exists(makefile_path):
-            auto_makefile = True
-            makefile_content = (
-                f"obj-m += {driver_base}.o\n\n"
-                "all:\n"
-                f"\tmake -C /lib/modules/{kernel_release}/build M=$(PWD) modules\n\n"
-                "clean:\n"
-                f"\tmake -C /lib/modules/{kernel_release}/build M=$(PWD) clean\n"
-            )
-            with open(makefile_path, "w") as f:
-                f.write(makefile_content)
-
-        build_cmd = [
-            "make",
-            "-C",
-            f"/lib/modules/{kernel_release}/build",
-            f"M={driver_dir}",
-            "modules",
-        ]
-        try:
-            subprocess.run(build_cmd, check=True, capture_output=True, text=True)
-        except subprocess.CalledProcessError as e:
-            metrics["runtime_notes"] = f"Build failed: {e.stderr.strip()}"
-            return metrics
+        tap.set_phase("load")
+        memory.mark("baseline")
+        _load_and_probe(metrics, ko_file, driver_base, tap, _mmap_length(driver_path), memory)
+    finally:
+        tap.close()
+        metrics["kernel_log"] = tap.records
+        metrics["kernel_log_lost"] = tap.lost
+        metrics["memory"] = memory.report()
 
-        if not os.path.exists(ko_file):
-            metrics["runtime_notes"] = "No .ko file produced after build."
-            return metrics
+    return metrics
 
-        metrics["compiled"] = True
 
-        try:
-            subprocess.run(["sudo", "insmod", ko_file], check=True, capture_output=True, text=True)
-            metrics["loaded"] = True
-        except subprocess.CalledProcessError as e:
-            if "File exists" in e.stderr:
-                try:
-                    subprocess.run(["sudo", "rmmod", driver_base], check=True, capture_output=True, text=True)
-                    subprocess.run(["sudo", "insmod", ko_file], check=True, capture_output=True, text=True)
-                    metrics["loaded"] = True
-                    metrics["runtime_notes"] = "Module was already loaded; reloaded successfully."
-                except subprocess.CalledProcessError as e2:
-                    metrics["runtime_notes"] = f"insmod retry failed: {e2.stderr.strip()}"
-                    return metrics
-            else:
-                metrics["runtime_notes"] = f"insmod failed: {e.stderr.strip()}"
-                return metrics
-        except PermissionError:
-            metrics["runtime_notes"] = "No permission for insmod."
-            return metrics
+def _mmap_length(driver_path):
+    """Probe length for the mmap bandwidth test, or None when the fops have no .mmap."""
+    try:
+        stripped = load_source(driver_path).stripped
+    except OSError:
+        return None
+    return MMAP_PROBE_LENGTH if MMAP_FOP_RE.search(stripped) else None
 
-        try:
-            result = subprocess.run(
-                ["dmesg", "--kernel", "--ctime", "--color=never"],
-                capture_output=True,
-                text=True,
-            )
-            if result.returncode == 0 and result.stdout:
-                metrics["dmesg_success"] = True
-        except Exception:
-            metrics["runtime_notes"] += " dmesg not accessible."
 
+def _load_and_probe(metrics, ko_file, driver_base, tap, mmap_length, memory):
+    """
+    Load once, run every probe against the live device, unload once.
+    Phase wall times go to metrics["phase_timings"].
+    """
+    with ModuleSession(ko_file, driver_base) as session:
         try:
-            subprocess.run(["sudo", "rmmod", driver_base], check=True, capture_output=True, text=True)
-            metrics["unloaded"] = True
-        except subprocess.CalledProcessError as e:
-            metrics["runtime_notes"] += f" rmmod failed: {e.stderr.strip()}"
-        except PermissionError:
-            metrics["runtime_notes"] += " no permission for rmmod."
-
-        # --- Run dynamic tests ---
-        dyn_results = run_dynamic_tests(driver_base)
-        metrics["dynamic"] = dyn_results
+            if not session.load():
+                return
+            metrics["loaded"] = True
+            metrics["device_node"] = session.device_node
+            metrics["device_wait"] = session.device_wait
+            memory.mark("load")
+            tap.poll()
+            if tap.available:
+                metrics["dmesg_success"] = True
+            else:
+                session.notes.append("dmesg not accessible.")
 
-    finally:
-        try:
-            subprocess.run(["make", "clean"], cwd=driver_dir, capture_output=True, text=True)
-        except Exception:
-            pass
-        if auto_makefile and os.path.exists(makefile_path):
-            try:
-                os.remove(makefile_path)
-            except Exception:
-                pass
+            # Per-function kernel time of the module's own symbols while the tests run
+            start = time.perf_counter()
+            with FunctionProfiler(driver_base) as profiler:
+                metrics["dynamic"] = run_dynamic_tests(
+                    driver_base, tap, mmap_length=mmap_length, dev_node=session.device_node,
+                    guess_node=False,
+                )
+            metrics["ftrace"] = profiler.report()
+            session.timings["probes"] = round(time.perf_counter() - start, 6)
+            memory.mark("io")
 
-    return metrics
+            tap.set_phase("unload")
+            metrics["unloaded"] = session.unload()
+            memory.mark("unload")
+        finally:
+            metrics["phase_timings"] = session.timings
+            metrics["runtime_notes"] = " ".join(session.notes)
@@ -1,3 +1,6 @@
+import math
+
+
 def score_runtime(runtime_results):
     """
     Assign points for runtime behavior.
@@ -96,24 +99,89 @@ def score_code_quality(results):
     return breakdown
 
 
+def score_measured_load(load):
+    """
+    0..1 score from a loadgen scaling sweep, or None if nothing was measured.
+    Averages: 1 - error rate; scaling efficiency at full concurrency (>= 0.5
+    earns full credit); single-process p99 latency on a log scale
+    (<= 100us -> 1.0, 1ms -> 0.5, >= 10ms -> 0.0).
+    """
+    if not load or not load.get("levels") or not load.get("peak_ops_per_sec"):
+        return None
+    error_part = max(0.0, 1.0 - load.get("error_rate", 1.0))
+    scaling_part = min(1.0, load.get("final_scaling_efficiency", 0.0) / 0.5)
+    p99s = [o["p99_us"] for o in load["levels"][0]["ops"].values() if o.get("count")]
+    p99 = max(p99s) if p99s else 0.0
+    latency_part = 1.0 if p99 <= 100.0 else max(0.0, 1.0 - math.log10(p99 / 100.0) / 2.0)
+    return (error_part + scaling_part + latency_part) / 3.0
+
+
+def _log_part(value, full, zero):
+    """1.0 at or below `full`, 0.0 at or above `zero`, log-linear in between."""
+    if value <= full:
+        return 1.0
+    return max(0.0, 1.0 - math.log10(value / full) / math.log10(zero / full))
+
+
+def score_measured_memory(memory):
+    """
+    0..1 score from the runtime memory footprint, or None if nothing was measured.
+    Averages: module core size (<= 16KB -> 1.0, >= 1MB -> 0.0) and bytes
+    kmemleak traces back to the module after rmmod (0 -> 1.0, >= 256KB -> 0.0).
+    The system-wide slab/vmalloc deltas are reported but not scored, since
+    they include allocations by the rest of the machine.
+    """
+    if not memory or not memory.get("available"):
+        return None
+    parts = []
+    module = memory.get("module") or {}
+    size = module.get("coresize") or module.get("size")
+    if size:
+        parts.append(_log_part(size, 16 * 1024, 1024 * 1024))
+    retained = memory.get("retained")
+    if retained and retained.get("after") == "unload" and retained.get("module_bytes") is not None:
+        parts.append(_log_part(max(retained["module_bytes"], 1), 1, 256 * 1024))
+    return sum(parts) / len(parts) if parts else None
+
+
 def score_performance(results):
     perf = results.get("performance", {})
     perf_score = perf.get("score", 1.0)
+    details = list(perf.get("details", []))
+
+    # Blend in measured load and memory results when the runtime stage produced them
+    runtime = results.get("runtime", {})
+    measured = []
+    load_score = score_measured_load(runtime.get("dynamic", {}).get("load"))
+    if load_score is not None:
+        measured.append(load_score)
+        details.append(f"measured load score {load_score:.2f}")
+    memory_score = score_measured_memory(runtime.get("memory"))
+    if memory_score is not None:
+        measured.append(memory_score)
+        details.append(f"measured memory score {memory_score:.2f}")
+    if measured:
+        runtime_score = sum(measured) / len(measured)
+        details.append(
+            f"runtime score {runtime_score:.2f} (static {perf_score:.2f}, weighted 70/30)"
+        )
+        perf_score = 0.7 * perf_score + 0.3 * runtime_score
+
     perf_awarded = round(perf_score * 10.0, 2)
     return {
         "awarded": perf_awarded,
         "max": 10.0,
-        "details": perf.get("details", []),
+        "details": details,
     }
 
 
-def score_advanced(results):
+def score_advanced(results, source=None):
     adv_score = 0.0
     adv_details = []
     fp = results.get("meta_file")
-    if fp:
+    if source is not None or fp:
         try:
-            txt = open(fp).read()
+            txt = source.text if source is not None else open(fp).read()
             if "devm_" in txt:
                 adv_score += 1.5
                 adv_details.append("devm_* used")
@@ -132,13 +200,13 @@ def score_advanced(results):
     return {"awarded": adv_awarded, "max": 5.0, "details": adv_details}
 
 
-def calculate_score(results):
+def calculate_score(results, source=None):
     breakdown = {
         "Correctness": score_correctness(results),
         "Security": score_security(results),
         "Code Quality": score_code_quality(results),
         "Performance": score_performance(results),
-        "Advanced": score_advanced(results),
+        "Advanced": score_advanced(results, source),
     }
 
     total_awarded = sum(bd["awarded"] for bd in breakdown.values())
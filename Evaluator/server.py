@@ -0,0 +1,482 @@
+# server.py
+import argparse
+import hmac
+import http.client
+import itertools
+import json
+import os
+import re
+import select
+import shutil
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import batch
+from cache import StageCache, DEFAULT_CACHE_DIR
+from logger import log_score
+from workspace import make_workspace
+
+DEFAULT_PORT = 8765
+DEFAULT_SOCKET = os.path.join(os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir(), "driver-grader.sock")
+TOKEN_ENV = "EVALUATOR_SERVER_TOKEN"
+# Longest a GET /results stream may follow before the server ends it (the
+# client reconnects with since=<last seq>), and how often an idle one checks
+# that its client is still connected
+MAX_FOLLOW_SEC = 600
+_IDLE_CHECK_SEC = 5
+_SAFE_NAME_RE = re.compile(r"^[A-Za-z0-9_.-]+\.c$")
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _warm():
+    return os.getpid()
+
+
+class GradingService:
+    """
+    A resident pool of `jobs` warm worker processes fed from a bounded queue.
+
+    Workers are the batch workers (batch._init_worker / batch._evaluate_one):
+    imports, the stage cache and each worker's scratch directory are set up
+    once when the service starts, so a job only pays for its own grading.
+    At most `max_queue` jobs may be queued or running; submit() raises
+    QueueFull beyond that. Finished jobs are logged to the results store and
+    kept (the newest `retain` of them) for poll() and stream().
+    Jobs given as a path must lie under one of `roots` (none: only source
+    submissions are accepted). If a worker dies, the jobs it took down fail
+    and the pool is replaced on the next submit.
+    """
+
+    def __init__(self, jobs=None, max_queue=None, cache=None, tiered=False, threshold=0.0, retain=1000,
+                 roots=()):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.max_queue = max_queue or 4 * self.jobs
+        self.roots = [os.path.realpath(r) for r in roots]
+        self.scratch_root = make_workspace("evaluator_server_")
+        self.spool = os.path.join(self.scratch_root, "spool")
+        os.makedirs(self.spool)
+        self.initargs = (self.scratch_root, cache, None, False, threshold if tiered else None)
+        self.pool = self._new_pool()
+        self.pool_lock = threading.Lock()
+        self.restarts = 0
+        self.cache = cache
+        self.lock = threading.Condition()
+        self.ids = itertools.count(1)
+        self.table = {}                      # id -> job record
+        self.finished = deque(maxlen=retain)  # (seq, id) in completion order
+        self.seq = 0
+        self.pending = 0
+        self.started = time.time()
+
+    def _new_pool(self):
+        pool = ProcessPoolExecutor(max_workers=self.jobs, initializer=batch._init_worker, initargs=self.initargs)
+        # Start every worker now rather than on the first jobs
+        for f in [pool.submit(_warm) for _ in range(self.jobs)]:
+            f.result()
+        return pool
+
+    def _submit(self, file_path):
+        """Hand a job to the pool, replacing the pool once if a dead worker broke it."""
+        with self.pool_lock:
+            try:
+                return self.pool.submit(batch._evaluate_one, file_path)
+            except BrokenProcessPool:
+                self.pool.shutdown(wait=False, cancel_futures=True)
+                self.pool = self._new_pool()
+                self.restarts += 1
+                return self.pool.submit(batch._evaluate_one, file_path)
+
+    def _allowed(self, path):
+        return any(os.path.commonpath([path, root]) == root for root in self.roots)
+
+    def submit(self, file_path=None, source=None, name=None):
+        """
+        Queue one driver, given either as a path readable by the service or as
+        source text (written to the spool under `name`, default driver.c).
+        Returns the job record.
+        """
+        with self.lock:
+            if self.pending >= self.max_queue:
+                raise QueueFull(f"{self.pending} jobs queued (limit {self.max_queue})")
+            job_id = str(next(self.ids))
+            if source is not None:
+                name = name or "driver.c"
+                if not _SAFE_NAME_RE.match(name):
+                    raise ValueError(f"invalid driver name: {name!r}")
+                job_dir = os.path.join(self.spool, job_id)
+                os.makedirs(job_dir)
+                file_path = os.path.join(job_dir, name)
+                with open(file_path, "w") as f:
+                    f.write(source)
+            elif not file_path:
+                raise ValueError("either file or source is required")
+            else:
+                file_path = os.path.realpath(file_path)
+                if not self._allowed(file_path):
+                    raise ValueError(f"file outside the service's roots: {file_path}")
+                if not os.path.isfile(file_path):
+                    raise ValueError(f"file not found: {file_path}")
+            job = {"id": job_id, "file": file_path, "status": "queued", "submitted": time.time()}
+            self.table[job_id] = job
+            self.pending += 1
+            queued = self.pending
+        try:
+            fut = self._submit(file_path)
+        except Exception as e:
+            self._complete(job, {"error": f"{type(e).__name__}: {e}"})
+        else:
+            fut.add_done_callback(lambda f, job=job: self._finish(job, f))
+        return dict(job, queued=queued)
+
+    def _finish(self, job, fut):
+        try:
+            _, res = fut.result()
+        except Exception as e:
+            # BrokenProcessPool included: a worker died and took this job with it
+            res = {"error": f"{type(e).__name__}: {e}"}
+        self._complete(job, res)
+
+    def _complete(self, job, res):
+        if "error" not in res:
+            try:
+                log_score(job["file"], res, res["overall_score"], res["breakdown"])
+            except Exception as e:
+                res["log_error"] = str(e)
+        if job["file"].startswith(self.spool):
+            shutil.rmtree(os.path.dirname(job["file"]), ignore_errors=True)
+        with self.lock:
+            self.seq += 1
+            job.update(status="error" if "error" in res else "done", result=res,
+                       finished=time.time(), seq=self.seq)
+            if len(self.finished) == self.finished.maxlen:
+                self.table.pop(self.finished[0][1], None)
+            self.finished.append((self.seq, job["id"]))
+            self.pending -= 1
+            self.lock.notify_all()
+
+    def poll(self, job_id):
+        """The job record (with "result" once finished), or None if unknown."""
+        with self.lock:
+            job = self.table.get(job_id)
+            return dict(job) if job else None
+
+    def stream(self, since=0, follow=True, timeout=None):
+        """
+        Yield finished job records with seq > `since` in completion order.
+        With `follow`, keep waiting for new ones (until `timeout` seconds pass
+        without any).
+        """
+        while True:
+            with self.lock:
+                ready = [self.table[i] for s, i in self.finished if s > since and i in self.table]
+                if not ready and follow:
+                    self.lock.wait(timeout)
+                    ready = [self.table[i] for s, i in self.finished if s > since and i in self.table]
+            for job in ready:
+                since = job["seq"]
+                yield dict(job)
+            if not follow or (not ready and timeout is not None):
+                return
+
+    def status(self):
+        with self.lock:
+            return {"workers": self.jobs, "pending": self.pending, "max_queue": self.max_queue,
+                    "finished": self.seq, "pool_restarts": self.restarts,
+                    "uptime_sec": round(time.time() - self.started, 1)}
+
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(self.scratch_root, ignore_errors=True)
+        if self.cache is not None:
+            self.cache.evict()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    POST /jobs          {"file": path} or {"source": text, "name": "x.c"}
+                        -> 202 job, or 503 + Retry-After when the queue is full
+    GET  /jobs/<id>     -> job (status queued|done|error, result once finished)
+    GET  /results?since=N[&follow=0]
+                        -> finished jobs as JSON lines, streamed as they finish;
+                           a following stream ends after `max_follow` seconds
+                           or once the client has disconnected
+    GET  /status        -> pool and queue counters
+
+    With a `token`, every request needs "Authorization: Bearer <token>" (401
+    otherwise). POST bodies must be application/json (415 otherwise).
+    """
+
+    protocol_version = "HTTP/1.1"
+    service = None
+    token = None
+    max_follow = MAX_FOLLOW_SEC
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, code, body, headers=()):
+        data = (json.dumps(body, default=str) + "\n").encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in headers:
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _authorized(self):
+        if not self.token:
+            return True
+        given = self.headers.get("Authorization") or ""
+        if hmac.compare_digest(given.encode(), f"Bearer {self.token}".encode()):
+            return True
+        self._send(401, {"error": "missing or wrong token"}, [("WWW-Authenticate", "Bearer")])
+        return False
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if self.path.rstrip("/") != "/jobs":
+            return self._send(404, {"error": "not found"})
+        ctype = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if ctype != "application/json":
+            self.close_connection = True
+            return self._send(415, {"error": "Content-Type must be application/json"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            req = json.loads(self.rfile.read(length) or b"{}")
+            job = self.service.submit(req.get("file"), req.get("source"), req.get("name"))
+        except QueueFull as e:
+            return self._send(503, {"error": str(e)}, [("Retry-After", "1")])
+        except ValueError as e:
+            return self._send(400, {"error": str(e)})
+        self._send(202, job)
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        path, _, query = self.path.partition("?")
+        params = dict(p.partition("=")[::2] for p in query.split("&") if p)
+        if path == "/status":
+            return self._send(200, self.service.status())
+        if path.startswith("/jobs/"):
+            job = self.service.poll(path[len("/jobs/"):])
+            return self._send(200, job) if job else self._send(404, {"error": "unknown job"})
+        if path == "/results":
+            return self._stream(int(params.get("since") or 0), params.get("follow", "1") != "0")
+        self._send(404, {"error": "not found"})
+
+    def _stream(self, since, follow):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        deadline = time.monotonic() + self.max_follow
+        try:
+            while True:
+                # Wake up at least every _IDLE_CHECK_SEC while following
+                for job in self.service.stream(since, follow, _IDLE_CHECK_SEC if follow else None):
+                    since = job["seq"]
+                    data = (json.dumps(job, default=str) + "\n").encode()
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    self.wfile.flush()
+                    if time.monotonic() >= deadline:
+                        break
+                if not follow or time.monotonic() >= deadline or self._client_gone():
+                    break
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def _client_gone(self):
+        """True if the peer has closed its end (readable, but nothing to read)."""
+        try:
+            if not select.select([self.connection], [], [], 0)[0]:
+                return False
+            return self.connection.recv(1, socket.MSG_PEEK) == b""
+        except OSError:
+            return True
+
+
+class _UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("local", 0)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def serve(service, port=None, socket_path=DEFAULT_SOCKET, token=None, max_follow=MAX_FOLLOW_SEC):
+    """
+    Serve `service` on the Unix socket `socket_path` (mode 0600, so only this
+    user can connect) or, given a `port`, on 127.0.0.1:port - which any local
+    user can reach, so TCP requires a bearer `token`. Following result
+    streams are ended after `max_follow` seconds.
+    """
+    handler = type("Handler", (_Handler,), {"service": service, "token": token, "max_follow": max_follow})
+    if port is None:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        old = os.umask(0o177)
+        try:
+            server = _UnixHTTPServer(socket_path, handler)
+        finally:
+            os.umask(old)
+        os.chmod(socket_path, 0o600)
+        where = socket_path
+    else:
+        if not token:
+            service.close()
+            raise ValueError(f"serving on TCP needs a token (--token or ${TOKEN_ENV})")
+        socket_path = None
+        server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        where = f"http://127.0.0.1:{port}"
+    print(f"Grading service on {where} ({service.jobs} workers, queue limit {service.max_queue})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+        service.close()
+
+
+def _connect(port=None, socket_path=DEFAULT_SOCKET, timeout=None):
+    if port is None:
+        return _UnixHTTPConnection(socket_path, timeout=timeout)
+    return http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+
+
+def _headers(token):
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+
+def request(method, path, body=None, port=None, socket_path=DEFAULT_SOCKET, token=None):
+    """One API call; returns (status, decoded JSON)."""
+    conn = _connect(port, socket_path)
+    try:
+        conn.request(method, path, json.dumps(body) if body is not None else None,
+                     dict(_headers(token), **{"Content-Type": "application/json"}))
+        resp = conn.getresponse()
+        return resp.status, json.loads(resp.read() or b"null")
+    finally:
+        conn.close()
+
+
+def stream_results(since=0, follow=True, port=None, socket_path=DEFAULT_SOCKET, token=None):
+    """
+    Yield finished jobs from GET /results as they arrive. With `follow`, a
+    stream the server ends (see MAX_FOLLOW_SEC) is reopened from the last job seen.
+    """
+    while True:
+        conn = _connect(port, socket_path)
+        try:
+            conn.request("GET", f"/results?since={since}&follow={int(follow)}", headers=_headers(token))
+            resp = conn.getresponse()
+            if resp.status != 200:
+                yield json.loads(resp.read() or b"null")
+                return
+            for line in resp:
+                if line.strip():
+                    job = json.loads(line)
+                    since = job["seq"]
+                    yield job
+        finally:
+            conn.close()
+        if not follow:
+            return
+
+
+def submit_file(file_path, send_source=False, retries=120, **where):
+    """
+    Submit a driver, waiting and retrying while the service reports its queue
+    full (503). With send_source the file contents are sent instead of the path.
+    """
+    body = {"file": os.path.abspath(file_path)}
+    if send_source:
+        with open(file_path) as f:
+            body = {"source": f.read(), "name": os.path.basename(file_path)}
+    for _ in range(retries):
+        status, job = request("POST", "/jobs", body, **where)
+        if status != 503:
+            return status, job
+        time.sleep(0.25)
+    return status, job
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Resident driver grading service and client.")
+    ap.add_argument("command", choices=["serve", "submit", "poll", "stream", "status"])
+    ap.add_argument("args", nargs="*", help="driver files (submit) or job ids (poll)")
+    ap.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket path (default transport)")
+    ap.add_argument("--port", type=int, nargs="?", const=DEFAULT_PORT, default=None,
+                    help=f"use localhost TCP instead of the socket (default port {DEFAULT_PORT}); needs a token")
+    ap.add_argument("--token", default=os.environ.get(TOKEN_ENV),
+                    help=f"bearer token for the API (default: ${TOKEN_ENV})")
+    ap.add_argument("--root", action="append", default=None,
+                    help="with serve, directory submitted file paths must lie under (repeatable; default: cwd)")
+    ap.add_argument("--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    ap.add_argument("--queue", type=int, default=None, help="max queued + running jobs (default: 4 * jobs)")
+    ap.add_argument("--tiered", action="store_true", help="grade through the tiered triage pipeline")
+    ap.add_argument("--threshold", type=float, default=0.0, help="with --tiered, early-stop threshold")
+    ap.add_argument("--no-cache", action="store_true", help="do not read or write the stage result cache")
+    ap.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="stage result cache directory")
+    ap.add_argument("--send-source", action="store_true", help="submit file contents rather than paths")
+    ap.add_argument("--wait", action="store_true", help="with submit, stream results until all are done")
+    args = ap.parse_args()
+    where = {"port": args.port, "socket_path": args.socket, "token": args.token}
+
+    if args.command == "serve":
+        if args.port is not None and not args.token:
+            ap.error(f"--port needs --token or ${TOKEN_ENV}")
+        cache = StageCache(cache_dir=args.cache_dir, mode="off" if args.no_cache else "on")
+        roots = args.root or [os.getcwd()]
+        serve(GradingService(args.jobs, args.queue, cache, args.tiered, args.threshold, roots=roots), **where)
+    elif args.command == "submit":
+        ids = set()
+        since = request("GET", "/status", **where)[1]["finished"]
+        for path in args.args:
+            status, job = submit_file(path, args.send_source, **where)
+            print(f"{path}: {job.get('id', job.get('error'))}")
+            if status == 202:
+                ids.add(job["id"])
+        if args.wait:
+            for job in stream_results(since, **where):
+                if job["id"] in ids:
+                    ids.discard(job["id"])
+                    res = job["result"]
+                    score = f"{res['overall_score']:.1f}/100" if job["status"] == "done" else res.get("error")
+                    print(f"[{job['id']}] {job['file']}: {score}")
+                if not ids:
+                    break
+    elif args.command == "poll":
+        for job_id in args.args:
+            print(json.dumps(request("GET", f"/jobs/{job_id}", **where)[1], indent=4))
+    elif args.command == "stream":
+        for job in stream_results(**where):
+            print(json.dumps(job, default=str))
+    else:
+        print(json.dumps(request("GET", "/status", **where)[1], indent=4))
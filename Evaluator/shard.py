@@ -0,0 +1,332 @@
+# shard.py
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from batch import collect_drivers
+from cache import StageCache, DEFAULT_CACHE_DIR
+from checkpoint import ResultStream
+from evaluator import evaluate
+from logger import log_score
+from triage import evaluate_tiered
+from workspace import make_workspace
+
+# Sub-directories of a shared work directory:
+#   jobs/<id>.json            waiting to be claimed
+#   leases/<id>@<worker>.json claimed; the file's mtime is the worker's heartbeat
+#   results/<id>.json         finished, not yet collected
+#   collected/<id>.json       finished and streamed into the coordinator's output
+DIRS = ("jobs", "leases", "results", "collected")
+DEFAULT_LEASE = 120.0
+DEFAULT_ATTEMPTS = 3
+
+
+def _paths(workdir):
+    return {d: os.path.join(workdir, d) for d in DIRS}
+
+
+def _write_atomic(path, data):
+    """Write JSON to `path` so readers see either nothing or the whole file."""
+    tmp = f"{path}.tmp.{socket.gethostname()}.{os.getpid()}"
+    with open(tmp, "w") as f:
+        json.dump(data, f, default=str)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _read(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def submit_corpus(directory, workdir):
+    """
+    Coordinator: write one job file per driver in `directory` into `workdir`.
+    Jobs carry the driver source, so workers need not see the coordinator's
+    paths. A job id is derived from the driver's path, so submitting the same
+    corpus again only adds drivers that have no job yet. Returns the count added.
+    """
+    p = _paths(workdir)
+    for d in p.values():
+        os.makedirs(d, exist_ok=True)
+    added = 0
+    for file_path in collect_drivers(directory):
+        job_id = hashlib.sha256(file_path.encode()).hexdigest()[:16]
+        if any(os.path.exists(os.path.join(p[d], f"{job_id}.json")) for d in ("jobs", "results", "collected")) \
+                or _lease_of(p, job_id):
+            continue
+        with open(file_path) as f:
+            source = f.read()
+        _write_atomic(os.path.join(p["jobs"], f"{job_id}.json"), {
+            "id": job_id, "file": file_path, "name": os.path.basename(file_path),
+            "source": source, "attempts": 0,
+        })
+        added += 1
+    return added
+
+
+def _lease_of(p, job_id):
+    for name in os.listdir(p["leases"]):
+        if name.startswith(job_id + "@") and _is_lease(name):
+            return os.path.join(p["leases"], name)
+    return None
+
+
+def claim(workdir, worker):
+    """
+    Claim one waiting job by renaming it into leases/. rename() is atomic on
+    a single filesystem (including NFS), so when several workers race for the
+    same job exactly one succeeds. Returns (lease path, job) or None.
+    """
+    p = _paths(workdir)
+    for name in sorted(os.listdir(p["jobs"])):
+        if not name.endswith(".json"):
+            continue
+        lease = os.path.join(p["leases"], f"{name[:-5]}@{worker}.json")
+        try:
+            os.rename(os.path.join(p["jobs"], name), lease)
+        except FileNotFoundError:
+            continue  # another worker got it first
+        os.utime(lease)
+        return lease, _read(lease)
+    return None
+
+
+def _is_lease(name):
+    """A lease file, or one a reaper has taken over (<lease>.reaped.<worker>)."""
+    return name.endswith(".json") or ".json.reaped." in name
+
+
+def _sweep_tmp(p, max_age, now):
+    """Remove half-written _write_atomic temp files left by writers that died."""
+    for d in p.values():
+        for name in os.listdir(d):
+            if ".json.tmp." not in name:
+                continue
+            path = os.path.join(d, name)
+            try:
+                if now - os.stat(path).st_mtime >= max_age:
+                    os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+
+def reap_expired(workdir, lease_sec=DEFAULT_LEASE, max_attempts=DEFAULT_ATTEMPTS):
+    """
+    Return jobs whose lease has not been renewed for `lease_sec` (the worker
+    died or lost the shared filesystem) to jobs/ for another worker, or fail
+    them once they have been tried `max_attempts` times. Safe to run from any
+    number of nodes: the lease is first renamed to a name only this reaper
+    knows, so only one reaper handles each expired lease. If the heartbeat
+    renewed the lease between the age check and the rename, it is renamed
+    back. Leases taken over by a reaper that then died, and stale temp files,
+    are cleaned up once they are `lease_sec` old.
+    Lease ages compare file mtimes with this node's clock, so node clocks must
+    agree to well within `lease_sec`.
+    """
+    p = _paths(workdir)
+    now = time.time()
+    _sweep_tmp(p, lease_sec, now)
+    requeued = failed = 0
+    for name in os.listdir(p["leases"]):
+        if not _is_lease(name):
+            continue
+        path = os.path.join(p["leases"], name)
+        lease = path.split(".reaped.", 1)[0]
+        try:
+            if now - os.stat(path).st_mtime < lease_sec:
+                continue
+            reaped = f"{lease}.reaped.{worker_id()}"
+            os.rename(path, reaped)
+            if path == lease and time.time() - os.stat(reaped).st_mtime < lease_sec:
+                os.rename(reaped, lease)  # renewed meanwhile: the worker is alive
+                continue
+        except FileNotFoundError:
+            continue  # finished or reaped elsewhere meanwhile
+        job = _read(reaped)
+        job["attempts"] = job.get("attempts", 0) + 1
+        job["last_worker"] = os.path.basename(lease).split("@", 1)[1][:-5]
+        if os.path.exists(os.path.join(p["results"], f"{job['id']}.json")):
+            pass  # the worker finished just after its lease expired
+        elif job["attempts"] >= max_attempts:
+            _write_atomic(os.path.join(p["results"], f"{job['id']}.json"), {
+                "id": job["id"], "file": job["file"], "worker": job["last_worker"],
+                "result": {"error": f"lease expired {job['attempts']} times"},
+            })
+            failed += 1
+        else:
+            _write_atomic(os.path.join(p["jobs"], f"{job['id']}.json"), job)
+            requeued += 1
+        os.unlink(reaped)
+    return requeued, failed
+
+
+class _Heartbeat(threading.Thread):
+    """
+    Touches a lease file every `interval` seconds until stopped. `lost` is
+    set while the lease is missing; a reaper that raced with a renewal puts
+    it back, so the heartbeat keeps trying.
+    """
+
+    def __init__(self, lease, interval):
+        super().__init__(daemon=True)
+        self.lease = lease
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.lost = False
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                os.utime(self.lease)
+                self.lost = False
+            except FileNotFoundError:
+                self.lost = True
+
+
+def run_job(job, cache=None, tiered=False, threshold=0.0):
+    """Grade a job's source in a private workspace under its original file name."""
+    ws = make_workspace("evaluator_shard_")
+    try:
+        path = os.path.join(ws, job["name"])
+        with open(path, "w") as f:
+            f.write(job["source"])
+        try:
+            if tiered:
+                res = evaluate_tiered(path, cache, threshold)
+            else:
+                res = evaluate(path, cache)
+        except Exception as e:
+            res = {"error": f"{type(e).__name__}: {e}"}
+        res["meta_file"] = job["file"]
+        return res
+    finally:
+        shutil.rmtree(ws, ignore_errors=True)
+
+
+def work(workdir, cache=None, tiered=False, threshold=0.0, lease_sec=DEFAULT_LEASE,
+         max_attempts=DEFAULT_ATTEMPTS, idle_exit=True, poll=1.0):
+    """
+    Worker loop: claim a job, grade it while a heartbeat keeps the lease
+    fresh, write results/<id>.json, release the lease. Workers also reap
+    expired leases, so jobs of a dead worker are retried even when no
+    coordinator is running. With idle_exit the loop ends once no jobs are
+    waiting or leased. Returns the number of jobs graded.
+    """
+    p = _paths(workdir)
+    me = worker_id()
+    graded = 0
+    while True:
+        reap_expired(workdir, lease_sec, max_attempts)
+        claimed = claim(workdir, me)
+        if claimed is None:
+            if idle_exit and not counts(workdir)["leases"]:
+                return graded
+            time.sleep(poll)
+            continue
+        lease, job = claimed
+        beat = _Heartbeat(lease, lease_sec / 4)
+        beat.start()
+        try:
+            res = run_job(job, cache, tiered, threshold)
+        finally:
+            beat.stopped.set()
+            beat.join()
+        # Publish even if the lease was lost: the result is the same whichever
+        # worker produced it, and the first one written wins
+        out = os.path.join(p["results"], f"{job['id']}.json")
+        if not os.path.exists(out):
+            _write_atomic(out, {"id": job["id"], "file": job["file"], "worker": me,
+                                "attempts": job.get("attempts", 0), "result": res})
+        try:
+            os.unlink(lease)
+        except FileNotFoundError:
+            pass
+        graded += 1
+
+
+def counts(workdir):
+    p = _paths(workdir)
+    return {d: sum(1 for n in os.listdir(p[d]) if (_is_lease(n) if d == "leases" else n.endswith(".json")))
+            for d in DIRS}
+
+
+def collect(workdir, output=None, lease_sec=DEFAULT_LEASE, max_attempts=DEFAULT_ATTEMPTS,
+            follow=True, poll=2.0):
+    """
+    Coordinator: stream finished results into a JSONL file (see
+    checkpoint.ResultStream), log each score to the results store and move
+    the result to collected/, reaping expired leases on the way. With
+    `follow`, keep going until no job is waiting, leased or uncollected.
+    Returns the number collected by this call.
+    """
+    p = _paths(workdir)
+    output = os.path.abspath(output or os.path.join("outputs", "shard_results.jsonl"))
+    header = {"directory": os.path.abspath(workdir), "files": sum(counts(workdir).values())}
+    collected = 0
+    with ResultStream(output, header, resume=True) as stream:
+        while True:
+            reap_expired(workdir, lease_sec, max_attempts)
+            for name in sorted(os.listdir(p["results"])):
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(p["results"], name)
+                rec = _read(path)
+                res = rec["result"]
+                stream.write(rec["file"], res)
+                if "error" in res:
+                    print(f"{rec['file']}: error ({res['error']}) [{rec.get('worker')}]")
+                else:
+                    print(f"{rec['file']}: {res['overall_score']:.1f}/100 [{rec.get('worker')}]")
+                    log_score(rec["file"], res, res["overall_score"], res["breakdown"])
+                os.replace(path, os.path.join(p["collected"], name))
+                collected += 1
+            c = counts(workdir)
+            if not follow or not (c["jobs"] or c["leases"] or c["results"]):
+                return collected
+            time.sleep(poll)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Grade a corpus across nodes through a shared work directory.")
+    ap.add_argument("command", choices=["submit", "work", "collect", "status"])
+    ap.add_argument("workdir", help="shared work directory (e.g. on NFS)")
+    ap.add_argument("corpus", nargs="?", help="with submit, directory of .c drivers")
+    ap.add_argument("--jobs", type=int, default=1, help="with work, worker processes on this node")
+    ap.add_argument("--lease", type=float, default=DEFAULT_LEASE, help="seconds before an unrenewed lease expires")
+    ap.add_argument("--attempts", type=int, default=DEFAULT_ATTEMPTS, help="tries per job before it is failed")
+    ap.add_argument("--no-exit", action="store_true", help="with work, keep waiting for new jobs when idle")
+    ap.add_argument("--output", default=None, help="with collect, JSONL results stream")
+    ap.add_argument("--once", action="store_true", help="with collect, collect what is ready and exit")
+    ap.add_argument("--tiered", action="store_true", help="grade through the tiered triage pipeline")
+    ap.add_argument("--threshold", type=float, default=0.0, help="with --tiered, early-stop threshold")
+    ap.add_argument("--no-cache", action="store_true", help="do not read or write the stage result cache")
+    ap.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="stage result cache directory")
+    args = ap.parse_args()
+
+    if args.command == "submit":
+        if not args.corpus:
+            ap.error("submit needs a corpus directory")
+        print(f"Submitted {submit_corpus(args.corpus, args.workdir)} jobs to {args.workdir}")
+    elif args.command == "work":
+        cache = StageCache(cache_dir=args.cache_dir, mode="off" if args.no_cache else "on")
+        opts = (args.workdir, cache, args.tiered, args.threshold, args.lease, args.attempts, not args.no_exit)
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            graded = sum(f.result() for f in [pool.submit(work, *opts) for _ in range(args.jobs)])
+        print(f"{worker_id()}: graded {graded} jobs")
+    elif args.command == "collect":
+        n = collect(args.workdir, args.output, args.lease, args.attempts, follow=not args.once)
+        print(f"Collected {n} results")
+    else:
+        print(json.dumps(counts(args.workdir), indent=4))
@@ -0,0 +1,117 @@
+# source_unit.py
+import bisect
+import hashlib
+import re
+from collections import namedtuple
+
+from function_index import build_function_index
+
+Token = namedtuple("Token", ["kind", "text", "start"])
+
+# Comments and string/char literals, matched in one left-to-right pass so that
+# a "//" inside a string or a quote inside a comment is handled correctly.
+_NOISE_RE = re.compile(
+    r"""//[^\n]*"""
+    r"""|/\*.*?(?:\*/|\Z)"""
+    r"""|"(?:\\.|[^"\\\n])*"?"""
+    r"""|'(?:\\.|[^'\\\n])*'?""",
+    re.DOTALL,
+)
+
+_TOKEN_RE = re.compile(
+    r"(?P<ident>[A-Za-z_]\w*)"
+    r"|(?P<number>\.?\d[\w.]*)"
+    r"|(?P<string>\"[^\"\n]*\"?|'[^'\n]*'?)"
+    r"|(?P<punct>->|\+\+|--|<<=?|>>=?|[<>!=+\-*/%&|^]=|&&|\|\||##|\.\.\.|[^\s\w])"
+)
+
+
+_NON_NEWLINE_RE = re.compile(r"[^\n]")
+
+
+def _blank(match):
+    """Replace a comment/literal with spaces, keeping newlines and quote marks."""
+    s = match.group(0)
+    if s[0] in "\"'":
+        closed = len(s) > 1 and s[-1] == s[0]
+        body = s[1:-1] if closed else s[1:]
+        return s[0] + _NON_NEWLINE_RE.sub(" ", body) + (s[0] if closed else "")
+    return _NON_NEWLINE_RE.sub(" ", s)
+
+
+def text_digest(text):
+    """sha256 of source text; SourceUnit.digest and checkpoint.file_digest both use it."""
+    return hashlib.sha256(text.encode("utf-8", "replace")).hexdigest()
+
+
+class SourceUnit:
+    """
+    A driver source file loaded once and shared by every checker.
+
+    Attributes:
+      path          - path of the source file
+      text          - raw file contents
+      lines         - text split into lines (no line endings)
+      line_offsets  - character offset where each line starts
+      stripped      - text with comments and string/char literal contents
+                      blanked out (same length and line layout as `text`)
+      tokens        - lazily computed list of Token(kind, text, start) over
+                      the stripped view
+      functions     - lazily computed function index (see function_index.py)
+      digest        - sha256 of the text, used as the content-address key
+    """
+
+    def __init__(self, path, text):
+        self.path = path
+        self.text = text
+        self.lines = text.split("\n")
+        if self.lines and self.lines[-1] == "":
+            self.lines.pop()
+        self.line_offsets = [0] + [m.end() for m in re.finditer(r"\n", text)]
+        self._stripped = None
+        self._tokens = None
+        self._functions = None
+        self._digest = None
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, "r", errors="replace") as f:
+            return cls(path, f.read())
+
+    @property
+    def stripped(self):
+        if self._stripped is None:
+            self._stripped = _NOISE_RE.sub(_blank, self.text)
+        return self._stripped
+
+    @property
+    def tokens(self):
+        if self._tokens is None:
+            self._tokens = [
+                Token(m.lastgroup, m.group(0), m.start())
+                for m in _TOKEN_RE.finditer(self.stripped)
+            ]
+        return self._tokens
+
+    @property
+    def functions(self):
+        if self._functions is None:
+            self._functions = build_function_index(self)
+        return self._functions
+
+    @property
+    def digest(self):
+        if self._digest is None:
+            self._digest = text_digest(self.text)
+        return self._digest
+
+    def line_of(self, offset):
+        """1-based line number containing character `offset`."""
+        return bisect.bisect_right(self.line_offsets, offset)
+
+
+def load_source(source):
+    """Accept a SourceUnit or a file path and return a SourceUnit."""
+    if isinstance(source, SourceUnit):
+        return source
+    return SourceUnit.from_file(source)
@@ -3,29 +3,102 @@ import subprocess
 import re
 import os
 
-CHECKPATCH = "./checkpatch.pl"  # prefer local copy in repo root
+from source_unit import load_source
 
-def _run_checkpatch(file_path):
+# Copy shipped next to this file, as an absolute path so the result does not
+# depend on the cwd (batch workers chdir into scratch dirs)
+CHECKPATCH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "checkpatch.pl")
+
+# checkpatch prints a "-----\n<file>\n-----" banner before each file's report
+# when given several files in one invocation
+_SECTION_RE = re.compile(r"^-+\n(?P<path>.+)\n-+\n", re.MULTILINE)
+_CHECKPATCH_TRAILER = (
+    "NOTE: If any of the errors are false positives, please report\n"
+    "      them to the maintainer, see CHECKPATCH in MAINTAINERS.\n"
+)
+
+# Output of run_checkpatch_many(), consumed by _run_checkpatch()
+_prefetched = {}
+
+
+def checkpatch_available():
+    return os.path.exists(CHECKPATCH)
+
+
+def run_checkpatch_many(file_paths):
+    """
+    Check many files with a single perl/checkpatch.pl process (its multi-file
+    mode), so the 7k-line script is compiled once instead of once per driver.
+    The combined report is split back per file and returned as {path: output};
+    each entry matches what a single-file run prints. Results are also kept
+    for the next _run_checkpatch() call on the same file.
+    """
+    paths = [os.path.abspath(p) for p in file_paths]
+    if not paths or not checkpatch_available():
+        return {}
+    if len(paths) == 1:
+        out = _run_checkpatch_single(paths[0])
+        _prefetched[paths[0]] = out
+        return {paths[0]: out}
+    try:
+        proc = subprocess.run(
+            checkpatch_command(*paths),
+            capture_output=True, text=True, timeout=60 + 5 * len(paths)
+        )
+        raw = proc.stdout or ""
+    except Exception:
+        return {}
+
+    outputs = {}
+    banners = list(_SECTION_RE.finditer(raw))
+    for i, m in enumerate(banners):
+        end = banners[i + 1].start() if i + 1 < len(banners) else len(raw)
+        body = raw[m.end():end]
+        if body.endswith(_CHECKPATCH_TRAILER):
+            body = body[: -len(_CHECKPATCH_TRAILER)].rstrip("\n") + "\n"
+        if "has style problems" in body:
+            body += "\n" + _CHECKPATCH_TRAILER
+        outputs[m.group("path")] = body
+    _prefetched.update({p: outputs[p] for p in paths if p in outputs})
+    return outputs
+
+
+def checkpatch_command(*paths):
+    return ["perl", CHECKPATCH, "--no-tree", "--file"] + list(paths)
+
+
+def prefetch_checkpatch(path, output):
+    """Hand in checkpatch output produced elsewhere (e.g. by an async runner)."""
+    _prefetched[os.path.abspath(path)] = output
+
+
+def _run_checkpatch_single(path):
+    try:
+        proc = subprocess.run(
+            checkpatch_command(path),
+            capture_output=True, text=True, timeout=60
+        )
+        return proc.stdout or proc.stderr or ""
+    except Exception as e:
+        return f"checkpatch exception: {e}"
+
+
+def _run_checkpatch(src, use_checkpatch=True):
     """Run checkpatch.pl if available and return raw output."""
-    if os.path.exists(CHECKPATCH):
-        try:
-            proc = subprocess.run(
-                ["perl", CHECKPATCH, "--no-tree", "--file", file_path],
-                capture_output=True, text=True, timeout=60
-            )
-            return proc.stdout or proc.stderr or ""
-        except Exception as e:
-            return f"checkpatch exception: {e}"
+    if use_checkpatch:
+        prefetched = _prefetched.pop(os.path.abspath(src.path), None)
+        if prefetched is not None:
+            return prefetched
+    if use_checkpatch and os.path.exists(CHECKPATCH):
+        return _run_checkpatch_single(src.path)
     else:
         # fallback: simple heuristics if checkpatch not available
-        try:
-            with open(file_path, "r") as f:
-                return f.read()
-        except Exception as e:
-            return f"fallback read exception: {e}"
+        return src.text
 
-def run_style_check(file_path):
+def run_style_check(source, use_checkpatch=True):
     """
+    `source` is a SourceUnit (or a file path, which is loaded on the fly).
+    With use_checkpatch=False only the built-in heuristics run (no perl process).
     Returns dict:
       {
         violations: int,
@@ -43,7 +116,8 @@ def run_style_check(file_path):
         "output": ""
     }
 
-    raw = _run_checkpatch(file_path)
+    src = load_source(source)
+    raw = _run_checkpatch(src, use_checkpatch)
     result["output"] = raw
 
     # If checkpatch output contains WARNING/ERROR, count them
@@ -56,14 +130,9 @@ def run_style_check(file_path):
     # fallback heuristic: look for tabs, line length > 80
     if violations == 0:
         # Lines too long
-        try:
-            with open(file_path, "r") as fh:
-                lines = fh.readlines()
-            long_lines = sum(1 for L in lines if len(L.rstrip("\n")) > 80)
-            tab_lines = sum(1 for L in lines if "\t" in L)
-            violations += long_lines + tab_lines
-        except Exception:
-            pass
+        long_lines = sum(1 for L in src.lines if len(L) > 80)
+        tab_lines = sum(1 for L in src.lines if "\t" in L)
+        violations += long_lines + tab_lines
 
     result["violations"] = violations
 
@@ -74,8 +143,7 @@ def run_style_check(file_path):
     # + Check for MODULE_* macros
     doc_points = 0
     try:
-        with open(file_path, "r") as fh:
-            code = fh.read()
+        code = src.text
         if "MODULE_LICENSE" in code and "MODULE_AUTHOR" in code and "MODULE_DESCRIPTION" in code:
             doc_points += 0.5
         # count function-level comment occurrences: '/*' before a function header
@@ -87,30 +155,12 @@ def run_style_check(file_path):
     result["documentation_score"] = min(1.0, doc_points)
 
     # Maintainability heuristics: average function length penalty
-    try:
-        func_lengths = []
-        # find approximate function bodies using braces pair heuristic
-        func_headers = re.finditer(r"^\s*[a-zA-Z_][\w\s\*]+\s+[a-zA-Z_]\w*\s*\([^)]*\)\s*\{", open(file_path).read(), re.MULTILINE)
-        code_text = open(file_path).read()
-        for h in func_headers:
-            start = h.start()
-            brace_count = 0
-            lines = code_text[start:].splitlines()
-            count = 0
-            for line in lines:
-                count += 1
-                brace_count += line.count("{")
-                brace_count -= line.count("}")
-                if brace_count <= 0:
-                    break
-            func_lengths.append(max(1, count))
-        if func_lengths:
-            avg_len = sum(func_lengths) / len(func_lengths)
-            # normalize: shorter functions -> higher score
-            result["maintainability_score"] = max(0.0, 1.0 - (avg_len / 500.0))
-        else:
-            result["maintainability_score"] = 1.0
-    except Exception:
+    func_lengths = [fn.length for fn in src.functions]
+    if func_lengths:
+        avg_len = sum(func_lengths) / len(func_lengths)
+        # normalize: shorter functions -> higher score
+        result["maintainability_score"] = max(0.0, 1.0 - (avg_len / 500.0))
+    else:
         result["maintainability_score"] = 1.0
 
     return result
@@ -0,0 +1,9 @@
+import glob
+import os
+import sys
+
+EVALUATOR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(EVALUATOR_DIR)
+sys.path.insert(0, EVALUATOR_DIR)
+
+SAMPLE_DRIVERS = sorted(glob.glob(os.path.join(REPO_ROOT, "Tests", "*.c")))
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from conftest import SAMPLE_DRIVERS
+from rule_engine import RuleSet, load_rules
+from security_checker import SECURITY_RULES, run_security_check
+from source_unit import SourceUnit
+
+# Issues reported by the substring-based checker the rule table replaced
+OLD_ISSUES = {
+    "1_claude.c": ["copy_to_user_unchecked", "copy_from_user_unchecked"],
+    "1_gemini.c": ["copy_to_user_unchecked"],
+    "1_gpt4.c": ["copy_to_user_unchecked", "copy_from_user_unchecked"],
+    "2_claude.c": ["copy_to_user_unchecked", "copy_from_user_unchecked"],
+    "2_gemini.c": ["copy_to_user_unchecked"],
+    "2_gpt.c": ["copy_to_user_unchecked", "copy_from_user_unchecked"],
+    "3_claude.c": ["unsafe_function:strcpy"],
+    "3_gemini.c": ["spinlock_not_unlocked"],
+    "3_gpt.c": ["spinlock_not_unlocked"],
+    "4_claude.c": [],
+    "4_gemini.c": [],
+    "4_gpt.c": [],
+    "good_driver.c": [],
+    "sample_driver.c": ["unsafe_function:strcpy"],
+    "sample_driver_bad_security.c": ["unsafe_function:strcpy", "possible_memory_leak", "mutex_not_unlocked"],
+    "sample_driver_strong.c": [],
+}
+
+# Where the rule table deliberately differs: spin_lock_init() is not an
+# acquire (the old check matched "spin_lock" as a substring)
+NEW_ISSUES = dict(OLD_ISSUES, **{
+    "3_gemini.c": [],
+    "3_gpt.c": [],
+})
+
+
+@pytest.mark.parametrize("driver", SAMPLE_DRIVERS)
+def test_issue_lists_pinned(driver):
+    name = os.path.basename(driver)
+    assert run_security_check(driver)["issues"] == NEW_ISSUES[name]
+
+
+def _scan(code):
+    rules = load_rules(SECURITY_RULES)
+    return [h.rule for h in rules.scan(SourceUnit("t.c", code))]
+
+
+def test_pattern_on_directive_line_ignored():
+    assert _scan("#define P(x) (x * __user)\n") == []
+    assert _scan("int f(char * __user p);\n") == ["unchecked_user_pointer"]
+
+
+def test_raw_and_nested_spinlocks_balanced():
+    assert _scan("raw_spin_lock(&l);\n") == ["spinlock_not_unlocked"]
+    assert _scan("raw_spin_lock_irqsave(&l, f);\nraw_spin_unlock_irqrestore(&l, f);\n") == []
+    assert _scan("spin_lock_nested(&l, 1);\n") == ["spinlock_not_unlocked"]
+    assert _scan("spin_lock_nested(&l, 1);\nspin_unlock(&l);\n") == []
+    assert _scan("spin_lock_init(&l);\n") == []
+
+
+def test_combined_patterns_match_in_one_pass():
+    rules = RuleSet({"categories": ["c"], "rules": [
+        {"id": "a", "category": "c", "penalty": 0.1, "pattern": "\\*\\s*foo"},
+        {"id": "b", "category": "c", "penalty": 0.1, "pattern": "\\[\\s*bar"},
+    ]})
+    code = "#if x * foo\nint y = z * foo + w[bar];\n"
+    assert [(h.rule, h.line) for h in rules.scan(SourceUnit("t.c", code))] == [("a", 2), ("b", 2)]
@@ -0,0 +1,22 @@
+import pytest
+
+from conftest import SAMPLE_DRIVERS
+from evaluator import evaluate
+from style_checker import checkpatch_available
+from triage import evaluate_tiered
+
+
+@pytest.mark.parametrize("driver", SAMPLE_DRIVERS)
+@pytest.mark.parametrize("threshold", [0.0, 101.0])
+def test_tiered_score_never_above_full_run(driver, threshold):
+    full = evaluate(driver)["overall_score"]
+    tiered = evaluate_tiered(driver, threshold=threshold)
+    assert tiered["overall_score"] <= full + 1e-9
+
+
+@pytest.mark.parametrize("driver", SAMPLE_DRIVERS)
+def test_skipped_build_tier_is_provisional(driver):
+    tiered = evaluate_tiered(driver, threshold=101.0)
+    assert not tiered["tiers"]["build"]["ran"]
+    assert not tiered["tiers"]["runtime"]["ran"]
+    assert tiered.get("provisional", False) == checkpatch_available()
@@ -0,0 +1,152 @@
+# triage.py
+from cache import StageCache
+from compile_checker import run_compilation, run_gcc_fallback, release_artifact, kbuild_available
+from parser import analyze_code_structure
+from performance_checker import run_performance_check
+from profiling import stage_timer
+from runtime_checker import run_runtime_stage
+from scoring import calculate_score
+from security_checker import run_security_check
+from source_unit import SourceUnit
+from style_checker import run_style_check, checkpatch_available
+
+_NO_CACHE = StageCache(mode="off")
+
+
+def best_possible_score(results, source=None):
+    """
+    Highest overall score `results` could still reach if every stage that has
+    not run yet came out perfect: compilation succeeds, style is clean, the
+    module loads/unloads with dmesg output and measured performance is ideal.
+    Stages already run keep their real results.
+    """
+    optimistic = dict(results)
+    if "compilation" not in results:
+        optimistic["compilation"] = {"success": True, "method": "bound"}
+    if results.get("style", {}).get("method") != "checkpatch":
+        optimistic["style"] = dict(results.get("style", {}), style_score=1.0)
+    if "runtime" not in results:
+        optimistic["runtime"] = {"compiled": True, "loaded": True, "unloaded": True, "dmesg_success": True}
+        perf = results.get("performance", {})
+        # Measured runtime results are blended 70/30 and score at most 1.0
+        optimistic["performance"] = dict(perf, score=0.7 * perf.get("score", 1.0) + 0.3)
+    return calculate_score(optimistic, source)[0]
+
+
+def _skip(tiers, tier, reason):
+    tiers[tier] = {"ran": False, "reason": reason}
+
+
+def evaluate_tiered(file_path, cache=None, threshold=0.0, compilation=None):
+    """
+    Tiered version of evaluator.evaluate(): each tier runs only while it can
+    still change the outcome.
+
+      static  - structure, security, performance, style heuristics and a
+                gcc -fsyntax-only gate (always runs)
+      build   - kbuild compilation and checkpatch; skipped when the syntax
+                gate fails or the best possible score is below `threshold`
+      runtime - insmod/dynamic tests/rmmod; skipped when the build produced
+                no module or the best possible score is below `threshold`
+
+    results["tiers"] records, per tier, whether it ran and why not. Skipped
+    stages leave their results at what the cheaper tiers found, except that
+    style which checkpatch would have scored is taken as 0 (and the result
+    marked "provisional"), so a triaged-out driver never scores above a
+    full run.
+    """
+    cache = cache or _NO_CACHE
+    results = {"meta_file": file_path}
+    timings = {}
+    tiers = {}
+
+    with stage_timer(timings, "total"):
+        with stage_timer(timings, "load"):
+            source = SourceUnit.from_file(file_path)
+        results["source_hash"] = source.digest
+
+        # --- Tier 0: static ---
+        with stage_timer(timings, "structure"):
+            results["structure"] = cache.stage("structure", source, analyze_code_structure, source)
+        with stage_timer(timings, "security"):
+            results["security"] = cache.stage("security", source, run_security_check, source)
+        with stage_timer(timings, "performance"):
+            results["performance"] = cache.stage(
+                "performance", source, run_performance_check, source, results["structure"]
+            )
+        with stage_timer(timings, "style"):
+            results["style"] = dict(
+                cache.stage("style", source, run_style_check, source, False, extra="heuristic"),
+                method="heuristic",
+            )
+        if compilation is None:
+            with stage_timer(timings, "syntax"):
+                syntax = cache.stage("syntax", source, run_gcc_fallback, file_path)
+        else:
+            syntax = compilation
+        tiers["static"] = {"ran": True}
+
+        # --- Tier 1: build ---
+        if not syntax.get("success"):
+            results["compilation"] = syntax
+            _skip(tiers, "build", "syntax gate failed")
+        else:
+            bound = best_possible_score(results, source)
+            if bound < threshold:
+                results["compilation"] = syntax
+                _skip(tiers, "build", f"best possible score {bound:.1f} < threshold {threshold:.1f}")
+            else:
+                with stage_timer(timings, "compilation"):
+                    if compilation is not None:
+                        results["compilation"] = compilation
+                        cache.store("compilation", source, compilation)
+                    elif kbuild_available():
+                        results["compilation"] = cache.stage(
+                            "compilation", source, run_compilation, file_path, True
+                        )
+                    else:
+                        # Without kernel headers kbuild would only repeat the gcc gate
+                        results["compilation"] = syntax
+                if checkpatch_available():
+                    with stage_timer(timings, "checkpatch"):
+                        results["style"] = dict(
+                            cache.stage("style", source, run_style_check, source,
+                                        extra=str(checkpatch_available())),
+                            method="checkpatch",
+                        )
+                tiers["build"] = {"ran": True}
+
+        if not tiers["build"]["ran"] and checkpatch_available():
+            # A full run would score style with checkpatch; without it, assume
+            # the worst rather than keep the (much kinder) heuristic score
+            results["style"] = dict(results["style"], style_score=0.0, method="unmeasured")
+            results["provisional"] = True
+
+        # --- Tier 2: runtime ---
+        comp = results["compilation"]
+        try:
+            if not tiers["build"]["ran"]:
+                _skip(tiers, "runtime", "build tier skipped")
+            elif not comp.get("success") or not comp.get("built_module"):
+                _skip(tiers, "runtime", "no loadable module built")
+            else:
+                bound = best_possible_score(results, source)
+                if bound < threshold:
+                    _skip(tiers, "runtime", f"best possible score {bound:.1f} < threshold {threshold:.1f}")
+                else:
+                    with stage_timer(timings, "runtime"):
+                        results["runtime"] = cache.stage(
+                            "runtime", source, run_runtime_stage, file_path, comp
+                        )
+                    tiers["runtime"] = {"ran": True}
+        finally:
+            release_artifact(comp)
+
+        with stage_timer(timings, "scoring"):
+            final_score, breakdown = calculate_score(results, source)
+
+    results["overall_score"] = final_score
+    results["breakdown"] = breakdown
+    results["tiers"] = tiers
+    results["timings"] = timings
+    return results
@@ -0,0 +1,48 @@
+# workspace.py
+import os
+import shutil
+import tempfile
+
+# Root under which build workspaces are created; inherited by batch workers
+SCRATCH_ENV = "EVALUATOR_SCRATCH_DIR"
+SHM_DIR = "/dev/shm"
+
+
+def scratch_root():
+    """$EVALUATOR_SCRATCH_DIR if it is a directory, else None (system temp dir)."""
+    root = os.environ.get(SCRATCH_ENV)
+    return root if root and os.path.isdir(root) else None
+
+
+def set_scratch_root(path):
+    os.environ[SCRATCH_ENV] = path
+
+
+def use_tmpfs():
+    """
+    Put build workspaces on /dev/shm. Returns False (leaving the default) when
+    /dev/shm is missing or not writable.
+    """
+    if os.path.isdir(SHM_DIR) and os.access(SHM_DIR, os.W_OK | os.X_OK):
+        set_scratch_root(SHM_DIR)
+        return True
+    return False
+
+
+def make_workspace(prefix="evaluator_"):
+    """Fresh private directory under the scratch root; the caller removes it."""
+    return os.path.realpath(tempfile.mkdtemp(prefix=prefix, dir=scratch_root()))
+
+
+def stage_source(src, workspace, name=None):
+    """
+    Make `src` available inside `workspace` (as `name`, default its basename).
+    Hard-links when possible (same filesystem), otherwise copies; builds only
+    ever read the staged file, so the source tree is never written.
+    """
+    dest = os.path.join(workspace, name or os.path.basename(src))
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+    return dest